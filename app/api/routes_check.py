@@ -1,73 +1,43 @@
 from __future__ import annotations
 
-from typing import List
+import codecs
+import gzip
+import json
+from tempfile import SpooledTemporaryFile
+from typing import AsyncIterator, List, Optional, Union
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
 
 from app.config import settings
+from app.core.compact import compact_check_payload, dumps
 from app.core.models import CheckRequest, CheckResponse, EvidenceItem, SpanResult
-from app.core.text_utils import split_claims_with_offsets
-from app.core.retrieval import retrieve, RetrievedChunk
-from app.core.verification import (
-    LABEL_CONTRADICTED,
-    LABEL_NEI,
-    LABEL_SUPPORTED,
-    VerificationResult,
-    verify_with_heuristics,
-    verify_with_local_nli,
-)
-from app.core.highlight import build_spans
-from app.kb.index import get_index, IndexManager
-from app.llm.openai_client import OpenAIClient
+from app.core.retrieval import RetrievedChunk
+from app.core.text_utils import ClaimWindower, SentenceSpan, split_claims_with_offsets
+from app.core.pipeline import check_claims
+from app.core.verification import LABEL_CONTRADICTED, LABEL_NEI, LABEL_SUPPORTED
+from app.core.highlight import Span, build_spans
+from app.kb.index import get_index
+from app.kb.storage import DEFAULT_KB_ID, kb_exists
 
 router = APIRouter()
 
+DOCUMENT_READ_BYTES = 64 * 1024
+DOCUMENT_SPOOL_BYTES = 1024 * 1024
 
-@router.post("/check", response_model=CheckResponse)
-async def check(request: CheckRequest) -> CheckResponse:
-    text = request.text.strip()
-    if len(text) > settings.max_input_chars:
-        raise HTTPException(status_code=400, detail="Input too long")
 
-    index = get_index()
-    if index is None:
-        manager = IndexManager()
-        index = manager.load()
+def _load_index(kb_id: Optional[str]):
+    if kb_id not in (None, DEFAULT_KB_ID) and not kb_exists(kb_id):
+        raise HTTPException(status_code=404, detail="Knowledge base not found")
+    index = get_index(kb_id)
     if index is None or not index.texts:
         raise HTTPException(status_code=400, detail="Knowledge base is empty. Upload files and rebuild index.")
+    return index
 
-    sentences = split_claims_with_offsets(text)
-    if not sentences:
-        raise HTTPException(status_code=400, detail="No sentences found in input")
-
-    evidence_sets: List[List[RetrievedChunk]] = []
-    results = []
-    openai_client = OpenAIClient()
-
-    for sentence in sentences:
-        retrieved = retrieve(sentence.text, index, request.top_k)
-        evidence_sets.append(retrieved)
-        if not retrieved or retrieved[0].score < settings.min_retrieval_score:
-            results.append(VerificationResult(label=LABEL_NEI, confidence=0.2))
-            continue
-        if request.mode == "openai" and openai_client.enabled():
-            evidence_text = "\n\n".join([f"[{r.source_file}] {r.text}" for r in retrieved])
-            verdict = openai_client.judge_claim(sentence.text, evidence_text)
-            if verdict:
-                label = str(verdict.get("label", LABEL_NEI)).upper()
-                if label not in {LABEL_SUPPORTED, LABEL_CONTRADICTED, LABEL_NEI}:
-                    label = LABEL_NEI
-                confidence = float(verdict.get("confidence", 0.5))
-                results.append(VerificationResult(label=label, confidence=confidence))
-                continue
-        if request.mode == "heuristic":
-            result = verify_with_heuristics(sentence.text, retrieved)
-        else:
-            result = verify_with_local_nli(sentence.text, retrieved, settings.nli_model)
-        results.append(result)
 
-    spans = build_spans(sentences, results, evidence_sets)
-    span_results = [
+def _span_results(spans: List[Span]) -> List[SpanResult]:
+    return [
         SpanResult(
             start=span.start,
             end=span.end,
@@ -80,6 +50,9 @@ async def check(request: CheckRequest) -> CheckResponse:
                     chunk_id=ev.chunk_id,
                     text=ev.text,
                     score=ev.score,
+                    alternate_sources=list(ev.alternate_sources),
+                    source_start=ev.source_start if ev.source_start >= 0 else None,
+                    source_end=ev.source_end if ev.source_end >= 0 else None,
                 )
                 for ev in span.evidence
             ],
@@ -87,28 +60,150 @@ async def check(request: CheckRequest) -> CheckResponse:
         for span in spans
     ]
 
-    summary = {
+
+def _summarize(span_results: List[SpanResult] | List[Span]) -> dict:
+    return {
         "supported": sum(1 for s in span_results if s.label == LABEL_SUPPORTED),
         "contradicted": sum(1 for s in span_results if s.label == LABEL_CONTRADICTED),
         "nei": sum(1 for s in span_results if s.label == LABEL_NEI),
     }
 
-    debug = None
-    if request.return_debug:
-        debug = {
-            "sentences": [s.text for s in sentences],
-            "retrieved": [
-                [
-                    {
-                        "chunk_id": r.chunk_id,
-                        "score": r.score,
-                        "semantic_score": r.semantic_score,
-                        "keyword_score": r.keyword_score,
-                    }
-                    for r in retrieved
-                ]
-                for retrieved in evidence_sets
-            ],
-        }
 
-    return CheckResponse(input_text=text, spans=span_results, summary=summary, debug=debug)
+def _debug(sentences: List[SentenceSpan], evidence_sets: List[List[RetrievedChunk]]) -> dict:
+    return {
+        "sentences": [s.text for s in sentences],
+        "retrieved": [
+            [
+                {
+                    "chunk_id": r.chunk_id,
+                    "score": r.score,
+                    "semantic_score": r.semantic_score,
+                    "keyword_score": r.keyword_score,
+                }
+                for r in retrieved
+            ]
+            for retrieved in evidence_sets
+        ],
+    }
+
+
+def _compact_response(payload: dict, accept_encoding: str) -> Response:
+    body = dumps(payload)
+    headers = {"Vary": "Accept-Encoding"}
+    if "gzip" in accept_encoding.lower() and len(body) >= settings.gzip_min_bytes:
+        body = gzip.compress(body, compresslevel=5)
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.post("/check", response_model=CheckResponse)
+async def check(request: CheckRequest, http_request: Request) -> Union[CheckResponse, Response]:
+    """Check every claim in `text`.
+
+    `response_format=compact` returns evidence once per request with per-span
+    snippets, serialised without pydantic and gzipped when the client accepts it.
+    """
+    text = request.text.strip()
+    if len(text) > settings.max_input_chars:
+        raise HTTPException(status_code=400, detail="Input too long")
+
+    index = _load_index(request.kb_id)
+
+    sentences = split_claims_with_offsets(text)
+    if not sentences:
+        raise HTTPException(status_code=400, detail="No sentences found in input")
+
+    # Run the blocking pipeline off the event loop so concurrent requests can share model batches.
+    results, evidence_sets = await run_in_threadpool(check_claims, sentences, index, request.top_k, request.mode)
+
+    spans = build_spans(sentences, results, evidence_sets)
+    debug = _debug(sentences, evidence_sets) if request.return_debug else None
+    if request.response_format == "compact":
+        payload = await run_in_threadpool(compact_check_payload, text, spans, _summarize(spans), debug)
+        return _compact_response(payload, http_request.headers.get("accept-encoding", ""))
+
+    span_results = _span_results(spans)
+    return CheckResponse(input_text=text, spans=span_results, summary=_summarize(span_results), debug=debug)
+
+
+async def _upload_blocks(upload: UploadFile) -> AsyncIterator[bytes]:
+    while True:
+        block = await upload.read(DOCUMENT_READ_BYTES)
+        if not block:
+            break
+        yield block
+
+
+async def _spooled_blocks(spool: SpooledTemporaryFile) -> AsyncIterator[bytes]:
+    try:
+        while True:
+            block = spool.read(DOCUMENT_READ_BYTES)
+            if not block:
+                break
+            yield block
+    finally:
+        spool.close()
+
+
+async def _decode(blocks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    async for block in blocks:
+        yield decoder.decode(block)
+    yield decoder.decode(b"", final=True)
+
+
+@router.post("/check/document")
+async def check_document(
+    request: Request,
+    top_k: int = 5,
+    mode: str = Query("local", pattern="^(local|heuristic|openai)$"),
+    kb_id: Optional[str] = Query(None, pattern="^[a-zA-Z0-9_-]{1,64}$"),
+) -> StreamingResponse:
+    """Check a document of any size, streaming one NDJSON line per claim and a final summary.
+
+    The body is either a raw text stream or a multipart upload with a `file` field.
+    Claims are windowed incrementally and verified in batches of
+    `document_batch_claims`, so memory does not grow with document length.
+    """
+    index = _load_index(kb_id)
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        # Starlette spools uploaded files to disk, so reading in blocks keeps memory flat.
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Missing file field")
+        pieces = _decode(_upload_blocks(upload))
+    else:
+        # The body must be fully received before the response starts: StreamingResponse listens
+        # for client disconnects concurrently and would swallow the remaining body messages.
+        spool = SpooledTemporaryFile(max_size=DOCUMENT_SPOOL_BYTES)
+        async for block in request.stream():
+            spool.write(block)
+        spool.seek(0)
+        pieces = _decode(_spooled_blocks(spool))
+
+    async def run_batch(claims: List[SentenceSpan], totals: dict) -> AsyncIterator[bytes]:
+        results, evidence_sets = await run_in_threadpool(check_claims, claims, index, top_k, mode)
+        for span_result in _span_results(build_spans(claims, results, evidence_sets)):
+            for key, value in _summarize([span_result]).items():
+                totals[key] += value
+            yield (span_result.model_dump_json() + "\n").encode("utf-8")
+
+    async def body() -> AsyncIterator[bytes]:
+        windower = ClaimWindower(settings.document_max_buffer_chars)
+        totals = {"supported": 0, "contradicted": 0, "nei": 0}
+        pending: List[SentenceSpan] = []
+        async for piece in pieces:
+            pending.extend(windower.feed(piece))
+            while len(pending) >= settings.document_batch_claims:
+                batch, pending = pending[:settings.document_batch_claims], pending[settings.document_batch_claims:]
+                async for line in run_batch(batch, totals):
+                    yield line
+        pending.extend(windower.flush())
+        while pending:
+            batch, pending = pending[:settings.document_batch_claims], pending[settings.document_batch_claims:]
+            async for line in run_batch(batch, totals):
+                yield line
+        yield (json.dumps({"summary": totals, "done": True}) + "\n").encode("utf-8")
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
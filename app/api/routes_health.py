@@ -2,9 +2,18 @@ from __future__ import annotations
 
 from fastapi import APIRouter
 
+from app.core.batching import batching_stats
+from app.core.retrieval import query_cache_stats
+from app.kb.index import pool_stats
+
 router = APIRouter()
 
 
 @router.get("/health")
 async def health() -> dict:
     return {"status": "ok"}
+
+
+@router.get("/metrics")
+async def metrics() -> dict:
+    return {"batching": batching_stats(), "index_pool": pool_stats(), "query_cache": query_cache_stats()}
@@ -1,21 +1,46 @@
 from __future__ import annotations
 
-from typing import List
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
 
 from fastapi import APIRouter, File, UploadFile, HTTPException
+from fastapi.responses import FileResponse, JSONResponse
+from starlette.background import BackgroundTask
 
-from app.core.models import KBFileInfo, KBStatus
-from app.kb.storage import KBStorage
-from app.kb.index import IndexManager
+from app.core.models import EntityNeighbour, EntityNeighbourhood, IndexJobStatus, KBFileInfo, KBStatus
+from app.core.retrieval import ShardedIndex
+from app.kb.storage import DEFAULT_KB_ID, KBStorage, kb_data_dir, kb_exists, list_kb_ids
+from app.config import settings
+from app.kb.index import IndexManager, get_index
+from app.kb.jobs import get_job, start_job
 
 router = APIRouter()
 
 
+def _kb_dir(kb_id: str, create: bool = False) -> str:
+    try:
+        path = kb_data_dir(kb_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    if not create and kb_id != DEFAULT_KB_ID and not kb_exists(kb_id):
+        raise HTTPException(status_code=404, detail="Knowledge base not found")
+    return path
+
+
+@router.get("/kbs", response_model=List[str])
+async def list_kbs() -> List[str]:
+    return list_kb_ids()
+
+
 @router.post("/kb/upload")
-async def upload_kb(files: List[UploadFile] = File(...)) -> dict:
+@router.post("/kb/{kb_id}/upload")
+async def upload_kb(files: List[UploadFile] = File(...), kb_id: str = DEFAULT_KB_ID) -> dict:
     if not files:
         raise HTTPException(status_code=400, detail="No files uploaded")
-    storage = KBStorage()
+    storage = KBStorage(_kb_dir(kb_id, create=True))
     saved = []
     for upload in files:
         content = await upload.read()
@@ -25,30 +50,159 @@ async def upload_kb(files: List[UploadFile] = File(...)) -> dict:
 
 
 @router.get("/kb/list", response_model=List[KBFileInfo])
-async def list_kb() -> List[KBFileInfo]:
-    storage = KBStorage()
+@router.get("/kb/{kb_id}/list", response_model=List[KBFileInfo])
+async def list_kb(kb_id: str = DEFAULT_KB_ID) -> List[KBFileInfo]:
+    storage = KBStorage(_kb_dir(kb_id))
     return [KBFileInfo(filename=p.name, size_bytes=p.stat().st_size) for p in storage.list_files()]
 
 
+def _update_index(kb_id: str, manager: IndexManager, removed: List[str], added: List) -> None:
+    if manager.current_version() is None:
+        return
+    try:
+        manager.update_files(removed, added)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    if manager.tombstone_ratio() >= settings.compaction_threshold:
+        start_job(kb_id, lambda meter: manager.compact(), kind="compact")
+
+
+@router.put("/kb/files/{filename}", response_model=KBStatus)
+@router.put("/kb/{kb_id}/files/{filename}", response_model=KBStatus)
+async def replace_kb_file(filename: str, file: UploadFile = File(...), kb_id: str = DEFAULT_KB_ID) -> KBStatus:
+    """Add or replace one file: its old chunks are tombstoned and the new ones appended."""
+    base_dir = _kb_dir(kb_id, create=True)
+    saved = KBStorage(base_dir).save_files([(filename, await file.read())])
+    if len(saved) != 1:
+        raise HTTPException(status_code=400, detail="Expected a single .txt file")
+    manager = IndexManager(base_dir)
+    _update_index(kb_id, manager, [saved[0].name], saved)
+    return KBStatus(**manager.status())
+
+
+@router.delete("/kb/files/{filename}", response_model=KBStatus)
+@router.delete("/kb/{kb_id}/files/{filename}", response_model=KBStatus)
+async def delete_kb_file(filename: str, kb_id: str = DEFAULT_KB_ID) -> KBStatus:
+    """Delete one file; its chunks are tombstoned in the live index until compaction."""
+    base_dir = _kb_dir(kb_id)
+    storage = KBStorage(base_dir)
+    if not storage.delete_file(filename):
+        raise HTTPException(status_code=404, detail="File not found")
+    manager = IndexManager(base_dir)
+    _update_index(kb_id, manager, [filename], [])
+    return KBStatus(**manager.status())
+
+
 @router.delete("/kb/clear")
-async def clear_kb() -> dict:
-    storage = KBStorage()
+@router.delete("/kb/{kb_id}/clear")
+async def clear_kb(kb_id: str = DEFAULT_KB_ID) -> dict:
+    storage = KBStorage(_kb_dir(kb_id))
     storage.clear()
-    manager = IndexManager()
+    manager = IndexManager(_kb_dir(kb_id))
     manager.clear_cache()
     return {"status": "cleared"}
 
 
 @router.post("/kb/rebuild", response_model=KBStatus)
-async def rebuild_kb() -> KBStatus:
-    manager = IndexManager()
-    manager.build()
+@router.post("/kb/{kb_id}/rebuild", response_model=KBStatus)
+async def rebuild_kb(kb_id: str = DEFAULT_KB_ID, shard: Optional[int] = None, background: bool = False) -> KBStatus:
+    manager = IndexManager(_kb_dir(kb_id))
+    if background:
+        job = start_job(kb_id, lambda meter: manager.build(shard=shard, meter=meter))
+        if job is None:
+            raise HTTPException(status_code=409, detail="A rebuild is already running")
+        return JSONResponse(status_code=202, content=IndexJobStatus(**job.status()).model_dump())
+    try:
+        manager.build(shard=shard)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
     status = manager.status()
     return KBStatus(**status)
 
 
+@router.get("/kb/snapshot")
+@router.get("/kb/{kb_id}/snapshot")
+async def export_snapshot(kb_id: str = DEFAULT_KB_ID) -> FileResponse:
+    """Download the built index as a checksummed snapshot archive."""
+    manager = IndexManager(_kb_dir(kb_id))
+    handle, path = tempfile.mkstemp(prefix="snapshot-", suffix=".tar")
+    os.close(handle)
+    try:
+        manifest = manager.export_snapshot(Path(path))
+    except ValueError as exc:
+        os.unlink(path)
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return FileResponse(
+        path,
+        media_type="application/x-tar",
+        filename=f"{kb_id}-{manifest['index_version']}.snapshot.tar",
+        background=BackgroundTask(os.unlink, path),
+    )
+
+
+@router.post("/kb/snapshot", response_model=KBStatus)
+@router.post("/kb/{kb_id}/snapshot", response_model=KBStatus)
+async def import_snapshot(file: UploadFile = File(...), kb_id: str = DEFAULT_KB_ID, mount: bool = False) -> KBStatus:
+    """Install an uploaded snapshot as the KB's index; `mount` serves it from the archive unextracted."""
+    manager = IndexManager(_kb_dir(kb_id, create=True))
+    handle, path = tempfile.mkstemp(prefix="snapshot-", suffix=".tar")
+    try:
+        with os.fdopen(handle, "wb") as target:
+            shutil.copyfileobj(file.file, target, 1 << 20)
+        manager.import_snapshot(Path(path), mount=mount)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    finally:
+        os.unlink(path)
+    return KBStatus(**manager.status())
+
+
 @router.get("/kb/status", response_model=KBStatus)
-async def kb_status() -> KBStatus:
-    manager = IndexManager()
+@router.get("/kb/{kb_id}/status", response_model=KBStatus)
+async def kb_status(kb_id: str = DEFAULT_KB_ID) -> KBStatus:
+    manager = IndexManager(_kb_dir(kb_id))
     status = manager.status()
     return KBStatus(**status)
+
+
+@router.get("/kb/job", response_model=IndexJobStatus)
+@router.get("/kb/{kb_id}/job", response_model=IndexJobStatus)
+async def kb_job(kb_id: str = DEFAULT_KB_ID) -> IndexJobStatus:
+    _kb_dir(kb_id)
+    job = get_job(kb_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="No index job")
+    return IndexJobStatus(**job.status())
+
+
+@router.get("/kb/graph/entity/{name}", response_model=EntityNeighbourhood)
+@router.get("/kb/{kb_id}/graph/entity/{name}", response_model=EntityNeighbourhood)
+async def entity_neighbourhood(name: str, kb_id: str = DEFAULT_KB_ID, limit: int = 20) -> EntityNeighbourhood:
+    _kb_dir(kb_id)
+    index = get_index(kb_id)
+    if index is None:
+        raise HTTPException(status_code=400, detail="Index is not built")
+    shards = index.shards if isinstance(index, ShardedIndex) else [index]
+    chunks: List[str] = []
+    weights: Dict[str, float] = {}
+    found = False
+    for shard in shards:
+        graph = shard.graph
+        entity_id = graph.entity_id(name) if graph is not None else None
+        if entity_id is None:
+            continue
+        found = True
+        dead = shard.tombstones
+        chunks.extend(shard.chunk_ids[int(row)] for row in graph.chunks(entity_id) if dead is None or not dead[row])
+        for neighbour, weight in graph.neighbours(entity_id):
+            neighbour_name = graph.names[neighbour]
+            weights[neighbour_name] = weights.get(neighbour_name, 0.0) + weight
+    if not found:
+        raise HTTPException(status_code=404, detail="Entity not found")
+    ranked = sorted(weights.items(), key=lambda item: (-item[1], item[0]))[:limit]
+    return EntityNeighbourhood(
+        entity=name,
+        chunk_count=len(chunks),
+        chunks=chunks[:limit],
+        neighbours=[EntityNeighbour(entity=entity, weight=weight) for entity, weight in ranked],
+    )
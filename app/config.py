@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from typing import Optional
+
 from pydantic import BaseModel
 
 
@@ -7,11 +9,49 @@ class Settings(BaseModel):
     data_dir: str = "./data"
     max_input_chars: int = 20000
     embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"
+    embedding_batch_size: int = 64
+    embedding_workers: int = 1
     chunk_size: int = 500
     chunk_overlap: int = 80
+    chunk_strategy: str = "chars"
+    chunk_max_tokens: int = 128
+    chunk_overlap_sentences: int = 1
     top_k_default: int = 5
+    query_cache_size: int = 4096
+    prefilter_candidates: int = 0
+    prefilter_dims: int = 32
+    prefilter_method: str = "pca"
+    sentence_index: bool = False
+    evidence_sentences: int = 4
     nli_model: str = "facebook/bart-large-mnli"
     min_retrieval_score: float = 0.35
+    index_mmap: bool = False
+    index_pool_max_bytes: int = 2 * 1024 ** 3
+    index_shards: int = 1
+    shard_workers: int = 4
+    dedup_threshold: Optional[float] = None
+    dedup_num_perm: int = 128
+    compaction_threshold: float = 0.25
+    graph_candidates: bool = False
+    graph_hops: int = 1
+    graph_max_candidates: int = 2000
+    graph_fanout: int = 32
+    keyword_engine: str = "tfidf"
+    bm25_k1: float = 1.2
+    bm25_b: float = 0.75
+    bm25_top_n: int = 200
+    micro_batching: bool = False
+    batch_max_size: int = 32
+    batch_max_wait_ms: float = 3.0
+    document_batch_claims: int = 64
+    pipeline_queue_size: int = 4
+    pipeline_workers: int = 4
+    document_max_buffer_chars: int = 20000
+    gzip_min_bytes: int = 1024
+    openai_base_url: str = "https://api.openai.com/v1"
+    openai_model: str = "gpt-4o-mini"
+    openai_batch_claims: int = 8
+    openai_cache: bool = True
 
 
 settings = Settings()
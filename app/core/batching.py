@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Generic, List, Sequence, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class MicroBatcher(Generic[T, R]):
+    """Collects single items from many threads and runs them as one batched call.
+
+    A background thread waits for the first item, then keeps collecting until
+    `max_batch_size` items are queued or `max_wait_ms` has elapsed, calls
+    `fn(batch)` once and hands each caller its own result.
+    """
+
+    def __init__(self, fn: Callable[[List[T]], Sequence[R]], max_batch_size: int, max_wait_ms: float, name: str) -> None:
+        self.fn = fn
+        self.max_batch_size = max(max_batch_size, 1)
+        self.max_wait = max(max_wait_ms, 0.0) / 1000.0
+        self.name = name
+        self._queue: "queue.Queue[Tuple[T, Future]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._max_seen = 0
+        self._histogram: Dict[int, int] = {}
+        self._thread = threading.Thread(target=self._run, name=f"batcher-{name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, item: T) -> R:
+        future: Future = Future()
+        self._queue.put((item, future))
+        return future.result()
+
+    def submit_many(self, items: Sequence[T]) -> List[R]:
+        """Queue several items at once so they can share a batch, then wait for all of them."""
+        futures: List[Future] = []
+        for item in items:
+            future: Future = Future()
+            self._queue.put((item, future))
+            futures.append(future)
+        return [future.result() for future in futures]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "batches": self._batches,
+                "items": self._items,
+                "mean_batch_size": self._items / self._batches if self._batches else 0.0,
+                "max_batch_size": self._max_seen,
+                "batch_size_histogram": {str(k): v for k, v in sorted(self._histogram.items())},
+            }
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._record(len(batch))
+            items = [item for item, _ in batch]
+            try:
+                results = self.fn(items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"{self.name} batch returned {len(results)} results for {len(items)} items")
+            except Exception as exc:
+                logger.warning("Batch %s failed: %s", self.name, exc)
+                for _, future in batch:
+                    future.set_exception(exc)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def _record(self, size: int) -> None:
+        bucket = 1 << (size - 1).bit_length()
+        with self._lock:
+            self._batches += 1
+            self._items += size
+            self._max_seen = max(self._max_seen, size)
+            self._histogram[bucket] = self._histogram.get(bucket, 0) + 1
+
+
+_batchers: Dict[str, MicroBatcher] = {}
+_batchers_lock = threading.Lock()
+
+
+def get_batcher(key: str, fn: Callable[[List[T]], Sequence[R]], max_batch_size: int, max_wait_ms: float) -> MicroBatcher:
+    with _batchers_lock:
+        batcher = _batchers.get(key)
+        if batcher is None:
+            batcher = MicroBatcher(fn, max_batch_size, max_wait_ms, name=key)
+            _batchers[key] = batcher
+        return batcher
+
+
+def batching_stats() -> dict:
+    with _batchers_lock:
+        batchers = dict(_batchers)
+    return {key: batcher.stats() for key, batcher in batchers.items()}
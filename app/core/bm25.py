@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+# Same token pattern and stop words as the TF-IDF vectorizer, but without a vocabulary cap.
+_TOKEN_RE = re.compile(r"(?u)\b\w\w+\b")
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in ENGLISH_STOP_WORDS]
+
+
+@dataclass(frozen=True)
+class BM25Stats:
+    """Corpus-wide statistics, so shards built separately share one BM25 scale."""
+
+    doc_count: int
+    avgdl: float
+    document_frequency: Dict[str, int]
+
+    @classmethod
+    def from_texts(cls, texts: Sequence[str]) -> "BM25Stats":
+        document_frequency: Counter = Counter()
+        total_length = 0
+        for text in texts:
+            tokens = tokenize(text)
+            total_length += len(tokens)
+            document_frequency.update(set(tokens))
+        return cls(len(texts), total_length / len(texts) if texts else 0.0, dict(document_frequency))
+
+
+class BM25Index:
+    """BM25 over inverted postings with precomputed per-posting impacts.
+
+    Postings for term `t` are `doc_ids[indptr[t]:indptr[t + 1]]` (sorted) with the
+    matching BM25 contributions in `impacts`; `max_impacts[t]` bounds any document's
+    score from that term, which is what MaxScore pruning relies on.
+    """
+
+    def __init__(
+        self,
+        terms: Sequence[str],
+        indptr: np.ndarray,
+        doc_ids: np.ndarray,
+        impacts: np.ndarray,
+        max_impacts: np.ndarray,
+        doc_count: int,
+    ) -> None:
+        self.terms = terms
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.impacts = impacts
+        self.max_impacts = max_impacts
+        self.doc_count = doc_count
+        self.postings_scored = 0
+        self._term_ids: Optional[Dict[str, int]] = None
+
+    @classmethod
+    def build(
+        cls, texts: Sequence[str], k1: float = 1.2, b: float = 0.75, stats: Optional[BM25Stats] = None
+    ) -> "BM25Index":
+        """Build postings for `texts`; idf and length normalisation come from `stats` when given."""
+        term_ids: Dict[str, int] = {}
+        postings: List[List[Tuple[int, int]]] = []
+        doc_lengths = np.zeros(len(texts), dtype=np.float32)
+        for doc_id, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_lengths[doc_id] = sum(counts.values())
+            for term, tf in counts.items():
+                term_id = term_ids.setdefault(term, len(term_ids))
+                if term_id == len(postings):
+                    postings.append([])
+                postings[term_id].append((doc_id, tf))
+
+        avgdl = float(doc_lengths.mean()) if len(texts) else 0.0
+        doc_count = len(texts)
+        if stats is not None:
+            avgdl, doc_count = stats.avgdl, stats.doc_count
+        terms = list(term_ids)
+        indptr = np.zeros(len(postings) + 1, dtype=np.int64)
+        for term_id, plist in enumerate(postings):
+            indptr[term_id + 1] = indptr[term_id] + len(plist)
+        doc_ids = np.zeros(int(indptr[-1]), dtype=np.int32)
+        impacts = np.zeros(int(indptr[-1]), dtype=np.float32)
+        max_impacts = np.zeros(len(postings), dtype=np.float32)
+        for term_id, plist in enumerate(postings):
+            start, end = indptr[term_id], indptr[term_id + 1]
+            docs = np.fromiter((doc for doc, _ in plist), dtype=np.int32, count=len(plist))
+            tfs = np.fromiter((tf for _, tf in plist), dtype=np.float32, count=len(plist))
+            df = len(plist)
+            if stats is not None:
+                df = max(stats.document_frequency.get(terms[term_id], 0), df)
+            idf = np.log(1.0 + (max(doc_count, df) - df + 0.5) / (df + 0.5))
+            norm = k1 * (1.0 - b + b * doc_lengths[docs] / max(avgdl, 1e-8))
+            doc_ids[start:end] = docs
+            impacts[start:end] = idf * tfs * (k1 + 1.0) / (tfs + norm)
+            max_impacts[term_id] = impacts[start:end].max()
+        return cls(terms, indptr, doc_ids, impacts, max_impacts, len(texts))
+
+    def term_id(self, term: str) -> Optional[int]:
+        if self._term_ids is None:
+            self._term_ids = {t: idx for idx, t in enumerate(self.terms)}
+        return self._term_ids.get(term)
+
+    def search(self, query: str, top_n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the top-n (doc ids, scores) using term-at-a-time MaxScore pruning.
+
+        Terms are processed from highest to lowest score bound. Once the bound of the
+        remaining terms cannot lift an unseen document above the current n-th best
+        score, later postings only update existing candidates, and candidates that can
+        no longer reach the top-n are dropped.
+        """
+        term_ids = {tid for tid in (self.term_id(t) for t in tokenize(query)) if tid is not None}
+        empty = (np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32))
+        if not term_ids or top_n <= 0:
+            return empty
+        order = sorted(term_ids, key=lambda tid: -float(self.max_impacts[tid]))
+        remaining = float(sum(self.max_impacts[tid] for tid in order))
+        cand_docs, cand_scores = empty
+
+        for term_id in order:
+            start, end = int(self.indptr[term_id]), int(self.indptr[term_id + 1])
+            docs, impacts = self.doc_ids[start:end], self.impacts[start:end]
+            theta = _kth_largest(cand_scores, top_n)
+            if remaining > theta:
+                merged = np.concatenate([cand_docs, docs])
+                unique, inverse = np.unique(merged, return_inverse=True)
+                cand_scores = np.bincount(
+                    inverse, weights=np.concatenate([cand_scores, impacts]), minlength=len(unique)
+                ).astype(np.float32)
+                cand_docs = unique.astype(np.int32)
+                self.postings_scored += len(docs)
+            elif len(cand_docs):
+                # Only existing candidates can still make the top-n: probe them in this posting list.
+                positions = np.searchsorted(docs, cand_docs)
+                positions = np.minimum(positions, len(docs) - 1)
+                hits = docs[positions] == cand_docs
+                cand_scores = cand_scores + np.where(hits, impacts[positions], 0.0).astype(np.float32)
+                self.postings_scored += len(cand_docs)
+            remaining -= float(self.max_impacts[term_id])
+            theta = _kth_largest(cand_scores, top_n)
+            if theta > 0:
+                keep = cand_scores + remaining >= theta
+                cand_docs, cand_scores = cand_docs[keep], cand_scores[keep]
+
+        if len(cand_docs) > top_n:
+            top = np.argpartition(-cand_scores, top_n - 1)[:top_n]
+            cand_docs, cand_scores = cand_docs[top], cand_scores[top]
+        order_idx = np.argsort(-cand_scores, kind="stable")
+        return cand_docs[order_idx], cand_scores[order_idx]
+
+    def scores(self, query: str, top_n: int, size: int) -> np.ndarray:
+        """Dense keyword scores in [0, 1]: top-n BM25 scores divided by the best one, zero elsewhere."""
+        docs, scores = self.search(query, top_n)
+        return dense_scores(docs, scores, size, float(scores[0]) if len(scores) else 0.0)
+
+
+def dense_scores(docs: np.ndarray, scores: np.ndarray, size: int, best: float) -> np.ndarray:
+    dense = np.zeros(size, dtype=np.float32)
+    if len(docs) and best > 0:
+        dense[docs] = scores / best
+    return dense
+
+
+def merge_top_n(hits: Sequence[Tuple[np.ndarray, np.ndarray]], top_n: int) -> Tuple[List[Tuple[np.ndarray, np.ndarray]], float]:
+    """Cut per-shard search results to the corpus-wide top-n; returns them and the best score."""
+    all_scores = np.concatenate([scores for _, scores in hits]) if hits else np.zeros(0, dtype=np.float32)
+    if len(all_scores) == 0:
+        return list(hits), 0.0
+    theta = _kth_largest(all_scores, top_n)
+    cut = [(docs[scores >= theta], scores[scores >= theta]) for docs, scores in hits]
+    return cut, float(all_scores.max())
+
+
+def _kth_largest(values: np.ndarray, k: int) -> float:
+    if len(values) < k:
+        return 0.0
+    return float(np.partition(values, len(values) - k)[len(values) - k])
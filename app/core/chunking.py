@@ -1,7 +1,13 @@
 from __future__ import annotations
 
+import re
 from dataclasses import dataclass
-from typing import List
+from typing import Callable, List, Optional, Tuple
+
+from app.core.text_utils import SentenceSpan, split_sentences_with_offsets
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_WORD_RE = re.compile(r"\S+")
 
 
 @dataclass(frozen=True)
@@ -9,6 +15,10 @@ class Chunk:
     chunk_id: str
     source_file: str
     text: str
+    alternate_sources: Tuple[str, ...] = ()
+    # Character offsets of `text` in the source file; -1 when unknown.
+    start: int = -1
+    end: int = -1
 
 
 def chunk_text(text: str, source_file: str, chunk_size: int, overlap: int) -> List[Chunk]:
@@ -24,10 +34,84 @@ def chunk_text(text: str, source_file: str, chunk_size: int, overlap: int) -> Li
         chunk_text = text[start:end]
         if chunk_text.strip():
             chunk_id = f"{source_file}::{idx}"
-            chunks.append(Chunk(chunk_id=chunk_id, source_file=source_file, text=chunk_text))
+            chunks.append(Chunk(chunk_id=chunk_id, source_file=source_file, text=chunk_text, start=start, end=end))
             idx += 1
         if end == length:
             break
         start = max(end - overlap, 0)
 
     return chunks
+
+
+def approx_token_count(text: str) -> int:
+    """Words and punctuation marks: a cheap lower bound on subword tokenizer counts."""
+    return len(_TOKEN_RE.findall(text))
+
+
+def chunk_sentences(
+    text: str,
+    source_file: str,
+    max_tokens: int,
+    overlap_sentences: int = 0,
+    count_tokens: Optional[Callable[[str], int]] = None,
+) -> List[Chunk]:
+    """Pack whole sentences into chunks of at most `max_tokens` tokens.
+
+    Each chunk repeats the last `overlap_sentences` sentences of the previous one
+    (when they fit), so no sentence is cut and overlap costs whole sentences only.
+    A sentence longer than the budget is split between words. Chunk text is the
+    source slice from the first sentence's start to the last one's end.
+    """
+    if max_tokens <= 0:
+        return []
+    count_tokens = count_tokens or approx_token_count
+    pieces: List[Tuple[SentenceSpan, int]] = []
+    for sentence in split_sentences_with_offsets(text):
+        for piece in _fit_sentence(sentence, max_tokens, count_tokens):
+            pieces.append((piece, count_tokens(piece.text)))
+
+    chunks: List[Chunk] = []
+    current: List[Tuple[SentenceSpan, int]] = []
+    tokens = 0
+    for piece, piece_tokens in pieces:
+        if current and tokens + piece_tokens > max_tokens:
+            chunks.append(_make_chunk(text, source_file, len(chunks), current))
+            current = current[len(current) - min(overlap_sentences, len(current) - 1):] if overlap_sentences else []
+            tokens = sum(count for _, count in current)
+            while current and tokens + piece_tokens > max_tokens:
+                tokens -= current.pop(0)[1]
+        current.append((piece, piece_tokens))
+        tokens += piece_tokens
+    if current:
+        chunks.append(_make_chunk(text, source_file, len(chunks), current))
+    return chunks
+
+
+def _fit_sentence(sentence: SentenceSpan, max_tokens: int, count_tokens: Callable[[str], int]) -> List[SentenceSpan]:
+    if count_tokens(sentence.text) <= max_tokens:
+        return [sentence]
+    # Word counts are summed rather than recounted per prefix, which keeps long sentences linear.
+    pieces: List[SentenceSpan] = []
+    start = end = -1
+    tokens = 0
+    for word in _WORD_RE.finditer(sentence.text):
+        word_tokens = count_tokens(word.group())
+        if start >= 0 and tokens + word_tokens > max_tokens:
+            pieces.append(_sub_span(sentence, start, end))
+            start = -1
+        if start < 0:
+            start, tokens = word.start(), 0
+        end = word.end()
+        tokens += word_tokens
+    if start >= 0:
+        pieces.append(_sub_span(sentence, start, end))
+    return pieces
+
+
+def _sub_span(sentence: SentenceSpan, start: int, end: int) -> SentenceSpan:
+    return SentenceSpan(text=sentence.text[start:end], start=sentence.start + start, end=sentence.start + end)
+
+
+def _make_chunk(text: str, source_file: str, idx: int, pieces: List[Tuple[SentenceSpan, int]]) -> Chunk:
+    start, end = pieces[0][0].start, pieces[-1][0].end
+    return Chunk(chunk_id=f"{source_file}::{idx}", source_file=source_file, text=text[start:end], start=start, end=end)
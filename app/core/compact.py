@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import json
+from typing import Dict, List, Optional
+
+from app.core.highlight import Span
+from app.core.verification import EvidenceCache, best_evidence_span
+
+try:
+    import orjson
+except Exception:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+def compact_check_payload(input_text: str, spans: List[Span], summary: dict, debug: Optional[dict] = None) -> dict:
+    """Build the compact `/api/check` body as plain dicts.
+
+    Each chunk appears once in a request-level `evidence` table; spans reference it
+    by position and carry only the sentence of the chunk that best matches their
+    claim, with its offsets in the chunk text. Span claims are omitted because they
+    are `input_text[start:end]`.
+    """
+    cache = EvidenceCache()
+    table: List[dict] = []
+    refs: Dict[str, int] = {}
+    span_rows: List[dict] = []
+    for span in spans:
+        evidence = []
+        for chunk in span.evidence:
+            ref = refs.get(chunk.chunk_id)
+            if ref is None:
+                ref = refs[chunk.chunk_id] = len(table)
+                table.append(
+                    {
+                        "chunk_id": chunk.chunk_id,
+                        "source_file": chunk.source_file,
+                        "alternate_sources": list(chunk.alternate_sources),
+                        "source_start": chunk.source_start if chunk.source_start >= 0 else None,
+                        "source_end": chunk.source_end if chunk.source_end >= 0 else None,
+                    }
+                )
+            snippet = best_evidence_span(chunk.text, span.claim, cache)
+            evidence.append(
+                {
+                    "ref": ref,
+                    "score": chunk.score,
+                    "snippet": snippet.text,
+                    "snippet_start": snippet.start,
+                    "snippet_end": snippet.end,
+                }
+            )
+        span_rows.append(
+            {
+                "start": span.start,
+                "end": span.end,
+                "label": span.label,
+                "confidence": span.confidence,
+                "evidence": evidence,
+            }
+        )
+    return {
+        "format": "compact",
+        "input_text": input_text,
+        "evidence": table,
+        "spans": span_rows,
+        "summary": summary,
+        "debug": debug,
+    }
+
+
+def dumps(payload: dict) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
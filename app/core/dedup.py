@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import re
+import zlib
+from collections import defaultdict
+from dataclasses import replace
+from typing import Dict, List, Sequence, Set, Tuple
+
+import numpy as np
+
+from app.core.chunking import Chunk
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def shingles(text: str, size: int = 3) -> Set[int]:
+    tokens = _TOKEN_RE.findall(text.lower())
+    if len(tokens) < size:
+        grams = [" ".join(tokens)] if tokens else []
+    else:
+        grams = [" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)]
+    return {zlib.crc32(gram.encode("utf-8")) for gram in grams}
+
+
+class MinHasher:
+    def __init__(self, num_perm: int = 128, seed: int = 1) -> None:
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self._a = rng.randint(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+    def signature(self, features: Set[int]) -> np.ndarray:
+        if not features:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        values = np.fromiter(features, dtype=np.uint64, count=len(features))
+        hashed = (np.outer(values, self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return hashed.min(axis=0)
+
+
+def lsh_params(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """Pick (bands, rows) whose S-curve midpoint sits just below the threshold, favouring recall."""
+    best = (num_perm, 1)
+    best_gap = float("inf")
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        midpoint = (1.0 / bands) ** (1.0 / rows)
+        gap = threshold - midpoint
+        if 0 <= gap < best_gap:
+            best, best_gap = (bands, rows), gap
+    return best
+
+
+def dedup_chunks(chunks: Sequence[Chunk], threshold: float, num_perm: int = 128) -> Tuple[List[Chunk], int]:
+    """Collapse near-duplicate chunks (estimated Jaccard >= threshold) into their first occurrence.
+
+    Canonical chunks record the source files of the chunks folded into them in
+    `alternate_sources`. Returns the surviving chunks and the number removed.
+    """
+    if len(chunks) < 2:
+        return list(chunks), 0
+
+    hasher = MinHasher(num_perm)
+    features = [shingles(chunk.text) for chunk in chunks]
+    signatures = np.stack([hasher.signature(f) for f in features])
+    bands, rows = lsh_params(threshold, num_perm)
+
+    parent = list(range(len(chunks)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for band in range(bands):
+        buckets: Dict[bytes, List[int]] = defaultdict(list)
+        band_slice = signatures[:, band * rows:(band + 1) * rows]
+        for idx in range(len(chunks)):
+            if features[idx]:
+                buckets[band_slice[idx].tobytes()].append(idx)
+        for members in buckets.values():
+            first = members[0]
+            for other in members[1:]:
+                root_a, root_b = find(first), find(other)
+                if root_a == root_b:
+                    continue
+                similarity = float(np.mean(signatures[first] == signatures[other]))
+                if similarity >= threshold:
+                    parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    alternates: Dict[int, List[str]] = defaultdict(list)
+    for idx in range(len(chunks)):
+        root = find(idx)
+        if root != idx:
+            alternates[root].append(chunks[idx].source_file)
+
+    kept: List[Chunk] = []
+    for idx, chunk in enumerate(chunks):
+        if find(idx) != idx:
+            continue
+        extra = sorted(set(alternates.get(idx, [])) - {chunk.source_file})
+        kept.append(replace(chunk, alternate_sources=tuple(extra)) if extra else chunk)
+    return kept, len(chunks) - len(kept)
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.chunking import approx_token_count
+from app.core.retrieval import get_backend
+
+logger = logging.getLogger(__name__)
+
+
+class ThroughputMeter:
+    """Thread-safe counter of embedded chunks that derives chunks/sec and an ETA."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.total = 0
+        self.done = 0
+        self._started: Optional[float] = None
+
+    def add_total(self, count: int) -> None:
+        with self._lock:
+            self.total += count
+            if self._started is None:
+                self._started = time.monotonic()
+
+    def advance(self, count: int) -> None:
+        with self._lock:
+            self.done += count
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            elapsed = time.monotonic() - self._started if self._started is not None else 0.0
+            rate = self.done / elapsed if elapsed > 0 and self.done else 0.0
+            remaining = self.total - self.done
+            return {
+                "chunks_total": self.total,
+                "chunks_embedded": self.done,
+                "chunks_per_sec": round(rate, 2),
+                "eta_seconds": round(remaining / rate, 1) if rate else None,
+            }
+
+
+def length_batches(texts: Sequence[str], batch_size: int) -> List[np.ndarray]:
+    """Group row indices into batches of similar token length, longest first.
+
+    Sorting by length before slicing keeps padding inside each batch small, and
+    running the longest batch first surfaces memory limits early.
+    """
+    lengths = np.fromiter((len(text.split()) for text in texts), dtype=np.int64, count=len(texts))
+    order = np.argsort(-lengths, kind="stable")
+    size = max(batch_size, 1)
+    return [order[start:start + size] for start in range(0, len(order), size)]
+
+
+def token_counter(model_name: str) -> Callable[[str], int]:
+    """Count tokens with the embedding model's tokenizer, or approximately when it has none."""
+    tokenizer = getattr(getattr(get_backend(model_name), "model", None), "tokenizer", None)
+    if tokenizer is None:
+        return approx_token_count
+    return lambda text: len(tokenizer.tokenize(text))
+
+
+def _embed_batch(model_name: str, texts: List[str]) -> np.ndarray:
+    return np.asarray(get_backend(model_name).embed(texts), dtype=np.float32)
+
+
+def embed_corpus(
+    texts: Sequence[str],
+    model_name: str,
+    batch_size: int = 64,
+    workers: int = 1,
+    meter: Optional[ThroughputMeter] = None,
+) -> np.ndarray:
+    """Embed `texts` in length-bucketed mini-batches and return rows in input order.
+
+    With `workers > 1` batches are spread over that many processes, each holding
+    its own copy of the model.
+    """
+    meter = meter if meter is not None else ThroughputMeter()
+    meter.add_total(len(texts))
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    batches = length_batches(texts, batch_size)
+    payloads = [[texts[int(i)] for i in rows] for rows in batches]
+    output: Optional[np.ndarray] = None
+
+    def place(rows: np.ndarray, vectors: np.ndarray) -> None:
+        nonlocal output
+        if output is None:
+            output = np.zeros((len(texts), vectors.shape[1]), dtype=np.float32)
+        output[rows] = vectors
+        meter.advance(len(rows))
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for rows, vectors in zip(batches, pool.map(_embed_batch, [model_name] * len(payloads), payloads)):
+                place(rows, vectors)
+    else:
+        for rows, payload in zip(batches, payloads):
+            place(rows, _embed_batch(model_name, payload))
+    stats = meter.snapshot()
+    logger.info("Embedded %d chunks at %.1f chunks/sec", len(texts), stats["chunks_per_sec"])
+    return output
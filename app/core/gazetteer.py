@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Transition keys pack (state, code point) into one int64; code points are below 0x110000.
+_CODE_SPACE = 0x110000
+
+
+class Gazetteer:
+    """Aho-Corasick automaton over the entity names seen at index time.
+
+    The automaton is stored as flat arrays so it can be persisted and memory-mapped
+    with the rest of the index: `keys`/`targets` are the sorted goto transitions,
+    `fail` the failure links, `output` the entity id ending at each state (-1 for
+    none), `output_link` the nearest state on the failure chain with an output and
+    `depth` the length of each state's prefix. Entity ids are positions in `names`,
+    the same ids the index uses for its chunk entities and graph.
+    """
+
+    def __init__(
+        self,
+        names: Sequence[str],
+        keys: np.ndarray,
+        targets: np.ndarray,
+        fail: np.ndarray,
+        output: np.ndarray,
+        output_link: np.ndarray,
+        depth: np.ndarray,
+    ) -> None:
+        self.names = names
+        self.keys = keys
+        self.targets = targets
+        self.fail = fail
+        self.output = output
+        self.output_link = output_link
+        self.depth = depth
+        self._tables: Optional[Tuple[Dict[int, int], List[int], List[int], List[int], List[int]]] = None
+
+    @classmethod
+    def from_names(cls, names: Sequence[str]) -> "Gazetteer":
+        goto: List[Dict[int, int]] = [{}]
+        output = [-1]
+        depth = [0]
+        for entity_id, name in enumerate(names):
+            state = 0
+            for char in name:
+                code = ord(char)
+                next_state = goto[state].get(code)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][code] = next_state
+                    goto.append({})
+                    output.append(-1)
+                    depth.append(depth[state] + 1)
+                state = next_state
+            if name:
+                output[state] = entity_id
+
+        fail = [0] * len(goto)
+        output_link = [-1] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for code, child in goto[state].items():
+                fallback = fail[state]
+                while fallback and code not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[child] = goto[fallback].get(code, 0)
+                link = fail[child]
+                output_link[child] = link if output[link] >= 0 else output_link[link]
+                queue.append(child)
+
+        transitions = sorted(
+            (state * _CODE_SPACE + code, child) for state, edges in enumerate(goto) for code, child in edges.items()
+        )
+        return cls(
+            names=names,
+            keys=np.asarray([key for key, _ in transitions], dtype=np.int64),
+            targets=np.asarray([child for _, child in transitions], dtype=np.int32),
+            fail=np.asarray(fail, dtype=np.int32),
+            output=np.asarray(output, dtype=np.int32),
+            output_link=np.asarray(output_link, dtype=np.int32),
+            depth=np.asarray(depth, dtype=np.int32),
+        )
+
+    def _lookup_tables(self) -> Tuple[Dict[int, int], List[int], List[int], List[int], List[int]]:
+        if self._tables is None:
+            self._tables = (
+                dict(zip(self.keys.tolist(), self.targets.tolist())),
+                self.fail.tolist(),
+                self.output.tolist(),
+                self.output_link.tolist(),
+                self.depth.tolist(),
+            )
+        return self._tables
+
+    def match(self, text: str) -> np.ndarray:
+        """Sorted ids of the known entities in `text`, in one pass over its characters.
+
+        Matches must start and end on word boundaries; overlapping matches resolve to
+        the leftmost, then longest, name, as the capitalised-run extraction would.
+        """
+        goto, fail, output, output_link, depth = self._lookup_tables()
+        found: List[Tuple[int, int, int]] = []
+        state = 0
+        for pos, char in enumerate(text):
+            code = ord(char)
+            while state and state * _CODE_SPACE + code not in goto:
+                state = fail[state]
+            state = goto.get(state * _CODE_SPACE + code, 0)
+            node = state if output[state] >= 0 else output_link[state]
+            if node < 0:
+                continue
+            if pos + 1 < len(text) and text[pos + 1].isalnum():
+                continue
+            while node >= 0:
+                start = pos + 1 - depth[node]
+                if start == 0 or not text[start - 1].isalnum():
+                    found.append((start, -depth[node], output[node]))
+                node = output_link[node]
+
+        ids = []
+        covered = 0
+        for start, negative_length, entity_id in sorted(found):
+            if start >= covered:
+                ids.append(entity_id)
+                covered = start - negative_length
+        return np.unique(np.asarray(ids, dtype=np.int32))
@@ -1,7 +1,10 @@
 from __future__ import annotations
 
 import re
-from typing import List
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
 
 
 _ENTITY_RE = re.compile(r"\b([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\b")
@@ -23,3 +26,148 @@ def extract_entities(text: str) -> List[str]:
             continue
         entities.add(match)
     return sorted(entities)
+
+
+class EntityGraph:
+    """Entity co-occurrence graph stored as CSR arrays.
+
+    `chunk_*` maps entity id -> chunk rows that mention it; `neighbour_*` maps
+    entity id -> co-occurring entity ids, weighted by the number of shared chunks.
+    """
+
+    def __init__(
+        self,
+        names: Sequence[str],
+        chunk_indptr: np.ndarray,
+        chunk_indices: np.ndarray,
+        neighbour_indptr: np.ndarray,
+        neighbour_indices: np.ndarray,
+        neighbour_weights: np.ndarray,
+    ) -> None:
+        self.names = names
+        self.chunk_indptr = chunk_indptr
+        self.chunk_indices = chunk_indices
+        self.neighbour_indptr = neighbour_indptr
+        self.neighbour_indices = neighbour_indices
+        self.neighbour_weights = neighbour_weights
+        self._ids: Optional[Dict[str, int]] = None
+
+    @classmethod
+    def from_chunk_entities(cls, indptr: np.ndarray, ids: np.ndarray, names: Sequence[str]) -> "EntityGraph":
+        chunk_count = max(len(indptr) - 1, 0)
+        incidence = sparse.csr_matrix(
+            (np.ones(len(ids), dtype=np.float32), np.asarray(ids, dtype=np.int32), np.asarray(indptr, dtype=np.int64)),
+            shape=(chunk_count, len(names)),
+        )
+        by_entity = incidence.T.tocsr()
+        cooccurrence = (by_entity @ incidence).tocsr()
+        cooccurrence.setdiag(0)
+        cooccurrence.eliminate_zeros()
+        by_entity.sort_indices()
+        cooccurrence.sort_indices()
+        return cls(
+            names=names,
+            chunk_indptr=by_entity.indptr.astype(np.int64),
+            chunk_indices=by_entity.indices.astype(np.int32),
+            neighbour_indptr=cooccurrence.indptr.astype(np.int64),
+            neighbour_indices=cooccurrence.indices.astype(np.int32),
+            neighbour_weights=cooccurrence.data.astype(np.float32),
+        )
+
+    def entity_id(self, name: str) -> Optional[int]:
+        if self._ids is None:
+            self._ids = {entity: idx for idx, entity in enumerate(self.names)}
+        return self._ids.get(name)
+
+    def chunks(self, entity_id: int) -> np.ndarray:
+        return self.chunk_indices[self.chunk_indptr[entity_id]:self.chunk_indptr[entity_id + 1]]
+
+    def mention_counts(self, entity_ids: np.ndarray, size: int) -> np.ndarray:
+        """Per-row count of the given entity ids, read off their chunk postings."""
+        postings = [self.chunks(int(entity_id)) for entity_id in entity_ids]
+        if not postings:
+            return np.zeros(size, dtype=np.float32)
+        return np.bincount(np.concatenate(postings), minlength=size)[:size].astype(np.float32)
+
+    def neighbours(self, entity_id: int, limit: Optional[int] = None) -> List[Tuple[int, float]]:
+        start, end = int(self.neighbour_indptr[entity_id]), int(self.neighbour_indptr[entity_id + 1])
+        indices = self.neighbour_indices[start:end]
+        weights = self.neighbour_weights[start:end]
+        order = np.argsort(-weights, kind="stable")
+        if limit is not None:
+            order = order[:limit]
+        return [(int(indices[i]), float(weights[i])) for i in order]
+
+    def candidate_chunks(
+        self, entities: Iterable[str], hops: int = 1, max_candidates: int = 2000, fanout: int = 32
+    ) -> Optional[np.ndarray]:
+        """Chunk rows reachable from the claim's entities within `hops` co-occurrence steps.
+
+        Chunks of closer entities are taken first until `max_candidates` is reached.
+        Returns None when none of the entities are in the graph.
+        """
+        names_by_hop = expand_entities([self], entities, hops, max_candidates, fanout)
+        if names_by_hop is None:
+            return None
+        return self.chunks_for(names_by_hop, max_candidates)
+
+    def chunks_for(self, names_by_hop: Sequence[Sequence[str]], max_candidates: int = 2000) -> np.ndarray:
+        """Chunk rows mentioning the given entities; names unknown to this graph are skipped."""
+        selected = [
+            self.chunks(entity_id)
+            for names in names_by_hop
+            for entity_id in (self.entity_id(name) for name in names)
+            if entity_id is not None
+        ]
+        candidates = np.concatenate(selected) if selected else np.zeros(0, dtype=np.int32)
+        _, first = np.unique(candidates, return_index=True)
+        # Keep discovery order so truncation drops the most distant chunks.
+        return np.sort(candidates[np.sort(first)][:max_candidates])
+
+
+def expand_entities(
+    graphs: Sequence[EntityGraph],
+    entities: Iterable[str],
+    hops: int = 1,
+    max_candidates: int = 2000,
+    fanout: int = 32,
+) -> Optional[List[List[str]]]:
+    """Entity names reachable from `entities`, grouped by hop, across one or more graphs.
+
+    Neighbour weights are summed over all graphs, so the shards of one corpus expand a
+    claim the same way the unsharded graph would. Expansion stops once the entities
+    found cover `max_candidates` chunks. Returns None when no entity is in any graph.
+    """
+    frontier = [name for name in entities if any(graph.entity_id(name) is not None for graph in graphs)]
+    if not frontier:
+        return None
+    seen = set(frontier)
+    names_by_hop: List[List[str]] = []
+    total = 0
+    for hop in range(hops + 1):
+        names_by_hop.append(frontier)
+        for graph in graphs:
+            for name in frontier:
+                entity_id = graph.entity_id(name)
+                if entity_id is not None:
+                    total += len(graph.chunks(entity_id))
+        if total >= max_candidates or hop == hops:
+            break
+        next_frontier: List[str] = []
+        for name in frontier:
+            weights: Dict[str, float] = {}
+            for graph in graphs:
+                entity_id = graph.entity_id(name)
+                if entity_id is None:
+                    continue
+                for neighbour, weight in graph.neighbours(entity_id):
+                    neighbour_name = graph.names[neighbour]
+                    weights[neighbour_name] = weights.get(neighbour_name, 0.0) + weight
+            for neighbour_name, _ in sorted(weights.items(), key=lambda item: -item[1])[:fanout]:
+                if neighbour_name not in seen:
+                    seen.add(neighbour_name)
+                    next_frontier.append(neighbour_name)
+        if not next_frontier:
+            break
+        frontier = next_frontier
+    return names_by_hop
@@ -15,6 +15,33 @@ class KBStatus(BaseModel):
     chunk_count: int
     last_indexed: Optional[str]
     embedding_model: Optional[str]
+    duplicates_removed: Optional[int] = None
+    tombstoned_chunks: int = 0
+
+
+class IndexJobStatus(BaseModel):
+    kb_id: str
+    kind: str
+    state: str
+    error: Optional[str] = None
+    started_at: str
+    finished_at: Optional[str] = None
+    chunks_total: int
+    chunks_embedded: int
+    chunks_per_sec: float
+    eta_seconds: Optional[float] = None
+
+
+class EntityNeighbour(BaseModel):
+    entity: str
+    weight: float
+
+
+class EntityNeighbourhood(BaseModel):
+    entity: str
+    chunk_count: int
+    chunks: List[str]
+    neighbours: List[EntityNeighbour]
 
 
 class EvidenceItem(BaseModel):
@@ -22,6 +49,10 @@ class EvidenceItem(BaseModel):
     chunk_id: str
     text: str
     score: float
+    alternate_sources: List[str] = []
+    # Offsets of `text` in `source_file`, when the index recorded them.
+    source_start: Optional[int] = None
+    source_end: Optional[int] = None
 
 
 class SpanResult(BaseModel):
@@ -38,6 +69,8 @@ class CheckRequest(BaseModel):
     top_k: int = 5
     mode: str = Field("local", pattern="^(local|heuristic|openai)$")
     return_debug: bool = False
+    response_format: str = Field("full", pattern="^(full|compact)$")
+    kb_id: Optional[str] = Field(None, pattern="^[a-zA-Z0-9_-]{1,64}$")
 
 
 class CheckResponse(BaseModel):
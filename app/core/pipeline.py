@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.config import settings
+from app.core.retrieval import RetrievedChunk, retrieve
+from app.core.text_utils import SentenceSpan, normalize_claim
+from app.core.verification import (
+    LABEL_CONTRADICTED,
+    LABEL_NEI,
+    LABEL_SUPPORTED,
+    EvidenceCache,
+    VerificationResult,
+    verify_with_heuristics,
+    verify_with_local_nli,
+)
+from app.llm.openai_client import OpenAIClient
+
+logger = logging.getLogger(__name__)
+
+
+Retrieved = Tuple[str, str, List[RetrievedChunk]]
+
+_retrieval_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_DONE = object()
+
+
+def check_claims(
+    claims: Sequence[SentenceSpan],
+    index,
+    top_k: int,
+    mode: str,
+    openai_client: Optional[OpenAIClient] = None,
+) -> Tuple[List[VerificationResult], List[List[RetrievedChunk]]]:
+    """Retrieve and verify each distinct claim once, then fan results back out per span.
+
+    Claims are grouped by their normalised text; all claims in the request share
+    one EvidenceCache so per-chunk work is reused across them. Retrieval runs
+    ahead of verification on a worker thread (see `_retrieve_ahead`), so later
+    claims are retrieved while earlier ones are being judged. In `openai` mode the
+    distinct claims are judged `openai_batch_claims` at a time.
+    """
+    openai_client = openai_client or OpenAIClient()
+    cache = EvidenceCache()
+    keys = [normalize_claim(claim.text) or claim.text for claim in claims]
+    distinct: Dict[str, str] = {}
+    for claim, key in zip(claims, keys):
+        distinct.setdefault(key, claim.text)
+    retrieved = _retrieve_ahead(distinct, index, top_k)
+    if mode == "openai" and openai_client.enabled():
+        outcomes = _judge_batched(retrieved, index, top_k, openai_client, cache)
+    else:
+        outcomes = {
+            key: _check_claim(text, index, top_k, mode, openai_client, cache, chunks)
+            for key, text, chunks in retrieved
+        }
+    if len(outcomes) < len(claims):
+        logger.info("Checked %d distinct claims for %d spans", len(outcomes), len(claims))
+    results = [outcomes[key][0] for key in keys]
+    evidence_sets = [outcomes[key][1] for key in keys]
+    return results, evidence_sets
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _retrieval_executor
+    with _executor_lock:
+        if _retrieval_executor is None:
+            _retrieval_executor = ThreadPoolExecutor(
+                max_workers=max(settings.pipeline_workers, 1), thread_name_prefix="retrieval"
+            )
+        return _retrieval_executor
+
+
+def _retrieve_ahead(distinct: Dict[str, str], index, top_k: int) -> Iterator[Retrieved]:
+    """Yield `(key, text, retrieved)` per distinct claim, in order.
+
+    A worker retrieves into a queue of `pipeline_queue_size` claims and blocks when
+    it is full, so it stays at most that far ahead of verification. A queue size of
+    0, or a single claim, retrieves inline.
+    """
+    depth = settings.pipeline_queue_size
+    if depth <= 0 or len(distinct) < 2:
+        for key, text in distinct.items():
+            yield key, text, retrieve(text, index, top_k)
+        return
+
+    handoff: "queue.Queue" = queue.Queue(maxsize=depth)
+    stopped = threading.Event()
+
+    def put(item) -> bool:
+        while not stopped.is_set():
+            try:
+                handoff.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for key, text in distinct.items():
+                if not put((key, text, retrieve(text, index, top_k))):
+                    return
+        except BaseException as exc:
+            put(exc)
+            return
+        put(_DONE)
+
+    _executor().submit(produce)
+    try:
+        while True:
+            item = handoff.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        # Unblocks the worker if verification failed or the caller stopped early.
+        stopped.set()
+
+
+def _judge_batched(
+    retrieved: Iterator[Retrieved],
+    index,
+    top_k: int,
+    openai_client: OpenAIClient,
+    cache: EvidenceCache,
+) -> Dict[str, Tuple[VerificationResult, List[RetrievedChunk]]]:
+    outcomes: Dict[str, Tuple[VerificationResult, List[RetrievedChunk]]] = {}
+    batch: List[Retrieved] = []
+    batch_size = max(settings.openai_batch_claims, 1)
+    for key, text, chunks in retrieved:
+        if not chunks or chunks[0].score < settings.min_retrieval_score:
+            outcomes[key] = VerificationResult(label=LABEL_NEI, confidence=0.2), chunks
+            continue
+        batch.append((key, text, chunks))
+        if len(batch) == batch_size:
+            outcomes.update(_judge_batch(batch, index, top_k, openai_client, cache))
+            batch = []
+    if batch:
+        outcomes.update(_judge_batch(batch, index, top_k, openai_client, cache))
+    return outcomes
+
+
+def _judge_batch(
+    batch: List[Retrieved],
+    index,
+    top_k: int,
+    openai_client: OpenAIClient,
+    cache: EvidenceCache,
+) -> Dict[str, Tuple[VerificationResult, List[RetrievedChunk]]]:
+    outcomes: Dict[str, Tuple[VerificationResult, List[RetrievedChunk]]] = {}
+    evidence: Dict[str, str] = {}
+    for _, _, chunks in batch:
+        for r in chunks:
+            evidence.setdefault(r.chunk_id, f"[{r.source_file}] {r.text}")
+    verdicts = openai_client.judge_claims([(text, [r.chunk_id for r in chunks]) for _, text, chunks in batch], evidence)
+    for (key, text, chunks), verdict in zip(batch, verdicts):
+        result = _verdict_result(verdict)
+        if result is None:
+            logger.info("No batched verdict for a claim; judging it on its own")
+            outcomes[key] = _check_claim(text, index, top_k, "openai", openai_client, cache, chunks)
+        else:
+            outcomes[key] = result, chunks
+    return outcomes
+
+
+def _verdict_result(verdict: Optional[dict]) -> Optional[VerificationResult]:
+    if not verdict:
+        return None
+    label = str(verdict.get("label", LABEL_NEI)).upper()
+    if label not in {LABEL_SUPPORTED, LABEL_CONTRADICTED, LABEL_NEI}:
+        label = LABEL_NEI
+    confidence = float(verdict.get("confidence", 0.5))
+    return VerificationResult(label=label, confidence=confidence)
+
+
+def _check_claim(
+    claim: str,
+    index,
+    top_k: int,
+    mode: str,
+    openai_client: OpenAIClient,
+    cache: EvidenceCache,
+    retrieved: Optional[List[RetrievedChunk]] = None,
+) -> Tuple[VerificationResult, List[RetrievedChunk]]:
+    if retrieved is None:
+        retrieved = retrieve(claim, index, top_k)
+    if not retrieved or retrieved[0].score < settings.min_retrieval_score:
+        return VerificationResult(label=LABEL_NEI, confidence=0.2), retrieved
+    if mode == "openai" and openai_client.enabled():
+        evidence_text = "\n\n".join([f"[{r.source_file}] {r.text}" for r in retrieved])
+        result = _verdict_result(openai_client.judge_claim(claim, evidence_text))
+        if result is not None:
+            return result, retrieved
+    if mode == "heuristic":
+        return verify_with_heuristics(claim, retrieved, cache), retrieved
+    return verify_with_local_nli(claim, retrieved, settings.nli_model, cache), retrieved
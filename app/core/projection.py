@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+from typing import Optional
+
+import numpy as np
+
+# Rows scored per block, so float16 rows are upcast a bounded slice at a time.
+_BLOCK_ROWS = 65536
+
+
+class Projection:
+    """Low-dimensional copy of the chunk embeddings for a coarse semantic pass.
+
+    `components` maps unit-normalised embeddings to `dims` dimensions, either the
+    top right singular vectors of the corpus (PCA without centering, which best
+    preserves dot products) or a scaled Gaussian random projection. `reduced`
+    holds every row projected, as float16.
+    """
+
+    def __init__(self, components: np.ndarray, reduced: np.ndarray) -> None:
+        self.components = components
+        self.reduced = reduced
+
+    @classmethod
+    def build(
+        cls,
+        embeddings: np.ndarray,
+        norms: np.ndarray,
+        dims: int,
+        method: str = "pca",
+        sample: int = 20000,
+        seed: int = 0,
+    ) -> Optional["Projection"]:
+        """Fit a projection, or None when the embeddings are already this small."""
+        if embeddings.size == 0 or dims <= 0 or dims >= embeddings.shape[1]:
+            return None
+        rng = np.random.default_rng(seed)
+        unit = np.asarray(embeddings, dtype=np.float32) / (np.asarray(norms, dtype=np.float32)[:, None] + 1e-8)
+        if method == "random":
+            components = rng.standard_normal((unit.shape[1], dims)).astype(np.float32) / np.sqrt(dims)
+        elif method == "pca":
+            rows = unit if len(unit) <= sample else unit[rng.choice(len(unit), sample, replace=False)]
+            _, _, vt = np.linalg.svd(rows, full_matrices=False)
+            components = np.ascontiguousarray(vt[:dims].T, dtype=np.float32)
+        else:
+            raise ValueError(f"Unknown projection method {method!r}")
+        return cls(components, (unit @ components).astype(np.float16))
+
+    def coarse_scores(self, query_vec: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        query = np.asarray(query_vec, dtype=np.float32).reshape(-1)
+        reduced_query = (query / (np.linalg.norm(query) + 1e-8)) @ self.components
+        count = len(self.reduced) if rows is None else len(rows)
+        scores = np.empty(count, dtype=np.float32)
+        for start in range(0, count, _BLOCK_ROWS):
+            stop = min(start + _BLOCK_ROWS, count)
+            block = self.reduced[start:stop] if rows is None else self.reduced[rows[start:stop]]
+            scores[start:stop] = np.asarray(block, dtype=np.float32) @ reduced_query
+        return scores
+
+    def candidates(self, query_vec: np.ndarray, count: int, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Sorted row ids of the `count` best coarse scores, among `rows` when given."""
+        scores = self.coarse_scores(query_vec, rows)
+        if count < len(scores):
+            best = np.argpartition(-scores, count - 1)[:count]
+        else:
+            best = np.arange(len(scores))
+        picked = best if rows is None else np.asarray(rows)[best]
+        return np.sort(picked)
+
+
+def recall_at_k(
+    embeddings: np.ndarray,
+    norms: np.ndarray,
+    projection: Projection,
+    queries: np.ndarray,
+    candidates: int,
+    top_k: int = 10,
+) -> float:
+    """Share of the exact cosine top-k that the coarse stage keeps among its `candidates`."""
+    unit = np.asarray(embeddings, dtype=np.float32) / (np.asarray(norms, dtype=np.float32)[:, None] + 1e-8)
+    found = total = 0
+    for query in np.asarray(queries, dtype=np.float32):
+        exact = np.argsort(-(unit @ (query / (np.linalg.norm(query) + 1e-8))), kind="stable")[:top_k]
+        kept = projection.candidates(query, candidates)
+        found += int(np.isin(exact, kept).sum())
+        total += len(exact)
+    return found / total if total else 1.0
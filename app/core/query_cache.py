@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class QueryCache:
+    """Bounded LRU of per-query features, keyed by `(kind, scope, text)`.
+
+    `kind` names the feature (embedding, tfidf, entities) and `scope` what it depends
+    on (the model, or the index version for TF-IDF), so a rebuilt index never sees
+    vectors from an old vocabulary. Hits and misses are counted per kind.
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, Hashable, str], Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits: Dict[str, int] = {}
+        self._misses: Dict[str, int] = {}
+
+    def get_or_compute(self, kind: str, scope: Hashable, text: str, compute: Callable[[], Any]) -> Any:
+        if self.max_entries <= 0:
+            return compute()
+        key = (kind, scope, text)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._hits[kind] = self._hits.get(kind, 0) + 1
+                return self._entries[key]
+            self._misses[kind] = self._misses.get(kind, 0) + 1
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            kinds = sorted(set(self._hits) | set(self._misses))
+            per_kind = {}
+            for kind in kinds:
+                hits, misses = self._hits.get(kind, 0), self._misses.get(kind, 0)
+                per_kind[kind] = {"hits": hits, "misses": misses, "hit_rate": hits / (hits + misses)}
+            hits, misses = sum(self._hits.values()), sum(self._misses.values())
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+                "by_kind": per_kind,
+            }
@@ -1,13 +1,26 @@
 from __future__ import annotations
 
+import heapq
 import logging
-from dataclasses import dataclass
-from typing import List, Tuple
+import threading
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from typing import Any, Dict, List, Optional, Tuple
 
 import numpy as np
+from scipy import sparse
 from sklearn.feature_extraction.text import TfidfVectorizer
 
-from app.core.graph import extract_entities
+from app.config import settings
+from app.core.batching import get_batcher
+from app.core.bm25 import BM25Index, dense_scores, merge_top_n
+from app.core.gazetteer import Gazetteer
+from app.core.graph import EntityGraph, expand_entities, extract_entities
+from app.core.projection import Projection
+from app.core.query_cache import QueryCache
+from app.core.sentences import ScoredSentence, SentenceIndex
+from app.kb.mapped import CSRLists
 try:
     from sentence_transformers import SentenceTransformer
 except Exception:  # pragma: no cover - optional import failure
@@ -24,22 +37,46 @@ class RetrievedChunk:
     score: float
     semantic_score: float
     keyword_score: float
+    alternate_sources: Tuple[str, ...] = ()
+    # Position of the chunk in its source file; -1 when the index predates offsets.
+    source_start: int = -1
+    source_end: int = -1
+    # Sentences of `text` scored against the query; empty when the index has no sentence index.
+    sentences: Tuple[ScoredSentence, ...] = ()
 
 
 @dataclass
 class IndexData:
-    chunk_ids: List[str]
-    source_files: List[str]
-    texts: List[str]
+    chunk_ids: Sequence[str]
+    source_files: Sequence[str]
+    texts: Sequence[str]
     embeddings: np.ndarray
     embedding_model: str
 
     tfidf_vectorizer: TfidfVectorizer
-    tfidf_matrix: np.ndarray
-    chunk_entities: List[List[str]]
+    tfidf_matrix: Any
+    chunk_entities: Sequence[List[str]]
+    index_version: str = ""
+    embedding_norms: Optional[np.ndarray] = None
+    alternate_sources: Optional[Sequence[List[str]]] = None
+    graph: Optional[EntityGraph] = None
+    bm25: Optional[BM25Index] = None
+    # True for rows of deleted or replaced files, masked out until the index is compacted.
+    tombstones: Optional[np.ndarray] = None
+    # Matches query text against the entity names of this index; None falls back to extract_entities.
+    gazetteer: Optional[Gazetteer] = None
+    # (start, end) character offsets of each chunk in its source file.
+    chunk_offsets: Optional[np.ndarray] = None
+    # Reduced-dimension embeddings for the coarse semantic stage.
+    projection: Optional[Projection] = None
+    # Per-sentence offsets and embeddings used to pick evidence sentences for verification.
+    sentences: Optional[SentenceIndex] = None
 
 
 _backend_cache: dict[str, "EmbeddingBackend"] = {}
+_backend_lock = threading.Lock()
+_query_cache = QueryCache(settings.query_cache_size)
+_embed_lock = threading.Lock()
 
 
 class EmbeddingBackend:
@@ -49,64 +86,361 @@ class EmbeddingBackend:
         self.model = SentenceTransformer(model_name)
 
     def embed(self, texts: List[str]) -> np.ndarray:
-        vectors = self.model.encode(texts, show_progress_bar=False)
+        # Callers size their batches (see app.core.embedding), so encode them in one pass.
+        vectors = self.model.encode(texts, batch_size=max(len(texts), 1), show_progress_bar=False)
         return np.asarray(vectors, dtype=np.float32)
 
 
-def build_tfidf(texts: List[str]) -> Tuple[TfidfVectorizer, np.ndarray]:
-    vectorizer = TfidfVectorizer(stop_words="english", max_features=5000)
+def build_tfidf(texts: Sequence[str]) -> Tuple[TfidfVectorizer, sparse.csr_matrix]:
+    vectorizer = TfidfVectorizer(stop_words="english", max_features=5000, dtype=np.float32)
     if not texts:
         vectorizer.fit(["placeholdertoken"])
-        matrix = np.zeros((0, len(vectorizer.get_feature_names_out())), dtype=np.float32)
+        matrix = sparse.csr_matrix((0, len(vectorizer.get_feature_names_out())), dtype=np.float32)
         return vectorizer, matrix
-    matrix = vectorizer.fit_transform(texts).toarray()
+    matrix = vectorizer.fit_transform(texts).tocsr()
     return vectorizer, matrix
 
 
+def tfidf_state(vectorizer: TfidfVectorizer) -> Tuple[Dict[str, int], np.ndarray]:
+    vocab = {term: int(col) for term, col in vectorizer.vocabulary_.items()}
+    return vocab, np.asarray(vectorizer.idf_, dtype=np.float32)
+
+
+def tfidf_from_state(vocab: Dict[str, int], idf: np.ndarray) -> TfidfVectorizer:
+    """Rebuild a fitted vectorizer from its persisted vocabulary and idf weights."""
+    vectorizer = TfidfVectorizer(stop_words="english", vocabulary=vocab, dtype=np.float32)
+    vectorizer.idf_ = np.asarray(idf, dtype=np.float64)
+    return vectorizer
+
+
 def cosine_sim(a: np.ndarray, b: np.ndarray) -> np.ndarray:
     a_norm = a / (np.linalg.norm(a, axis=1, keepdims=True) + 1e-8)
     b_norm = b / (np.linalg.norm(b, axis=1, keepdims=True) + 1e-8)
     return np.dot(a_norm, b_norm.T)
 
 
-def retrieve(query: str, index: IndexData, top_k: int) -> List[RetrievedChunk]:
-    if index.embeddings.size == 0:
-        return []
+def embedding_norms(embeddings: np.ndarray) -> np.ndarray:
+    if embeddings.size == 0:
+        return np.zeros(len(embeddings), dtype=np.float32)
+    return np.sqrt(np.einsum("ij,ij->i", embeddings, embeddings)).astype(np.float32)
+
+
+def _semantic_scores(query_vec: np.ndarray, index: IndexData, rows: Optional[np.ndarray] = None) -> np.ndarray:
+    embeddings = index.embeddings if rows is None else index.embeddings[rows]
+    if index.embedding_norms is None:
+        return cosine_sim(query_vec, embeddings)[0]
+    norms = index.embedding_norms if rows is None else index.embedding_norms[rows]
+    query = query_vec[0] / (np.linalg.norm(query_vec[0]) + 1e-8)
+    return (embeddings @ query) / (norms + 1e-8)
+
+
+def _keyword_scores(query_tfidf, matrix, rows: Optional[np.ndarray] = None) -> np.ndarray:
+    if rows is not None:
+        matrix = matrix[rows]
+    if sparse.issparse(matrix):
+        # Rows are already l2-normalised by the vectorizer, so cosine is a sparse dot.
+        query = sparse.csr_matrix(query_tfidf)
+        return np.asarray((matrix @ query.T).toarray()).ravel()
+    return cosine_sim(np.asarray(query_tfidf.toarray()), matrix)[0]
+
+
+@dataclass(frozen=True)
+class QueryFeatures:
+    text: str
+    embedding: np.ndarray
+    tfidf: Any
+    entities: frozenset
+    # Graph expansion shared by every shard; None means each index expands on its own.
+    entity_hops: Optional[List[List[str]]] = None
+
+
+class ShardedIndex:
+    """An index partitioned into independently built shards sharing one TF-IDF vocabulary."""
 
-    claim_entities = set(extract_entities(query))
-    backend = _backend_cache.get(index.embedding_model)
+    def __init__(self, shards: List[IndexData], index_version: str = "", workers: int = 4) -> None:
+        self.shards = shards
+        self.index_version = index_version
+        self.workers = max(workers, 1)
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="shard")
+        return self._executor
+
+    @property
+    def embedding_model(self) -> str:
+        return self.shards[0].embedding_model if self.shards else ""
+
+    @property
+    def texts(self) -> Sequence[str]:
+        return _ChainedSequence([shard.texts for shard in self.shards])
+
+    @property
+    def chunk_ids(self) -> Sequence[str]:
+        return _ChainedSequence([shard.chunk_ids for shard in self.shards])
+
+
+class _ChainedSequence(Sequence):
+    def __init__(self, parts: List[Sequence]) -> None:
+        self._parts = parts
+
+    def __len__(self) -> int:
+        return sum(len(part) for part in self._parts)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        for part in self._parts:
+            if idx < len(part):
+                return part[idx]
+            idx -= len(part)
+        raise IndexError(idx)
+
+
+def get_backend(model_name: str) -> "EmbeddingBackend":
+    backend = _backend_cache.get(model_name)
     if backend is None:
-        backend = EmbeddingBackend(index.embedding_model)
-        _backend_cache[index.embedding_model] = backend
-    query_vec = backend.embed([query])
-    semantic_scores = cosine_sim(query_vec, index.embeddings)[0]
+        with _backend_lock:
+            backend = _backend_cache.get(model_name)
+            if backend is None:
+                backend = EmbeddingBackend(model_name)
+                _backend_cache[model_name] = backend
+    return backend
+
+
+def embed_query(query: str, model_name: str) -> np.ndarray:
+    if not settings.micro_batching:
+        # Requests run on threadpool workers; without a batcher thread the model sees one call at a time.
+        with _embed_lock:
+            return get_backend(model_name).embed([query])
+    batcher = get_batcher(
+        f"embed:{model_name}",
+        lambda texts: list(get_backend(model_name).embed(texts)),
+        settings.batch_max_size,
+        settings.batch_max_wait_ms,
+    )
+    return np.asarray([batcher.submit(query)], dtype=np.float32)
+
+
+def encode_query(query: str, index: IndexData, entity_indexes: Optional[Sequence[IndexData]] = None) -> QueryFeatures:
+    """Embed, vectorise and entity-match a query; `entity_indexes` defaults to `[index]`."""
+    # Only whitespace is normalised, so cached features equal freshly computed ones.
+    text = " ".join(query.split())
+    # In-memory indexes have no version; their vectorizer object identifies the vocabulary instead.
+    vocabulary = index.index_version or id(index.tfidf_vectorizer)
+    embedding = _query_cache.get_or_compute(
+        "embedding", index.embedding_model, text, lambda: _frozen(embed_query(text, index.embedding_model))
+    )
+    return QueryFeatures(
+        text=query,
+        embedding=embedding,
+        tfidf=_query_cache.get_or_compute("tfidf", vocabulary, text, lambda: index.tfidf_vectorizer.transform([text])),
+        entities=query_entities(text, entity_indexes or [index]),
+    )
+
 
-    query_tfidf = index.tfidf_vectorizer.transform([query]).toarray()
-    keyword_scores = cosine_sim(query_tfidf, index.tfidf_matrix)[0]
+def query_entities(text: str, indexes: Sequence[IndexData]) -> frozenset:
+    """Names of the entities in `text` known to any of `indexes`.
+
+    Indexes without a gazetteer (legacy or in-memory ones) fall back to regex
+    extraction, which also yields names the index has never seen.
+    """
+    names = set()
+    for index in indexes:
+        ids = _query_entity_ids(text, index)
+        if ids is None:
+            names.update(_query_cache.get_or_compute("entities", None, text, lambda: frozenset(extract_entities(text))))
+        else:
+            names.update(index.gazetteer.names[int(entity_id)] for entity_id in ids)
+    return frozenset(names)
+
+
+def _query_entity_ids(text: str, index: IndexData) -> Optional[np.ndarray]:
+    if index.gazetteer is None:
+        return None
+    text = " ".join(text.split())
+    scope = index.index_version or id(index.gazetteer)
+    return _query_cache.get_or_compute("entity_ids", scope, text, lambda: _frozen(index.gazetteer.match(text)))
+
+
+def _frozen(array: np.ndarray) -> np.ndarray:
+    array = np.asarray(array)
+    array.setflags(write=False)
+    return array
+
+
+def query_cache_stats() -> dict:
+    return _query_cache.stats()
+
+
+def candidate_rows(features: QueryFeatures, index: IndexData) -> Optional[np.ndarray]:
+    """Rows to score for this query, or None to scan the whole index."""
+    if not (settings.graph_candidates and index.graph is not None and features.entities):
+        return None
+    if features.entity_hops is not None:
+        # An empty expansion means no shard knows the claim's entities: scan everything, as unsharded.
+        if not features.entity_hops:
+            return None
+        rows = index.graph.chunks_for(features.entity_hops, settings.graph_max_candidates)
+        return rows if len(rows) < len(index.embeddings) else None
+    rows = index.graph.candidate_chunks(
+        features.entities,
+        hops=settings.graph_hops,
+        max_candidates=settings.graph_max_candidates,
+        fanout=settings.graph_fanout,
+    )
+    if rows is None or len(rows) == 0 or len(rows) >= len(index.embeddings):
+        return None
+    return rows
+
+
+def expand_query_entities(features: QueryFeatures, shards: Sequence[IndexData]) -> QueryFeatures:
+    """Expand the claim's entities over all shard graphs at once so every shard sees the same expansion."""
+    graphs = [shard.graph for shard in shards if shard.graph is not None]
+    if not (settings.graph_candidates and graphs and features.entities):
+        return features
+    names_by_hop = expand_entities(
+        graphs,
+        features.entities,
+        hops=settings.graph_hops,
+        max_candidates=settings.graph_max_candidates,
+        fanout=settings.graph_fanout,
+    )
+    return replace(features, entity_hops=names_by_hop or [])
+
+
+def _entity_scores(features: QueryFeatures, index: IndexData, size: int, rows: Optional[np.ndarray] = None) -> np.ndarray:
+    claim_entities = features.entities
+    chunk_entities = index.chunk_entities
+    ids = _query_entity_ids(features.text, index)
+    if ids is not None and index.graph is not None:
+        # Gazetteer ids index the graph's entity -> chunk postings directly.
+        overlap = index.graph.mention_counts(ids, len(index.embeddings))
+        if rows is not None:
+            overlap = overlap[rows]
+    elif isinstance(chunk_entities, CSRLists):
+        # Memory-mapped rows: match entity ids instead of decoding every row's strings.
+        overlap = chunk_entities.count_matches(claim_entities)
+        if rows is not None:
+            overlap = overlap[rows]
+    else:
+        positions = range(size) if rows is None else rows
+        overlap = np.fromiter(
+            (len(claim_entities.intersection(chunk_entities[idx])) for idx in positions),
+            dtype=np.float32,
+            count=len(positions),
+        )
+    # Shards share the claim's entity count, so their boosts stay comparable.
+    return overlap / max(len(claim_entities), 1)
+
+
+def _prefilter_rows(
+    features: QueryFeatures, index: IndexData, rows: Optional[np.ndarray], keyword_dense: Optional[np.ndarray]
+) -> Optional[np.ndarray]:
+    """Narrow `rows` to the `prefilter_candidates` best coarse semantic scores.
+
+    BM25 hits are kept as well, so a strong keyword match survives a weak coarse score.
+    """
+    limit = settings.prefilter_candidates
+    size = len(index.embeddings) if rows is None else len(rows)
+    if limit <= 0 or index.projection is None or size <= limit:
+        return rows
+    selected = index.projection.candidates(features.embedding, limit, rows)
+    if keyword_dense is not None:
+        hits = np.flatnonzero(keyword_dense > 0)
+        if rows is not None:
+            hits = np.intersect1d(hits, rows)
+        selected = np.union1d(selected, hits)
+    return selected
+
+
+def score_index(
+    features: QueryFeatures,
+    index: IndexData,
+    top_k: int,
+    bm25_hits: Optional[Tuple[np.ndarray, np.ndarray, float]] = None,
+) -> List[RetrievedChunk]:
+    """Hybrid-score one index.
+
+    `bm25_hits` carries this index's share of a corpus-wide BM25 top-n as (docs, raw
+    scores, corpus best score); without it BM25 scores are normalised within the index.
+    """
+    if index.embeddings.size == 0:
+        return []
+
+    rows = candidate_rows(features, index)
+    if rows is not None and len(rows) == 0:
+        return []
+    keyword_dense = None
+    if settings.keyword_engine == "bm25" and index.bm25 is not None:
+        if bm25_hits is not None:
+            keyword_dense = dense_scores(*bm25_hits[:2], len(index.embeddings), best=bm25_hits[2])
+        else:
+            keyword_dense = index.bm25.scores(features.text, settings.bm25_top_n, len(index.embeddings))
+    rows = _prefilter_rows(features, index, rows, keyword_dense)
+    semantic_scores = _semantic_scores(features.embedding, index, rows)
+    if keyword_dense is not None:
+        keyword_scores = keyword_dense if rows is None else keyword_dense[rows]
+    else:
+        keyword_scores = _keyword_scores(features.tfidf, index.tfidf_matrix, rows)
 
     scores = 0.75 * semantic_scores + 0.25 * keyword_scores
-    if claim_entities:
-        entity_scores = []
-        for entities in index.chunk_entities:
-            if not entities:
-                entity_scores.append(0.0)
-                continue
-            overlap = len(claim_entities.intersection(entities))
-            entity_scores.append(overlap / max(len(claim_entities), 1))
-        scores = scores + 0.1 * np.asarray(entity_scores, dtype=np.float32)
-    top_indices = np.argsort(scores)[::-1][:top_k]
+    if features.entities:
+        scores = scores + 0.1 * _entity_scores(features, index, len(scores), rows)
+    if index.tombstones is not None:
+        dead = index.tombstones if rows is None else index.tombstones[rows]
+        scores = np.where(dead, -np.inf, scores)
+    top_positions = [pos for pos in np.argsort(scores)[::-1][:top_k] if np.isfinite(scores[pos])]
+    top_rows = [int(rows[pos]) if rows is not None else int(pos) for pos in top_positions]
+    sentences = index.sentences.score(features.embedding, top_rows) if index.sentences is not None else None
 
     results: List[RetrievedChunk] = []
-    for idx in top_indices:
+    for rank, (pos, idx) in enumerate(zip(top_positions, top_rows)):
         results.append(
             RetrievedChunk(
                 chunk_id=index.chunk_ids[idx],
                 source_file=index.source_files[idx],
                 text=index.texts[idx],
-                score=float(scores[idx]),
-                semantic_score=float(semantic_scores[idx]),
-                keyword_score=float(keyword_scores[idx]),
+                score=float(scores[pos]),
+                semantic_score=float(semantic_scores[pos]),
+                keyword_score=float(keyword_scores[pos]),
+                alternate_sources=tuple(index.alternate_sources[idx]) if index.alternate_sources else (),
+                source_start=int(index.chunk_offsets[idx, 0]) if index.chunk_offsets is not None else -1,
+                source_end=int(index.chunk_offsets[idx, 1]) if index.chunk_offsets is not None else -1,
+                sentences=sentences[rank] if sentences is not None else (),
             )
         )
 
     return results
+
+
+def retrieve_sharded(query: str, index: ShardedIndex, top_k: int) -> List[RetrievedChunk]:
+    """Scatter the query to every shard in parallel and merge the per-shard top-k."""
+    shards = [shard for shard in index.shards if shard.embeddings.size > 0]
+    if not shards:
+        return []
+    # All shards share one vocabulary, so the query is encoded once and scores match the unsharded path.
+    features = expand_query_entities(encode_query(query, shards[0], entity_indexes=shards), shards)
+    executor = index.executor()
+    bm25_hits: List[Optional[Tuple[np.ndarray, np.ndarray, float]]] = [None] * len(shards)
+    if settings.keyword_engine == "bm25" and all(shard.bm25 is not None for shard in shards):
+        # BM25 is normalised by the corpus-wide best score, so gather every shard's top-n first.
+        hits = list(executor.map(lambda shard: shard.bm25.search(query, settings.bm25_top_n), shards))
+        cut, best = merge_top_n(hits, settings.bm25_top_n)
+        bm25_hits = [(docs, scores, best) for docs, scores in cut]
+    partials = executor.map(
+        lambda pair: score_index(features, pair[0], top_k, pair[1]), zip(shards, bm25_hits)
+    )
+    merged = [chunk for partial in partials for chunk in partial]
+    return heapq.nlargest(top_k, merged, key=lambda chunk: chunk.score)
+
+
+def retrieve(query: str, index: IndexData | ShardedIndex, top_k: int) -> List[RetrievedChunk]:
+    if isinstance(index, ShardedIndex):
+        return retrieve_sharded(query, index, top_k)
+    if index.embeddings.size == 0:
+        return []
+    return score_index(encode_query(query, index), index, top_k)
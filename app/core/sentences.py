@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+from typing import Callable, List, Sequence, Tuple
+
+import numpy as np
+
+from app.core.text_utils import split_sentences_with_offsets
+
+# (start, end, score): a sentence's offsets in its chunk text and its cosine to the query.
+ScoredSentence = Tuple[int, int, float]
+
+
+class SentenceIndex:
+    """Every sentence of every chunk, with offsets and a unit-normalised embedding.
+
+    Sentences of chunk `i` are rows `indptr[i]:indptr[i + 1]`; `offsets` holds their
+    (start, end) in the chunk text and `embeddings` their float16 unit vectors, so a
+    claim's best evidence sentences come from one product over the retrieved rows.
+    """
+
+    def __init__(self, indptr: np.ndarray, offsets: np.ndarray, embeddings: np.ndarray) -> None:
+        self.indptr = indptr
+        self.offsets = offsets
+        self.embeddings = embeddings
+
+    def __len__(self) -> int:
+        return len(self.indptr) - 1
+
+    @classmethod
+    def build(cls, texts: Sequence[str], embed: Callable[[List[str]], np.ndarray]) -> "SentenceIndex":
+        indptr = np.zeros(len(texts) + 1, dtype=np.int64)
+        offsets: List[Tuple[int, int]] = []
+        sentences: List[str] = []
+        for row, text in enumerate(texts):
+            for span in split_sentences_with_offsets(text):
+                offsets.append((span.start, span.end))
+                sentences.append(span.text)
+            indptr[row + 1] = len(sentences)
+        embeddings = np.asarray(embed(sentences), dtype=np.float32) if sentences else np.zeros((0, 0), dtype=np.float32)
+        if len(embeddings):
+            embeddings = embeddings / (np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-8)
+        return cls(indptr, np.asarray(offsets, dtype=np.int32).reshape(-1, 2), embeddings.astype(np.float16))
+
+    @classmethod
+    def concat(cls, parts: Sequence["SentenceIndex"]) -> "SentenceIndex":
+        indptr = [np.zeros(1, dtype=np.int64)]
+        total = 0
+        for part in parts:
+            indptr.append(np.asarray(part.indptr[1:], dtype=np.int64) + total)
+            total += int(part.indptr[-1])
+        embeddings = [np.asarray(part.embeddings) for part in parts if len(part.embeddings)]
+        return cls(
+            np.concatenate(indptr),
+            np.concatenate([np.asarray(part.offsets) for part in parts]).reshape(-1, 2),
+            np.concatenate(embeddings) if embeddings else np.zeros((0, 0), dtype=np.float16),
+        )
+
+    def take(self, rows: np.ndarray) -> "SentenceIndex":
+        """The sub-index of chunk `rows`, in that order."""
+        sentence_rows = self._sentence_rows(rows)
+        counts = np.diff(self.indptr)[rows]
+        indptr = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        embeddings = self.embeddings[sentence_rows] if len(self.embeddings) else self.embeddings
+        return SentenceIndex(indptr, np.asarray(self.offsets[sentence_rows]), np.asarray(embeddings))
+
+    def score(self, query_vec: np.ndarray, rows: Sequence[int]) -> List[Tuple[ScoredSentence, ...]]:
+        """Score the sentences of chunk `rows` against the query, per chunk."""
+        sentence_rows = self._sentence_rows(np.asarray(rows, dtype=np.int64))
+        if len(sentence_rows) == 0:
+            return [() for _ in rows]
+        query = np.asarray(query_vec, dtype=np.float32).reshape(-1)
+        query = query / (np.linalg.norm(query) + 1e-8)
+        scores = np.asarray(self.embeddings[sentence_rows], dtype=np.float32) @ query
+        offsets = np.asarray(self.offsets[sentence_rows])
+        scored: List[Tuple[ScoredSentence, ...]] = []
+        position = 0
+        for row in rows:
+            count = int(self.indptr[row + 1] - self.indptr[row])
+            scored.append(
+                tuple(
+                    (int(offsets[i, 0]), int(offsets[i, 1]), float(scores[i]))
+                    for i in range(position, position + count)
+                )
+            )
+            position += count
+        return scored
+
+    def _sentence_rows(self, rows: np.ndarray) -> np.ndarray:
+        if len(rows) == 0:
+            return np.zeros(0, dtype=np.int64)
+        starts, stops = self.indptr[rows], self.indptr[np.asarray(rows) + 1]
+        return np.concatenate([np.arange(start, stop) for start, stop in zip(starts, stops)]).astype(np.int64)
@@ -20,6 +20,12 @@ def normalize_whitespace(text: str) -> str:
     return re.sub(r"\s+", " ", text).strip()
 
 
+def normalize_claim(text: str) -> str:
+    """Case- and punctuation-insensitive form used to spot repeated claims."""
+    cleaned = re.sub(r"[^a-z0-9\s]", " ", text.lower())
+    return re.sub(r"\s+", " ", cleaned).strip()
+
+
 def split_sentences_with_offsets(text: str) -> List[SentenceSpan]:
     spans: List[SentenceSpan] = []
     if not text:
@@ -79,3 +85,45 @@ def _split_clauses(sentence: SentenceSpan) -> List[SentenceSpan]:
         spans.append(SentenceSpan(text=tail, start=seg_start, end=seg_end))
 
     return spans if spans else [sentence]
+
+
+class ClaimWindower:
+    """Incrementally splits streamed text into claims with offsets into the whole stream.
+
+    Text is fed in arbitrary pieces. Only sentences that are followed by more text
+    are emitted, so a sentence cut between pieces is never split early. The held
+    back tail is force-split at whitespace once it exceeds `max_buffer_chars`,
+    which keeps memory bounded for text without sentence punctuation.
+    """
+
+    def __init__(self, max_buffer_chars: int = 20000) -> None:
+        self.max_buffer_chars = max_buffer_chars
+        self._buffer = ""
+        self._base = 0
+
+    def feed(self, text: str) -> List[SentenceSpan]:
+        self._buffer += text
+        claims: List[SentenceSpan] = []
+        sentences = split_sentences_with_offsets(self._buffer)
+        if len(sentences) > 1:
+            # The last sentence may continue in the next piece; keep it buffered.
+            claims.extend(self._emit(sentences[:-1], sentences[-1].start))
+        while len(self._buffer) > self.max_buffer_chars:
+            cut = self._buffer.rfind(" ", 0, self.max_buffer_chars)
+            cut = cut if cut > 0 else self.max_buffer_chars
+            claims.extend(self._emit(split_sentences_with_offsets(self._buffer[:cut]), cut))
+        return claims
+
+    def flush(self) -> List[SentenceSpan]:
+        return self._emit(split_sentences_with_offsets(self._buffer), len(self._buffer))
+
+    def _emit(self, sentences: List[SentenceSpan], consumed: int) -> List[SentenceSpan]:
+        claims: List[SentenceSpan] = []
+        for sentence in sentences:
+            for clause in _split_clauses(sentence):
+                claims.append(
+                    SentenceSpan(text=clause.text, start=clause.start + self._base, end=clause.end + self._base)
+                )
+        self._buffer = self._buffer[consumed:]
+        self._base += consumed
+        return claims
@@ -2,11 +2,14 @@ from __future__ import annotations
 
 import logging
 import re
+import threading
 from dataclasses import dataclass
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
+from app.config import settings
+from app.core.batching import get_batcher
 from app.core.retrieval import RetrievedChunk
-from app.core.text_utils import split_sentences_with_offsets
+from app.core.text_utils import SentenceSpan, normalize_claim, split_sentences_with_offsets
 
 try:
     from transformers import pipeline
@@ -37,7 +40,73 @@ class VerificationResult:
     confidence: float
 
 
+class EvidenceCache:
+    """Per-request memo of verification work that depends only on the texts involved.
+
+    Claims in one request often retrieve the same chunks, and overlapping chunks
+    repeat sentences, so sentence splits, token sets, evidence picks and NLI pair
+    scores are computed once and shared.
+    """
+
+    def __init__(self) -> None:
+        self._spans: Dict[str, List[SentenceSpan]] = {}
+        self._sentences: Dict[str, List[str]] = {}
+        self._tokens: Dict[str, set[str]] = {}
+        self._picked: Dict[Tuple[str, str, int], List[str]] = {}
+        self._nli: Dict[Tuple[str, str], Tuple[float, float, float]] = {}
+        self.nli_calls = 0
+
+    def sentence_spans(self, text: str) -> List[SentenceSpan]:
+        cached = self._spans.get(text)
+        if cached is None:
+            cached = split_sentences_with_offsets(text)
+            self._spans[text] = cached
+        return cached
+
+    def sentences(self, text: str) -> List[str]:
+        cached = self._sentences.get(text)
+        if cached is None:
+            cached = [sent.text for sent in self.sentence_spans(text)]
+            self._sentences[text] = cached
+        return cached
+
+    def tokens(self, text: str) -> set[str]:
+        cached = self._tokens.get(text)
+        if cached is None:
+            cached = set(re.findall(r"[a-zA-Z0-9]+", text.lower()))
+            self._tokens[text] = cached
+        return cached
+
+    def pick(self, text: str, claim: str, max_sentences: int = 2) -> List[str]:
+        key = (text, claim, max_sentences)
+        cached = self._picked.get(key)
+        if cached is None:
+            cached = _pick_evidence_sentences(text, claim, max_sentences, cache=self)
+            self._picked[key] = cached
+        return cached
+
+    def nli_score(self, nli, premise: str, hypothesis: str) -> Tuple[float, float, float]:
+        key = (premise, hypothesis)
+        cached = self._nli.get(key)
+        if cached is None:
+            cached = _nli_score(nli, premise, hypothesis)
+            self._nli[key] = cached
+            self.nli_calls += 1
+        return cached
+
+    def prefetch_nli(self, nli, pairs: List[Tuple[str, str]]) -> None:
+        """Score every uncached (premise, hypothesis) pair together, so they can share one batch."""
+        missing = [pair for pair in dict.fromkeys(pairs) if pair not in self._nli]
+        if not missing:
+            return
+        for pair, scores in zip(missing, _nli_scores(nli, missing)):
+            self._nli[pair] = scores
+            self.nli_calls += 1
+
+
 _nli_pipeline = None
+_nli_load_lock = threading.Lock()
+_nli_call_lock = threading.Lock()
 
 
 def _get_nli_pipeline(model_name: str):
@@ -46,26 +115,47 @@ def _get_nli_pipeline(model_name: str):
         return _nli_pipeline
     if pipeline is None:
         return None
-    try:
-        _nli_pipeline = pipeline("text-classification", model=model_name, return_all_scores=True)
-        return _nli_pipeline
-    except Exception as exc:  # pragma: no cover
-        logger.warning("Failed to load NLI model: %s", exc)
-        return None
-
-
-def _pick_evidence_sentences(text: str, claim: str, max_sentences: int = 2) -> List[str]:
-    sentences = split_sentences_with_offsets(text)
+    with _nli_load_lock:
+        if _nli_pipeline is not None:
+            return _nli_pipeline
+        try:
+            _nli_pipeline = pipeline("text-classification", model=model_name, return_all_scores=True)
+            return _nli_pipeline
+        except Exception as exc:  # pragma: no cover
+            logger.warning("Failed to load NLI model: %s", exc)
+            return None
+
+
+def _pick_evidence_sentences(
+    text: str, claim: str, max_sentences: int = 2, cache: Optional[EvidenceCache] = None
+) -> List[str]:
+    sentences = cache.sentences(text) if cache is not None else [s.text for s in split_sentences_with_offsets(text)]
     if not sentences:
         return [text]
     scored: List[Tuple[float, str]] = []
     for sent in sentences:
-        scored.append((_token_overlap(claim, sent.text), sent.text))
+        scored.append((_token_overlap(claim, sent, cache), sent))
     scored.sort(key=lambda item: item[0], reverse=True)
     picked = [s for score, s in scored if score > 0.05][:max_sentences]
     return picked if picked else [text]
 
 
+def best_evidence_span(text: str, claim: str, cache: Optional[EvidenceCache] = None) -> SentenceSpan:
+    """The sentence of `text` sharing most tokens with `claim`, with its offsets in `text`.
+
+    Falls back to the whole text when no sentence overlaps the claim, as
+    `_pick_evidence_sentences` does.
+    """
+    spans = cache.sentence_spans(text) if cache is not None else split_sentences_with_offsets(text)
+    best: Optional[SentenceSpan] = None
+    best_score = 0.05
+    for span in spans:
+        score = _token_overlap(claim, span.text, cache)
+        if score > best_score:
+            best, best_score = span, score
+    return best or SentenceSpan(text=text, start=0, end=len(text))
+
+
 def _normalize_outputs(outputs) -> List[dict]:
     if isinstance(outputs, dict):
         return [outputs]
@@ -76,8 +166,32 @@ def _normalize_outputs(outputs) -> List[dict]:
     return []
 
 
+def _run_nli_batch(nli, pairs: List[Tuple[str, str]]) -> List:
+    inputs = [{"text": premise, "text_pair": hypothesis} for premise, hypothesis in pairs]
+    return list(nli(inputs, batch_size=len(pairs)))
+
+
+def _nli_scores(nli, pairs: List[Tuple[str, str]]) -> List[Tuple[float, float, float]]:
+    if settings.micro_batching:
+        batcher = get_batcher(
+            f"nli:{id(nli)}",
+            lambda batch: _run_nli_batch(nli, batch),
+            settings.batch_max_size,
+            settings.batch_max_wait_ms,
+        )
+        raws = batcher.submit_many(pairs)
+    else:
+        # Requests run on threadpool workers; without a batcher thread the model sees one call at a time.
+        with _nli_call_lock:
+            raws = [nli({"text": premise, "text_pair": hypothesis}) for premise, hypothesis in pairs]
+    return [_label_scores(raw) for raw in raws]
+
+
 def _nli_score(nli, premise: str, hypothesis: str) -> Tuple[float, float, float]:
-    raw = nli({"text": premise, "text_pair": hypothesis})
+    return _nli_scores(nli, [(premise, hypothesis)])[0]
+
+
+def _label_scores(raw) -> Tuple[float, float, float]:
     outputs = _normalize_outputs(raw)
     label_scores = {o["label"].lower(): o["score"] for o in outputs if isinstance(o, dict)}
     entail = label_scores.get("entailment", 0.0)
@@ -101,52 +215,51 @@ def _strong_support(claim: str, evidence_sentence: str) -> bool:
     return claim_tokens.issubset(evidence_tokens)
 
 
-def _normalize_text(text: str) -> str:
-    cleaned = re.sub(r"[^a-z0-9\s]", " ", text.lower())
-    return re.sub(r"\s+", " ", cleaned).strip()
-
-
 def _contains_claim(evidence_sentence: str, claim: str) -> bool:
-    return _normalize_text(claim) in _normalize_text(evidence_sentence)
+    return normalize_claim(claim) in normalize_claim(evidence_sentence)
 
 
 def _extract_regions(text: str) -> set[str]:
     return {match.lower() for match in _region_re.findall(text)}
 
 
-def verify_with_local_nli(claim: str, evidence: List[RetrievedChunk], model_name: str) -> VerificationResult:
+def verify_with_local_nli(
+    claim: str,
+    evidence: List[RetrievedChunk],
+    model_name: str,
+    cache: Optional[EvidenceCache] = None,
+) -> VerificationResult:
+    cache = cache if cache is not None else EvidenceCache()
     nli = _get_nli_pipeline(model_name)
     if nli is None:
-        return verify_with_heuristics(claim, evidence)
+        return verify_with_heuristics(claim, evidence, cache)
 
-    candidate_sentences: List[str] = []
-    for chunk in evidence:
-        candidate_sentences.extend(_pick_evidence_sentences(chunk.text, claim))
+    candidate_sentences = _candidate_sentences(claim, evidence, cache)
     for sentence in candidate_sentences:
         if _contains_claim(sentence, claim):
             return VerificationResult(label=LABEL_SUPPORTED, confidence=0.9)
 
+    cache.prefetch_nli(nli, [(sentence, claim) for sentence in candidate_sentences])
     best_label = LABEL_NEI
     best_conf = 0.0
-    for chunk in evidence:
-        for sentence in _pick_evidence_sentences(chunk.text, claim):
-            entail, contra, neutral = _nli_score(nli, sentence, claim)
-            if contra > 0.7 and contra > entail + 0.1 and contra > best_conf:
-                best_label = LABEL_CONTRADICTED
-                best_conf = contra
-            elif entail > 0.65 and entail > contra + 0.1 and entail > best_conf:
-                best_label = LABEL_SUPPORTED
-                best_conf = entail
-            elif neutral > best_conf:
-                best_label = LABEL_NEI
-                best_conf = neutral
+    for sentence in candidate_sentences:
+        entail, contra, neutral = cache.nli_score(nli, sentence, claim)
+        if contra > 0.7 and contra > entail + 0.1 and contra > best_conf:
+            best_label = LABEL_CONTRADICTED
+            best_conf = contra
+        elif entail > 0.65 and entail > contra + 0.1 and entail > best_conf:
+            best_label = LABEL_SUPPORTED
+            best_conf = entail
+        elif neutral > best_conf:
+            best_label = LABEL_NEI
+            best_conf = neutral
 
     nli_result = VerificationResult(label=best_label, confidence=float(best_conf))
     claim_regions = _extract_regions(claim)
     if nli_result.label == LABEL_SUPPORTED and claim_regions:
         if not any(_extract_regions(s) & claim_regions for s in candidate_sentences):
             nli_result = VerificationResult(label=LABEL_NEI, confidence=0.45)
-    heuristic = verify_with_heuristics(claim, evidence)
+    heuristic = verify_with_heuristics(claim, evidence, cache)
     if nli_result.label == LABEL_CONTRADICTED and nli_result.confidence < 0.85:
         if heuristic.label == LABEL_SUPPORTED and heuristic.confidence >= 0.5:
             return heuristic
@@ -154,34 +267,57 @@ def verify_with_local_nli(claim: str, evidence: List[RetrievedChunk], model_name
         if heuristic.label == LABEL_SUPPORTED and heuristic.confidence >= 0.6:
             return heuristic
     if nli_result.label == LABEL_CONTRADICTED:
-        for chunk in evidence:
-            for sentence in _pick_evidence_sentences(chunk.text, claim):
-                if _strong_support(claim, sentence):
-                    return VerificationResult(label=LABEL_SUPPORTED, confidence=0.7)
+        for sentence in candidate_sentences:
+            if _strong_support(claim, sentence):
+                return VerificationResult(label=LABEL_SUPPORTED, confidence=0.7)
     return nli_result
 
 
-def _token_overlap(a: str, b: str) -> float:
-    a_tokens = set(re.findall(r"[a-zA-Z0-9]+", a.lower()))
-    b_tokens = set(re.findall(r"[a-zA-Z0-9]+", b.lower()))
+def _candidate_sentences(claim: str, evidence: List[RetrievedChunk], cache: EvidenceCache) -> List[str]:
+    """Evidence sentences to run NLI on.
+
+    When every chunk carries sentences scored by the sentence index, the
+    `evidence_sentences` best across all chunks are taken; otherwise each chunk
+    contributes its best token-overlap sentences.
+    """
+    if evidence and all(chunk.sentences for chunk in evidence):
+        ranked = sorted(
+            ((score, chunk.text[start:end]) for chunk in evidence for start, end, score in chunk.sentences),
+            key=lambda item: item[0],
+            reverse=True,
+        )
+        # Overlapping chunks repeat sentences; each distinct one is judged once.
+        return list(dict.fromkeys(sentence for _, sentence in ranked))[: max(settings.evidence_sentences, 1)]
+    return [sentence for chunk in evidence for sentence in cache.pick(chunk.text, claim)]
+
+
+def _token_overlap(a: str, b: str, cache: Optional[EvidenceCache] = None) -> float:
+    if cache is not None:
+        a_tokens, b_tokens = cache.tokens(a), cache.tokens(b)
+    else:
+        a_tokens = set(re.findall(r"[a-zA-Z0-9]+", a.lower()))
+        b_tokens = set(re.findall(r"[a-zA-Z0-9]+", b.lower()))
     if not a_tokens or not b_tokens:
         return 0.0
     return len(a_tokens & b_tokens) / len(a_tokens | b_tokens)
 
 
-def verify_with_heuristics(claim: str, evidence: List[RetrievedChunk]) -> VerificationResult:
+def verify_with_heuristics(
+    claim: str, evidence: List[RetrievedChunk], cache: Optional[EvidenceCache] = None
+) -> VerificationResult:
     if not evidence:
         return VerificationResult(label=LABEL_NEI, confidence=0.1)
 
+    cache = cache if cache is not None else EvidenceCache()
     for chunk in evidence:
-        for sentence in _pick_evidence_sentences(chunk.text, claim):
+        for sentence in cache.pick(chunk.text, claim):
             if _contains_claim(sentence, claim):
                 return VerificationResult(label=LABEL_SUPPORTED, confidence=0.85)
 
     best_overlap = 0.0
     best_score = 0.0
     for chunk in evidence:
-        overlap = _token_overlap(claim, chunk.text)
+        overlap = _token_overlap(claim, chunk.text, cache)
         best_overlap = max(best_overlap, overlap)
         if _strong_support(claim, chunk.text):
             return VerificationResult(label=LABEL_SUPPORTED, confidence=0.65)
@@ -2,17 +2,49 @@ from __future__ import annotations
 
 import json
 import logging
+import shutil
+import threading
+import uuid
+import zlib
+from dataclasses import replace
 from datetime import datetime
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, Dict, List, Optional, Sequence
 
 import numpy as np
+from scipy import sparse
 
 from app.config import settings
-from app.core.chunking import chunk_text
-from app.core.graph import extract_entities
-from app.core.retrieval import IndexData, build_tfidf, EmbeddingBackend
-from app.kb.storage import KBStorage
+from app.core.bm25 import BM25Index, BM25Stats
+from app.core.chunking import Chunk, chunk_sentences, chunk_text
+from app.core.dedup import dedup_chunks
+from app.core.embedding import ThroughputMeter, embed_corpus, token_counter
+from app.core.gazetteer import Gazetteer
+from app.core.projection import Projection, recall_at_k
+from app.core.sentences import SentenceIndex
+from app.core.graph import EntityGraph, extract_entities
+from app.core.retrieval import (
+    IndexData,
+    ShardedIndex,
+    build_tfidf,
+    embedding_norms,
+    tfidf_from_state,
+    tfidf_state,
+)
+from app.kb.mapped import (
+    ArchivePath,
+    CSRLists,
+    MappedArchive,
+    atomic_write_text,
+    encode_lists,
+    load_array,
+    load_strings,
+    read_json,
+    write_strings,
+)
+from app.kb.pool import IndexPool
+from app.kb.snapshot import MANIFEST_FILE, SnapshotError, check_members, verify_snapshot, write_snapshot
+from app.kb.storage import KBStorage, kb_data_dir
 
 logger = logging.getLogger(__name__)
 
@@ -20,22 +52,80 @@ CHUNKS_FILE = "kb_chunks.jsonl"
 EMBEDDINGS_FILE = "embeddings.npy"
 META_FILE = "meta.json"
 ENTITY_INDEX_FILE = "entity_index.json"
+VERSIONS_DIR = "index"
+NORMS_FILE = "embedding_norms.npy"
+TFIDF_VOCAB_FILE = "tfidf_vocab.json"
+TFIDF_IDF_FILE = "tfidf_idf.npy"
+TFIDF_DIR = "tfidf"
+ENTITY_INDPTR_FILE = "chunk_entity_indptr.npy"
+ENTITY_IDS_FILE = "chunk_entity_ids.npy"
+OFFSETS_FILE = "chunk_offsets.npy"
+SHARDS_DIR = "shards"
+GRAPH_DIR = "graph"
+BM25_DIR = "bm25"
+BM25_ARRAYS = ("indptr", "doc_ids", "impacts", "max_impacts")
+BM25_STATS_FILE = "stats.json"
+PROJECTION_DIR = "projection"
+PROJECTION_ARRAYS = ("components", "reduced")
+RECALL_QUERIES = 64
+SENTENCES_DIR = "sentences"
+SENTENCE_ARRAYS = ("indptr", "offsets", "embeddings")
+GAZETTEER_DIR = "gazetteer"
+GAZETTEER_ARRAYS = ("keys", "targets", "fail", "output", "output_link", "depth")
+SNAPSHOT_FILE = "snapshot.tar"
+GRAPH_ARRAYS = (
+    "chunk_indptr",
+    "chunk_indices",
+    "neighbour_indptr",
+    "neighbour_indices",
+    "neighbour_weights",
+)
+INDEX_FORMAT = 2
 
-_cached_index: Optional[IndexData] = None
-_cached_model: Optional[str] = None
+_pool = IndexPool(settings.index_pool_max_bytes)
 
 
 class IndexManager:
     def __init__(self, base_dir: str | None = None) -> None:
         self.base_dir = Path(base_dir or settings.data_dir).resolve()
-        self.base_dir.mkdir(parents=True, exist_ok=True)
 
-    def build(self) -> IndexData:
-        storage = KBStorage(str(self.base_dir))
-        files = storage.list_files()
-        chunks = []
+    def build(self, shard: Optional[int] = None, meter: Optional[ThroughputMeter] = None) -> IndexData | ShardedIndex:
+        with _write_lock(self.base_dir):
+            if shard is not None:
+                return self.rebuild_shard(shard, meter)
+            storage = KBStorage(str(self.base_dir))
+            files = storage.list_files()
+            all_chunks = self._chunk_files(files)
+            chunks, removed = self._dedup(all_chunks)
+            if settings.index_shards > 1:
+                return self._build_sharded(chunks, settings.index_shards, all_chunks, meter)
+            index = self._build_chunks(chunks, extra_meta={"duplicates_removed": removed}, meter=meter)
+            self._cache(index)
+            return index
+
+    def _dedup(self, chunks: List[Chunk]) -> tuple[List[Chunk], int]:
+        if settings.dedup_threshold is None:
+            return chunks, 0
+        kept, removed = dedup_chunks(chunks, settings.dedup_threshold, settings.dedup_num_perm)
+        logger.info("Removed %d near-duplicate chunks of %d", removed, len(chunks))
+        return kept, removed
+
+    def _chunk_files(self, files: Sequence[Path]) -> List[Chunk]:
+        chunks: List[Chunk] = []
+        count_tokens = token_counter(settings.embedding_model) if settings.chunk_strategy == "sentences" else None
         for file_path in files:
             text = file_path.read_text(encoding="utf-8", errors="ignore")
+            if count_tokens is not None:
+                chunks.extend(
+                    chunk_sentences(
+                        text,
+                        source_file=file_path.name,
+                        max_tokens=settings.chunk_max_tokens,
+                        overlap_sentences=settings.chunk_overlap_sentences,
+                        count_tokens=count_tokens,
+                    )
+                )
+                continue
             chunks.extend(
                 chunk_text(
                     text,
@@ -44,32 +134,112 @@ class IndexManager:
                     overlap=settings.chunk_overlap,
                 )
             )
+        return chunks
 
+    def _build_chunks(
+        self,
+        chunks: List[Chunk],
+        tfidf_vectorizer=None,
+        extra_meta: Optional[dict] = None,
+        bm25_stats: Optional[BM25Stats] = None,
+        meter: Optional[ThroughputMeter] = None,
+    ) -> IndexData:
         chunk_ids = [chunk.chunk_id for chunk in chunks]
         source_files = [chunk.source_file for chunk in chunks]
         texts = [chunk.text for chunk in chunks]
         chunk_entities = [extract_entities(text) for text in texts]
+        alternate_sources = [list(chunk.alternate_sources) for chunk in chunks]
+        chunk_offsets = _offsets(chunks)
+
+        embeddings = embed_corpus(
+            texts,
+            settings.embedding_model,
+            batch_size=settings.embedding_batch_size,
+            workers=settings.embedding_workers,
+            meter=meter,
+        )
 
-        embeddings = np.zeros((0, 0), dtype=np.float32)
-        if texts:
-            backend = EmbeddingBackend(settings.embedding_model)
-            embeddings = backend.embed(texts)
+        if tfidf_vectorizer is None:
+            tfidf_vectorizer, tfidf_matrix = build_tfidf(texts)
+        elif texts:
+            # Shards reuse the corpus-wide vocabulary so their scores are comparable.
+            tfidf_matrix = tfidf_vectorizer.transform(texts).tocsr()
+        else:
+            tfidf_matrix = sparse.csr_matrix((0, len(tfidf_vectorizer.vocabulary_)), dtype=np.float32)
 
-        tfidf_vectorizer, tfidf_matrix = build_tfidf(texts)
+        return self._write_version(
+            chunk_ids,
+            source_files,
+            texts,
+            embeddings,
+            chunk_entities,
+            alternate_sources,
+            tfidf_vectorizer,
+            tfidf_matrix,
+            extra_meta=extra_meta,
+            bm25_stats=bm25_stats,
+            chunk_offsets=chunk_offsets,
+            sentences=self._build_sentences(texts),
+        )
 
-        self._persist_chunks(chunks)
-        self._persist_entity_index(chunk_ids, chunk_entities)
-        np.save(self.base_dir / EMBEDDINGS_FILE, embeddings)
+    def _write_version(
+        self,
+        chunk_ids: List[str],
+        source_files: List[str],
+        texts: List[str],
+        embeddings: np.ndarray,
+        chunk_entities: List[List[str]],
+        alternate_sources: List[List[str]],
+        tfidf_vectorizer,
+        tfidf_matrix: sparse.csr_matrix,
+        extra_meta: Optional[dict] = None,
+        bm25_stats: Optional[BM25Stats] = None,
+        tombstones: Optional[np.ndarray] = None,
+        chunk_offsets: Optional[np.ndarray] = None,
+        sentences: Optional[SentenceIndex] = None,
+    ) -> IndexData:
+        """Persist already embedded rows as a new version, derive graph and BM25, and commit it."""
+        version = _new_version()
+        version_dir = self.base_dir / VERSIONS_DIR / version
+        version_dir.mkdir(parents=True, exist_ok=True)
+        norms = embedding_norms(embeddings)
+        self._persist_arrays(version_dir, chunk_ids, source_files, texts, embeddings, norms, chunk_entities)
+        self._persist_lists(version_dir, "alternate_sources", alternate_sources)
+        if chunk_offsets is not None:
+            np.save(version_dir / OFFSETS_FILE, np.asarray(chunk_offsets, dtype=np.int64))
+        entity_vocab, entity_indptr, entity_ids = encode_lists(chunk_entities)
+        graph = EntityGraph.from_chunk_entities(entity_indptr, entity_ids, entity_vocab)
+        self._persist_graph(version_dir, graph)
+        gazetteer = Gazetteer.from_names(entity_vocab)
+        self._persist_gazetteer(version_dir, gazetteer)
+        bm25 = BM25Index.build(texts, k1=settings.bm25_k1, b=settings.bm25_b, stats=bm25_stats)
+        self._persist_bm25(version_dir, bm25)
+        self._persist_tfidf(version_dir, tfidf_vectorizer, tfidf_matrix)
+        projection = Projection.build(embeddings, norms, settings.prefilter_dims, settings.prefilter_method)
+        if projection is not None:
+            self._persist_projection(version_dir, projection)
+        if sentences is not None:
+            self._persist_sentences(version_dir, sentences)
+        dead = int(tombstones.sum()) if tombstones is not None else 0
         meta = {
             "embedding_model": settings.embedding_model,
             "created_at": datetime.utcnow().isoformat() + "Z",
-            "chunk_size": settings.chunk_size,
-            "chunk_overlap": settings.chunk_overlap,
-            "chunk_count": len(chunks),
+            **_chunking_meta(),
+            "chunk_count": len(chunk_ids) - dead,
+            "format": INDEX_FORMAT,
+            "index_version": version,
+            **(extra_meta or {}),
         }
-        (self.base_dir / META_FILE).write_text(json.dumps(meta, indent=2), encoding="utf-8")
+        if projection is not None and 0 < settings.prefilter_candidates < len(chunk_ids):
+            meta["prefilter_recall"] = _prefilter_recall(embeddings, norms, projection)
+        if sentences is not None:
+            meta["sentence_count"] = int(sentences.indptr[-1])
+        if dead:
+            meta["tombstones"] = self._persist_tombstones(version_dir, tombstones)
+            meta["tombstoned_chunks"] = dead
+        self._commit_meta(meta)
 
-        index = IndexData(
+        return IndexData(
             chunk_ids=chunk_ids,
             source_files=source_files,
             texts=texts,
@@ -78,11 +248,459 @@ class IndexManager:
             tfidf_vectorizer=tfidf_vectorizer,
             tfidf_matrix=tfidf_matrix,
             chunk_entities=chunk_entities,
+            index_version=version,
+            embedding_norms=norms,
+            alternate_sources=alternate_sources,
+            graph=graph,
+            bm25=bm25,
+            tombstones=tombstones if dead else None,
+            gazetteer=gazetteer,
+            chunk_offsets=chunk_offsets,
+            projection=projection,
+            sentences=sentences,
         )
+
+    def _commit_meta(self, meta: dict) -> None:
+        previous_version = self.current_version()
+        # meta.json is the commit point: workers only switch once it names the new version.
+        atomic_write_text(self.base_dir / META_FILE, json.dumps(meta, indent=2))
+        self._prune_versions(keep={meta["index_version"], previous_version})
+
+    def _shard_manager(self, shard: int) -> "IndexManager":
+        return IndexManager(str(self.base_dir / SHARDS_DIR / f"shard-{shard:03d}"))
+
+    def _build_sharded(
+        self,
+        chunks: List[Chunk],
+        shard_count: int,
+        all_chunks: List[Chunk],
+        meter: Optional[ThroughputMeter] = None,
+    ) -> ShardedIndex:
+        texts = [chunk.text for chunk in chunks]
+        tfidf_vectorizer, _ = build_tfidf(texts)
+        # Like the vocabulary, BM25 idf and average length are corpus-wide so shard scores compare.
+        bm25_stats = BM25Stats.from_texts(texts)
+        shards = []
+        for shard in range(shard_count):
+            shard_chunks = [chunk for chunk in chunks if shard_for_file(chunk.source_file, shard_count) == shard]
+            # Dedup ran corpus-wide; each shard is charged for the chunks removed from its own files.
+            removed = sum(1 for chunk in all_chunks if shard_for_file(chunk.source_file, shard_count) == shard)
+            removed -= len(shard_chunks)
+            shards.append(
+                self._shard_manager(shard)._build_chunks(
+                    shard_chunks,
+                    tfidf_vectorizer,
+                    extra_meta={"shard": shard, "shard_count": shard_count, "duplicates_removed": removed},
+                    bm25_stats=bm25_stats,
+                    meter=meter,
+                )
+            )
+        return self._commit_shards(shards, bm25_stats)
+
+    def rebuild_shard(self, shard: int, meter: Optional[ThroughputMeter] = None) -> ShardedIndex:
+        """Rebuild one shard from its files, keeping the vocabulary and BM25 stats of the last full build.
+
+        Dedup compares the shard's chunks against the chunks the other shards already
+        hold, which win ties, so a rebuilt shard never re-adds a duplicate of indexed
+        text. Other shards are left untouched: their `alternate_sources` only change
+        on the next full build.
+        """
+        meta = read_json(self.base_dir / META_FILE) or {}
+        shard_count = int(meta.get("shard_count", 0))
+        if not 0 <= shard < shard_count:
+            raise ValueError(f"Shard {shard} does not exist")
+        current = self.load()
+        shards = list(current.shards) if isinstance(current, ShardedIndex) else []
+        if len(shards) != shard_count:
+            raise ValueError("Sharded index is incomplete; run a full rebuild")
+        storage = KBStorage(str(self.base_dir))
+        files = [path for path in storage.list_files() if shard_for_file(path.name, shard_count) == shard]
+        shard_manager = self._shard_manager(shard)
+        shard_dir = shard_manager.base_dir / VERSIONS_DIR / meta["shard_versions"][shard]
+        vocab = json.loads((shard_dir / TFIDF_VOCAB_FILE).read_text(encoding="utf-8"))
+        tfidf_vectorizer = tfidf_from_state(vocab, np.load(shard_dir / TFIDF_IDF_FILE))
+        bm25_stats = self._load_bm25_stats(self.base_dir / VERSIONS_DIR / meta["index_version"])
+        chunks, removed = self._dedup_against(self._chunk_files(files), shards[:shard] + shards[shard + 1:])
+        rebuilt = shard_manager._build_chunks(
+            chunks,
+            tfidf_vectorizer,
+            extra_meta={"shard": shard, "shard_count": shard_count, "duplicates_removed": removed},
+            bm25_stats=bm25_stats,
+            meter=meter,
+        )
+        shards[shard] = rebuilt
+        return self._commit_shards(shards, bm25_stats)
+
+    def _dedup_against(self, chunks: List[Chunk], others: Sequence[IndexData]) -> tuple[List[Chunk], int]:
+        if settings.dedup_threshold is None:
+            return chunks, 0
+        indexed = [
+            Chunk(chunk_id=chunk_id, source_file=source_file, text=text)
+            for other in others
+            for chunk_id, source_file, text in zip(other.chunk_ids, other.source_files, other.texts)
+        ]
+        own_ids = {chunk.chunk_id for chunk in chunks}
+        kept, _ = dedup_chunks(indexed + chunks, settings.dedup_threshold, settings.dedup_num_perm)
+        kept = [chunk for chunk in kept if chunk.chunk_id in own_ids]
+        return kept, len(chunks) - len(kept)
+
+    def _commit_shards(self, shards: List[IndexData], bm25_stats: Optional[BM25Stats] = None) -> ShardedIndex:
+        version = _new_version()
+        meta = {
+            "embedding_model": settings.embedding_model,
+            "created_at": datetime.utcnow().isoformat() + "Z",
+            **_chunking_meta(),
+            "chunk_count": sum(len(shard.texts) for shard in shards),
+            "format": INDEX_FORMAT,
+            "index_version": version,
+            "shard_count": len(shards),
+            "shard_versions": [shard.index_version for shard in shards],
+            "duplicates_removed": sum(
+                int((read_json(self._shard_manager(i).base_dir / META_FILE) or {}).get("duplicates_removed", 0))
+                for i in range(len(shards))
+            ),
+        }
+        # Sharded indexes keep their data in the shard directories; the version dir only holds corpus stats.
+        version_dir = self.base_dir / VERSIONS_DIR / version
+        version_dir.mkdir(parents=True, exist_ok=True)
+        if bm25_stats is not None:
+            self._persist_bm25_stats(version_dir, bm25_stats)
+        self._commit_meta(meta)
+        index = ShardedIndex(shards, index_version=version, workers=settings.shard_workers)
         self._cache(index)
         return index
 
-    def load(self) -> Optional[IndexData]:
+    def update_files(self, removed: Sequence[str], added: Sequence[Path] = ()) -> IndexData:
+        """Tombstone the chunks of `removed` files and append chunks for `added` files.
+
+        Existing rows keep their embeddings; only appended chunks are embedded. Deletes
+        alone just write a new tombstone mask. Appended chunks reuse the current TF-IDF
+        vocabulary and skip dedup until the next compaction or full rebuild.
+        """
+        with _write_lock(self.base_dir):
+            meta = read_json(self.base_dir / META_FILE) or {}
+            if not meta.get("index_version"):
+                raise ValueError("Index is not built")
+            if meta.get("shard_versions"):
+                raise ValueError("Per-file updates need an unsharded index; run a full rebuild")
+            index = self.load()
+            tombstones = np.zeros(len(index.chunk_ids), dtype=bool)
+            if index.tombstones is not None:
+                tombstones |= index.tombstones
+            tombstones |= np.isin(np.asarray(list(index.source_files), dtype=object), list(removed))
+
+            chunks = self._chunk_files(added)
+            if not chunks:
+                return self._commit_tombstones(index, meta, tombstones)
+            texts = [chunk.text for chunk in chunks]
+            appended = embed_corpus(
+                texts,
+                settings.embedding_model,
+                batch_size=settings.embedding_batch_size,
+                workers=settings.embedding_workers,
+            )
+            embeddings = appended if len(index.chunk_ids) == 0 else np.vstack([index.embeddings, appended])
+            tfidf_matrix = sparse.vstack(
+                [index.tfidf_matrix, index.tfidf_vectorizer.transform(texts).astype(np.float32)], format="csr"
+            )
+            return self._write_version(
+                list(index.chunk_ids) + [chunk.chunk_id for chunk in chunks],
+                list(index.source_files) + [chunk.source_file for chunk in chunks],
+                list(index.texts) + texts,
+                embeddings,
+                [list(entities) for entities in index.chunk_entities] + [extract_entities(text) for text in texts],
+                self._alternate_rows(index) + [list(chunk.alternate_sources) for chunk in chunks],
+                index.tfidf_vectorizer,
+                tfidf_matrix,
+                extra_meta={"duplicates_removed": meta.get("duplicates_removed", 0)},
+                tombstones=np.concatenate([tombstones, np.zeros(len(chunks), dtype=bool)]),
+                chunk_offsets=np.concatenate([self._offset_rows(index), _offsets(chunks)]),
+                sentences=self._append_sentences(index, texts),
+            )
+
+    def compact(self) -> Optional[IndexData]:
+        """Rewrite the index without tombstoned rows, refitting TF-IDF; embeddings are copied, not recomputed."""
+        with _write_lock(self.base_dir):
+            meta = read_json(self.base_dir / META_FILE) or {}
+            if not meta.get("tombstones") or meta.get("shard_versions"):
+                return None
+            index = self.load()
+            live = np.flatnonzero(~index.tombstones)
+            texts = [index.texts[int(row)] for row in live]
+            tfidf_vectorizer, tfidf_matrix = build_tfidf(texts)
+            alternate_sources = self._alternate_rows(index)
+            compacted = self._write_version(
+                [index.chunk_ids[int(row)] for row in live],
+                [index.source_files[int(row)] for row in live],
+                texts,
+                np.asarray(index.embeddings[live], dtype=np.float32),
+                [list(index.chunk_entities[int(row)]) for row in live],
+                [alternate_sources[int(row)] for row in live],
+                tfidf_vectorizer,
+                tfidf_matrix,
+                extra_meta={"duplicates_removed": meta.get("duplicates_removed", 0)},
+                chunk_offsets=self._offset_rows(index)[live],
+                sentences=index.sentences.take(live) if index.sentences is not None else None,
+            )
+            logger.info("Compacted index: dropped %d tombstoned chunks", len(index.chunk_ids) - len(live))
+            self._cache(compacted)
+            return compacted
+
+    def tombstone_ratio(self) -> float:
+        meta = read_json(self.base_dir / META_FILE) or {}
+        dead = int(meta.get("tombstoned_chunks", 0))
+        total = dead + int(meta.get("chunk_count", 0))
+        return dead / total if total else 0.0
+
+    def _commit_tombstones(self, index: IndexData, meta: dict, tombstones: np.ndarray) -> IndexData:
+        version_dir = self.base_dir / VERSIONS_DIR / meta["index_version"]
+        dead = int(tombstones.sum())
+        updated = {
+            **meta,
+            "created_at": datetime.utcnow().isoformat() + "Z",
+            "chunk_count": len(tombstones) - dead,
+            "tombstones": self._persist_tombstones(version_dir, tombstones),
+            "tombstoned_chunks": dead,
+        }
+        self._commit_meta(updated)
+        # The version dir is shared, so keep the mask of the previous commit for in-flight readers.
+        keep = {updated["tombstones"], meta.get("tombstones")}
+        for path in version_dir.glob("tombstones-*.npy"):
+            if path.name not in keep:
+                path.unlink(missing_ok=True)
+        index = replace(index, tombstones=tombstones)
+        self._cache(index)
+        return index
+
+    def _persist_tombstones(self, version_dir: Path, tombstones: np.ndarray) -> str:
+        name = f"tombstones-{uuid.uuid4().hex[:8]}.npy"
+        np.save(version_dir / name, np.asarray(tombstones, dtype=bool))
+        return name
+
+    def _offset_rows(self, index: IndexData) -> np.ndarray:
+        if index.chunk_offsets is None:
+            return np.full((len(index.chunk_ids), 2), -1, dtype=np.int64)
+        return np.asarray(index.chunk_offsets, dtype=np.int64)
+
+    def _build_sentences(self, texts: List[str]) -> Optional[SentenceIndex]:
+        if not settings.sentence_index:
+            return None
+        return SentenceIndex.build(
+            texts,
+            lambda sentences: embed_corpus(
+                sentences,
+                settings.embedding_model,
+                batch_size=settings.embedding_batch_size,
+                workers=settings.embedding_workers,
+            ),
+        )
+
+    def _append_sentences(self, index: IndexData, texts: List[str]) -> Optional[SentenceIndex]:
+        """Extend the sentence index with appended chunks, building it in full when the index has none."""
+        if not settings.sentence_index:
+            return None
+        if index.sentences is None:
+            return self._build_sentences(list(index.texts) + texts)
+        return SentenceIndex.concat([index.sentences, self._build_sentences(texts)])
+
+    def _alternate_rows(self, index: IndexData) -> List[List[str]]:
+        if index.alternate_sources is None:
+            return [[] for _ in range(len(index.chunk_ids))]
+        return [list(sources) for sources in index.alternate_sources]
+
+    def load(self) -> Optional[IndexData | ShardedIndex]:
+        meta_path = self.base_dir / META_FILE
+        stamp = self.meta_stamp()
+        meta = read_json(meta_path)
+        if meta is None:
+            return None
+        if meta.get("index_version"):
+            version_dir = self.base_dir / VERSIONS_DIR / meta["index_version"]
+            if not version_dir.is_dir():
+                return None
+            if meta.get("snapshot"):
+                index = self._mount_snapshot(version_dir, meta)
+            elif meta.get("shard_versions"):
+                index = self._load_shards(meta, mmap=settings.index_mmap)
+            else:
+                index = self._load_version(version_dir, meta, mmap=settings.index_mmap)
+            self._cache(index, stamp)
+            return index
+        return self._load_legacy(stamp)
+
+    @property
+    def pool_key(self) -> str:
+        return str(self.base_dir)
+
+    def meta_stamp(self) -> Optional[tuple]:
+        try:
+            stat = (self.base_dir / META_FILE).stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _load_version(self, version_dir: Path, meta: dict, mmap: bool) -> IndexData:
+        entity_vocab = load_strings(version_dir, "entity_names", mmap)
+        chunk_entities: Sequence[List[str]] = CSRLists(
+            load_array(version_dir / ENTITY_INDPTR_FILE, mmap),
+            load_array(version_dir / ENTITY_IDS_FILE, mmap),
+            entity_vocab,
+        )
+        if not mmap:
+            chunk_entities = list(chunk_entities)
+        alternate_sources = self._load_lists(version_dir, "alternate_sources", mmap)
+        embeddings = load_array(version_dir / EMBEDDINGS_FILE, mmap)
+        vocab = json.loads((version_dir / TFIDF_VOCAB_FILE).read_text(encoding="utf-8"))
+        tfidf_vectorizer = tfidf_from_state(vocab, load_array(version_dir / TFIDF_IDF_FILE, mmap=False))
+        offsets_path = version_dir / OFFSETS_FILE
+        return IndexData(
+            chunk_ids=load_strings(version_dir, "chunk_ids", mmap),
+            source_files=load_strings(version_dir, "source_files", mmap),
+            texts=load_strings(version_dir, "texts", mmap),
+            embeddings=embeddings,
+            embedding_model=meta.get("embedding_model", settings.embedding_model),
+            tfidf_vectorizer=tfidf_vectorizer,
+            tfidf_matrix=self._load_tfidf_matrix(version_dir, mmap),
+            chunk_entities=chunk_entities,
+            index_version=meta["index_version"],
+            embedding_norms=load_array(version_dir / NORMS_FILE, mmap),
+            alternate_sources=alternate_sources,
+            graph=self._load_graph(version_dir, entity_vocab, mmap),
+            bm25=self._load_bm25(version_dir, mmap, doc_count=len(embeddings)),
+            tombstones=np.load(version_dir / meta["tombstones"]) if meta.get("tombstones") else None,
+            gazetteer=self._load_gazetteer(version_dir, entity_vocab, mmap),
+            chunk_offsets=load_array(offsets_path, mmap) if offsets_path.exists() else None,
+            projection=self._load_projection(version_dir, mmap),
+            sentences=self._load_sentences(version_dir, mmap),
+        )
+
+    def _mount_snapshot(self, version_dir: Path, meta: dict) -> IndexData:
+        """Load an index straight from a mounted snapshot archive, memory-mapping its arrays."""
+        archive = MappedArchive(version_dir / meta["snapshot"])
+        manifest = read_json(archive.root / MANIFEST_FILE)
+        if manifest is None:
+            raise SnapshotError("Snapshot has no manifest")
+        check_members(manifest, archive.members)
+        # Tombstone masks written after the mount live next to the archive, not in it.
+        mounted = {**meta, "tombstones": None}
+        index = self._load_version(archive.root / VERSIONS_DIR / meta["index_version"], mounted, mmap=True)
+        if meta.get("tombstones"):
+            index = replace(index, tombstones=np.load(version_dir / meta["tombstones"]))
+        return index
+
+    def export_snapshot(self, destination: Path) -> dict:
+        """Write the committed index, with its shards, to one checksummed archive; returns its manifest."""
+        with _write_lock(self.base_dir):
+            meta = read_json(self.base_dir / META_FILE) or {}
+            if not meta.get("index_version"):
+                raise ValueError("Index is not built")
+            if meta.get("snapshot"):
+                raise ValueError("Index is mounted from a snapshot; copy that archive instead")
+            members = self._snapshot_members("", meta)
+            for shard, shard_version in enumerate(meta.get("shard_versions") or []):
+                shard_manager = self._shard_manager(shard)
+                shard_meta = read_json(shard_manager.base_dir / META_FILE) or {}
+                shard_meta["index_version"] = shard_version
+                members.extend(shard_manager._snapshot_members(f"{SHARDS_DIR}/shard-{shard:03d}/", shard_meta))
+            return write_snapshot(Path(destination), members, meta)
+
+    def _snapshot_members(self, prefix: str, meta: dict) -> List[tuple]:
+        version_dir = self.base_dir / VERSIONS_DIR / meta["index_version"]
+        members: List[tuple] = [(prefix + META_FILE, json.dumps(meta, indent=2).encode("utf-8"))]
+        for path in sorted(version_dir.rglob("*")):
+            # Older tombstone masks are only kept for in-flight readers.
+            if path.is_dir() or (path.name.startswith("tombstones-") and path.name != meta.get("tombstones")):
+                continue
+            members.append((prefix + path.relative_to(self.base_dir).as_posix(), path))
+        return members
+
+    def import_snapshot(self, archive: Path, mount: bool = False) -> IndexData | ShardedIndex:
+        """Verify a snapshot and commit it as this KB's index without re-embedding anything.
+
+        By default its files are extracted into a new version directory. With
+        `mount` the archive is copied in whole and served memory-mapped from
+        there; mounting needs an unsharded snapshot.
+        """
+        manifest = verify_snapshot(Path(archive))
+        source = MappedArchive(Path(archive))
+        meta = read_json(source.root / META_FILE)
+        if meta is None or not meta.get("index_version"):
+            raise SnapshotError("Snapshot has no index meta.json")
+        if meta.get("format") != INDEX_FORMAT:
+            raise SnapshotError(f"Snapshot index format {meta.get('format')!r} is not {INDEX_FORMAT}")
+        if manifest.get("index_version") != meta["index_version"]:
+            raise SnapshotError("Snapshot manifest and meta.json name different index versions")
+        if meta.get("embedding_model") != settings.embedding_model:
+            # Appended chunks and queries would be embedded by a different model than the corpus.
+            raise SnapshotError(
+                f"Snapshot was embedded with {meta.get('embedding_model')!r}, not {settings.embedding_model!r}"
+            )
+        if {key: meta.get(key) for key in _chunking_meta()} != _chunking_meta():
+            logger.warning("Snapshot chunk settings differ from this node's; new files will chunk differently")
+        with _write_lock(self.base_dir):
+            if mount:
+                if meta.get("shard_versions"):
+                    raise SnapshotError("Sharded snapshots cannot be mounted; import them without mount")
+
+                def fill(target: Path) -> None:
+                    shutil.copyfile(archive, target / SNAPSHOT_FILE)
+                    if meta.get("tombstones"):
+                        mask = source.root / VERSIONS_DIR / meta["index_version"] / meta["tombstones"]
+                        mask.copy_to(target / meta["tombstones"])
+
+                self._install_version(meta["index_version"], fill)
+                self._commit_meta({**meta, "snapshot": SNAPSHOT_FILE})
+            else:
+                for shard, shard_version in enumerate(meta.get("shard_versions") or []):
+                    prefix = f"{SHARDS_DIR}/shard-{shard:03d}/"
+                    shard_meta = read_json(source.root / f"{prefix}{META_FILE}")
+                    if shard_meta is None:
+                        raise SnapshotError(f"Snapshot is missing shard {shard}")
+                    shard_manager = self._shard_manager(shard)
+                    shard_manager._extract_version(source, prefix, shard_version)
+                    shard_manager._commit_meta(shard_meta)
+                self._extract_version(source, "", meta["index_version"])
+                self._commit_meta(meta)
+        logger.info("Imported snapshot %s as index version %s", archive, meta["index_version"])
+        return self.load()
+
+    def _extract_version(self, source: MappedArchive, prefix: str, version: str) -> None:
+        version_prefix = f"{prefix}{VERSIONS_DIR}/{version}"
+
+        def extract(target: Path) -> None:
+            for name in source.names(version_prefix):
+                path = target / name[len(version_prefix) + 1:]
+                path.parent.mkdir(parents=True, exist_ok=True)
+                ArchivePath(source, name).copy_to(path)
+
+        self._install_version(version, extract)
+
+    def _install_version(self, version: str, fill: Callable[[Path], None]) -> Path:
+        """Create the version directory `version`, populated by `fill` in a staging directory first."""
+        versions_dir = self.base_dir / VERSIONS_DIR
+        version_dir = versions_dir / version
+        if version_dir.exists():
+            raise SnapshotError(f"Index version {version} is already installed")
+        staging = versions_dir / f".{version}.{uuid.uuid4().hex[:8]}"
+        staging.mkdir(parents=True)
+        try:
+            fill(staging)
+            staging.rename(version_dir)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        return version_dir
+
+    def _load_shards(self, meta: dict, mmap: bool) -> ShardedIndex:
+        shards = []
+        for shard, shard_version in enumerate(meta["shard_versions"]):
+            shard_manager = self._shard_manager(shard)
+            shard_meta = read_json(shard_manager.base_dir / META_FILE) or {}
+            shard_meta["index_version"] = shard_version
+            version_dir = shard_manager.base_dir / VERSIONS_DIR / shard_version
+            shards.append(shard_manager._load_version(version_dir, shard_meta, mmap))
+        return ShardedIndex(shards, index_version=meta["index_version"], workers=settings.shard_workers)
+
+    def _load_legacy(self, stamp: Optional[tuple]) -> Optional[IndexData]:
         chunks_path = self.base_dir / CHUNKS_FILE
         embeddings_path = self.base_dir / EMBEDDINGS_FILE
         meta_path = self.base_dir / META_FILE
@@ -104,6 +722,7 @@ class IndexManager:
         embedding_model = meta.get("embedding_model", settings.embedding_model)
         tfidf_vectorizer, tfidf_matrix = build_tfidf(texts)
         chunk_entities = self._load_entity_index(chunk_ids, texts)
+        entity_vocab, entity_indptr, entity_ids = encode_lists(chunk_entities)
 
         index = IndexData(
             chunk_ids=chunk_ids,
@@ -114,8 +733,11 @@ class IndexManager:
             tfidf_vectorizer=tfidf_vectorizer,
             tfidf_matrix=tfidf_matrix,
             chunk_entities=chunk_entities,
+            graph=EntityGraph.from_chunk_entities(entity_indptr, entity_ids, entity_vocab),
+            bm25=BM25Index.build(texts, k1=settings.bm25_k1, b=settings.bm25_b),
+            gazetteer=Gazetteer.from_names(entity_vocab),
         )
-        self._cache(index)
+        self._cache(index, stamp)
         return index
 
     def status(self) -> dict:
@@ -133,31 +755,153 @@ class IndexManager:
             "chunk_count": meta.get("chunk_count", 0),
             "last_indexed": meta.get("created_at"),
             "embedding_model": meta.get("embedding_model"),
+            "duplicates_removed": meta.get("duplicates_removed"),
+            "tombstoned_chunks": meta.get("tombstoned_chunks", 0),
         }
 
     def clear_cache(self) -> None:
-        global _cached_index
-        _cached_index = None
+        _pool.discard(self.pool_key)
 
-    def _persist_chunks(self, chunks: List) -> None:
-        chunks_path = self.base_dir / CHUNKS_FILE
-        with chunks_path.open("w", encoding="utf-8") as handle:
-            for chunk in chunks:
-                handle.write(
-                    json.dumps(
-                        {
-                            "chunk_id": chunk.chunk_id,
-                            "source_file": chunk.source_file,
-                            "text": chunk.text,
-                        }
-                    )
-                    + "\n"
-                )
+    def current_version(self) -> Optional[str]:
+        meta = read_json(self.base_dir / META_FILE) or {}
+        return meta.get("index_version")
 
-    def _persist_entity_index(self, chunk_ids: List[str], chunk_entities: List[List[str]]) -> None:
-        entity_path = self.base_dir / ENTITY_INDEX_FILE
-        mapping = {chunk_id: entities for chunk_id, entities in zip(chunk_ids, chunk_entities)}
-        entity_path.write_text(json.dumps(mapping, indent=2), encoding="utf-8")
+    def _prune_versions(self, keep: set) -> None:
+        # The previous version is kept so workers still mapping it can finish in-flight requests.
+        versions_dir = self.base_dir / VERSIONS_DIR
+        for path in versions_dir.iterdir():
+            if path.is_dir() and path.name not in keep:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def _persist_arrays(
+        self,
+        version_dir: Path,
+        chunk_ids: Sequence[str],
+        source_files: Sequence[str],
+        texts: Sequence[str],
+        embeddings: np.ndarray,
+        norms: np.ndarray,
+        chunk_entities: Sequence[Sequence[str]],
+    ) -> None:
+        write_strings(version_dir, "chunk_ids", chunk_ids)
+        write_strings(version_dir, "source_files", source_files)
+        write_strings(version_dir, "texts", texts)
+        np.save(version_dir / EMBEDDINGS_FILE, np.ascontiguousarray(embeddings, dtype=np.float32))
+        np.save(version_dir / NORMS_FILE, norms)
+        entity_vocab, indptr, ids = encode_lists(chunk_entities)
+        write_strings(version_dir, "entity_names", entity_vocab)
+        np.save(version_dir / ENTITY_INDPTR_FILE, indptr)
+        np.save(version_dir / ENTITY_IDS_FILE, ids)
+
+    def _persist_lists(self, version_dir: Path, name: str, rows: Sequence[Sequence[str]]) -> None:
+        vocab, indptr, ids = encode_lists(rows)
+        write_strings(version_dir, f"{name}.vocab", vocab)
+        np.save(version_dir / f"{name}.indptr.npy", indptr)
+        np.save(version_dir / f"{name}.ids.npy", ids)
+
+    def _load_lists(self, version_dir: Path, name: str, mmap: bool) -> Optional[Sequence[List[str]]]:
+        if not (version_dir / f"{name}.indptr.npy").exists():
+            return None
+        rows = CSRLists(
+            load_array(version_dir / f"{name}.indptr.npy", mmap),
+            load_array(version_dir / f"{name}.ids.npy", mmap),
+            load_strings(version_dir, f"{name}.vocab", mmap),
+        )
+        return rows if mmap else list(rows)
+
+    def _persist_graph(self, version_dir: Path, graph: EntityGraph) -> None:
+        graph_dir = version_dir / GRAPH_DIR
+        graph_dir.mkdir(exist_ok=True)
+        for name in GRAPH_ARRAYS:
+            np.save(graph_dir / f"{name}.npy", getattr(graph, name))
+
+    def _load_graph(self, version_dir: Path, names: Sequence[str], mmap: bool) -> Optional[EntityGraph]:
+        graph_dir = version_dir / GRAPH_DIR
+        if not graph_dir.is_dir():
+            return None
+        arrays = {name: load_array(graph_dir / f"{name}.npy", mmap) for name in GRAPH_ARRAYS}
+        return EntityGraph(names=names, **arrays)
+
+    def _persist_projection(self, version_dir: Path, projection: Projection) -> None:
+        projection_dir = version_dir / PROJECTION_DIR
+        projection_dir.mkdir(exist_ok=True)
+        for name in PROJECTION_ARRAYS:
+            np.save(projection_dir / f"{name}.npy", getattr(projection, name))
+
+    def _load_projection(self, version_dir: Path, mmap: bool) -> Optional[Projection]:
+        projection_dir = version_dir / PROJECTION_DIR
+        if not projection_dir.is_dir():
+            return None
+        return Projection(**{name: load_array(projection_dir / f"{name}.npy", mmap) for name in PROJECTION_ARRAYS})
+
+    def _persist_gazetteer(self, version_dir: Path, gazetteer: Gazetteer) -> None:
+        gazetteer_dir = version_dir / GAZETTEER_DIR
+        gazetteer_dir.mkdir(exist_ok=True)
+        for name in GAZETTEER_ARRAYS:
+            np.save(gazetteer_dir / f"{name}.npy", getattr(gazetteer, name))
+
+    def _load_gazetteer(self, version_dir: Path, names: Sequence[str], mmap: bool) -> Gazetteer:
+        gazetteer_dir = version_dir / GAZETTEER_DIR
+        if not gazetteer_dir.is_dir():
+            # Versions written before the gazetteer existed compile it from their entity names.
+            return Gazetteer.from_names(names)
+        arrays = {name: load_array(gazetteer_dir / f"{name}.npy", mmap) for name in GAZETTEER_ARRAYS}
+        return Gazetteer(names=names, **arrays)
+
+    def _persist_bm25(self, version_dir: Path, bm25: BM25Index) -> None:
+        bm25_dir = version_dir / BM25_DIR
+        bm25_dir.mkdir(exist_ok=True)
+        write_strings(bm25_dir, "terms", bm25.terms)
+        for name in BM25_ARRAYS:
+            np.save(bm25_dir / f"{name}.npy", getattr(bm25, name))
+
+    def _persist_bm25_stats(self, version_dir: Path, stats: BM25Stats) -> None:
+        bm25_dir = version_dir / BM25_DIR
+        bm25_dir.mkdir(exist_ok=True)
+        write_strings(bm25_dir, "stats_terms", stats.document_frequency)
+        np.save(bm25_dir / "document_frequency.npy", np.fromiter(stats.document_frequency.values(), dtype=np.int64))
+        (bm25_dir / BM25_STATS_FILE).write_text(json.dumps({"doc_count": stats.doc_count, "avgdl": stats.avgdl}))
+
+    def _load_bm25_stats(self, version_dir: Path) -> Optional[BM25Stats]:
+        bm25_dir = version_dir / BM25_DIR
+        summary = read_json(bm25_dir / BM25_STATS_FILE)
+        if summary is None:
+            return None
+        terms = load_strings(bm25_dir, "stats_terms", mmap=False)
+        frequencies = np.load(bm25_dir / "document_frequency.npy")
+        return BM25Stats(
+            doc_count=int(summary["doc_count"]),
+            avgdl=float(summary["avgdl"]),
+            document_frequency=dict(zip(terms, (int(f) for f in frequencies))),
+        )
+
+    def _load_bm25(self, version_dir: Path, mmap: bool, doc_count: int) -> Optional[BM25Index]:
+        bm25_dir = version_dir / BM25_DIR
+        if not bm25_dir.is_dir():
+            return None
+        arrays = {name: load_array(bm25_dir / f"{name}.npy", mmap) for name in BM25_ARRAYS}
+        terms = load_strings(bm25_dir, "terms", mmap)
+        return BM25Index(terms=terms, doc_count=doc_count, **arrays)
+
+    def _persist_tfidf(self, version_dir: Path, vectorizer, matrix: sparse.csr_matrix) -> None:
+        vocab, idf = tfidf_state(vectorizer)
+        (version_dir / TFIDF_VOCAB_FILE).write_text(json.dumps(vocab), encoding="utf-8")
+        np.save(version_dir / TFIDF_IDF_FILE, idf)
+        matrix = sparse.csr_matrix(matrix, dtype=np.float32)
+        parts_dir = version_dir / TFIDF_DIR
+        parts_dir.mkdir(exist_ok=True)
+        np.save(parts_dir / "data.npy", matrix.data)
+        np.save(parts_dir / "indices.npy", matrix.indices.astype(np.int32))
+        np.save(parts_dir / "indptr.npy", matrix.indptr.astype(np.int64))
+        np.save(parts_dir / "shape.npy", np.asarray(matrix.shape, dtype=np.int64))
+
+    def _load_tfidf_matrix(self, version_dir: Path, mmap: bool) -> sparse.csr_matrix:
+        parts_dir = version_dir / TFIDF_DIR
+        data = load_array(parts_dir / "data.npy", mmap)
+        indices = load_array(parts_dir / "indices.npy", mmap)
+        indptr = load_array(parts_dir / "indptr.npy", mmap)
+        shape = tuple(int(x) for x in load_array(parts_dir / "shape.npy", mmap=False))
+        return sparse.csr_matrix((data, indices, indptr), shape=shape, copy=False)
 
     def _load_entity_index(self, chunk_ids: List[str], texts: List[str]) -> List[List[str]]:
         entity_path = self.base_dir / ENTITY_INDEX_FILE
@@ -166,15 +910,68 @@ class IndexManager:
         data = json.loads(entity_path.read_text(encoding="utf-8"))
         return [data.get(chunk_id, []) for chunk_id in chunk_ids]
 
-    def _cache(self, index: IndexData) -> None:
-        global _cached_index, _cached_model
-        _cached_index = index
-        _cached_model = index.embedding_model
+    def _cache(self, index: IndexData | ShardedIndex, stamp: Optional[tuple] = None) -> None:
+        _pool.put(self.pool_key, index, stamp if stamp is not None else self.meta_stamp())
+
+    def _persist_sentences(self, version_dir: Path, sentences: SentenceIndex) -> None:
+        sentences_dir = version_dir / SENTENCES_DIR
+        sentences_dir.mkdir(exist_ok=True)
+        for name in SENTENCE_ARRAYS:
+            np.save(sentences_dir / f"{name}.npy", np.asarray(getattr(sentences, name)))
+
+    def _load_sentences(self, version_dir: Path, mmap: bool) -> Optional[SentenceIndex]:
+        sentences_dir = version_dir / SENTENCES_DIR
+        if not sentences_dir.is_dir():
+            return None
+        return SentenceIndex(**{name: load_array(sentences_dir / f"{name}.npy", mmap) for name in SENTENCE_ARRAYS})
+
+
+_write_locks: Dict[Path, threading.RLock] = {}
+_write_locks_guard = threading.Lock()
+
+
+def _write_lock(base_dir: Path) -> threading.RLock:
+    """Serialise builds, per-file updates and compaction of one index directory within a process."""
+    with _write_locks_guard:
+        return _write_locks.setdefault(base_dir, threading.RLock())
+
+
+def _offsets(chunks: Sequence[Chunk]) -> np.ndarray:
+    return np.asarray([(chunk.start, chunk.end) for chunk in chunks], dtype=np.int64).reshape(-1, 2)
+
+
+def _prefilter_recall(embeddings: np.ndarray, norms: np.ndarray, projection: Projection) -> float:
+    """Recall@10 of the coarse stage against exact cosine, using sampled chunks as queries."""
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(embeddings), min(RECALL_QUERIES, len(embeddings)), replace=False)
+    recall = recall_at_k(embeddings, norms, projection, embeddings[sample], settings.prefilter_candidates)
+    logger.info("Prefilter recall@10 with %d candidates: %.3f", settings.prefilter_candidates, recall)
+    return round(recall, 4)
+
+
+def _chunking_meta() -> dict:
+    if settings.chunk_strategy == "sentences":
+        return {
+            "chunk_strategy": "sentences",
+            "chunk_max_tokens": settings.chunk_max_tokens,
+            "chunk_overlap_sentences": settings.chunk_overlap_sentences,
+        }
+    return {"chunk_strategy": "chars", "chunk_size": settings.chunk_size, "chunk_overlap": settings.chunk_overlap}
+
+
+def _new_version() -> str:
+    return datetime.utcnow().strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:8]
+
+
+def shard_for_file(source_file: str, shard_count: int) -> int:
+    return zlib.crc32(source_file.encode("utf-8")) % shard_count
+
+
+def get_index(kb_id: Optional[str] = None) -> Optional[IndexData | ShardedIndex]:
+    """Return the pooled index for a KB, reloading it when another worker rebuilt meta.json."""
+    manager = IndexManager(kb_data_dir(kb_id))
+    return _pool.get_or_load(manager.pool_key, manager.meta_stamp(), manager.load, manager.current_version)
 
 
-def get_index() -> Optional[IndexData]:
-    global _cached_index
-    if _cached_index is not None:
-        return _cached_index
-    manager = IndexManager()
-    return manager.load()
+def pool_stats() -> dict:
+    return _pool.stats()
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import logging
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from app.core.embedding import ThroughputMeter
+
+logger = logging.getLogger(__name__)
+
+
+class IndexJob:
+    """A background rebuild or compaction of one knowledge base, with embedding progress."""
+
+    def __init__(self, kb_id: str, kind: str) -> None:
+        self.kb_id = kb_id
+        self.kind = kind
+        self.state = "running"
+        self.error: Optional[str] = None
+        self.started_at = datetime.utcnow().isoformat() + "Z"
+        self.finished_at: Optional[str] = None
+        self.meter = ThroughputMeter()
+
+    def status(self) -> dict:
+        return {
+            "kb_id": self.kb_id,
+            "kind": self.kind,
+            "state": self.state,
+            "error": self.error,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            **self.meter.snapshot(),
+        }
+
+
+_jobs: Dict[str, IndexJob] = {}
+_jobs_lock = threading.Lock()
+
+
+def start_job(kb_id: str, run: Callable[[ThroughputMeter], object], kind: str = "rebuild") -> Optional[IndexJob]:
+    """Run `run(meter)` on a background thread; returns None if a job for `kb_id` is still running."""
+    with _jobs_lock:
+        current = _jobs.get(kb_id)
+        if current is not None and current.state == "running":
+            return None
+        job = IndexJob(kb_id, kind)
+        _jobs[kb_id] = job
+
+    def target() -> None:
+        try:
+            run(job.meter)
+            job.state = "done"
+        except Exception as exc:
+            logger.exception("Index job for %s failed", kb_id)
+            job.state = "failed"
+            job.error = str(exc)
+        job.finished_at = datetime.utcnow().isoformat() + "Z"
+
+    threading.Thread(target=target, name=f"index-job-{kb_id}", daemon=True).start()
+    return job
+
+
+def get_job(kb_id: str) -> Optional[IndexJob]:
+    with _jobs_lock:
+        return _jobs.get(kb_id)
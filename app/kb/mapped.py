@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import io
+import json
+import os
+import tarfile
+from collections.abc import Sequence
+from pathlib import Path, PurePosixPath
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+class MappedStrings(Sequence):
+    """Read-only list of strings packed into one UTF-8 blob plus an offsets array.
+
+    Both files can be memory-mapped, so every worker process shares the same
+    page-cache copy instead of holding its own Python string objects.
+    """
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray) -> None:
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return max(len(self._offsets) - 1, 0)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if idx < 0 or idx >= len(self):
+            raise IndexError(idx)
+        start = int(self._offsets[idx])
+        end = int(self._offsets[idx + 1])
+        return self._blob[start:end].tobytes().decode("utf-8")
+
+
+class CSRLists(Sequence):
+    """Read-only list of string lists stored as CSR ids into a shared vocabulary."""
+
+    def __init__(self, indptr: np.ndarray, ids: np.ndarray, vocab: Sequence) -> None:
+        self.indptr = indptr
+        self.ids = ids
+        self.vocab = vocab
+        self._value_ids: Optional[dict] = None
+
+    def __len__(self) -> int:
+        return max(len(self.indptr) - 1, 0)
+
+    def row_ids(self, idx: int) -> np.ndarray:
+        return self.ids[int(self.indptr[idx]):int(self.indptr[idx + 1])]
+
+    def value_id(self, value: str) -> Optional[int]:
+        if self._value_ids is None:
+            self._value_ids = {v: i for i, v in enumerate(self.vocab)}
+        return self._value_ids.get(value)
+
+    def count_matches(self, values: Iterable[str]) -> np.ndarray:
+        """Per-row count of ids matching `values`, computed on the id arrays without decoding rows."""
+        wanted = [i for i in (self.value_id(v) for v in values) if i is not None]
+        if not wanted or len(self.ids) == 0:
+            return np.zeros(len(self), dtype=np.float32)
+        hits = np.concatenate([[0], np.cumsum(np.isin(self.ids, wanted), dtype=np.int64)])
+        return (hits[self.indptr[1:]] - hits[self.indptr[:-1]]).astype(np.float32)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if idx < 0 or idx >= len(self):
+            raise IndexError(idx)
+        return [self.vocab[int(i)] for i in self.row_ids(idx)]
+
+
+def write_strings(directory: Path, name: str, values: Iterable[str]) -> None:
+    offsets = [0]
+    with (directory / f"{name}.bin").open("wb") as handle:
+        for value in values:
+            encoded = value.encode("utf-8")
+            handle.write(encoded)
+            offsets.append(offsets[-1] + len(encoded))
+    np.save(directory / f"{name}.offsets.npy", np.asarray(offsets, dtype=np.int64))
+
+
+def load_strings(directory: Path, name: str, mmap: bool) -> Sequence:
+    offsets = load_array(directory / f"{name}.offsets.npy", mmap)
+    strings = MappedStrings(load_bytes(directory / f"{name}.bin", mmap), offsets)
+    return strings if mmap else list(strings)
+
+
+def encode_lists(rows: Sequence[Sequence[str]]) -> tuple[List[str], np.ndarray, np.ndarray]:
+    vocab: dict[str, int] = {}
+    indptr = [0]
+    ids: List[int] = []
+    for row in rows:
+        for value in row:
+            ids.append(vocab.setdefault(value, len(vocab)))
+        indptr.append(len(ids))
+    return list(vocab), np.asarray(indptr, dtype=np.int64), np.asarray(ids, dtype=np.int32)
+
+
+def load_array(path: Path, mmap: bool) -> np.ndarray:
+    if isinstance(path, ArchivePath):
+        return path.load_array(mmap)
+    return np.load(path, mmap_mode="r" if mmap else None)
+
+
+def load_bytes(path: Path, mmap: bool) -> np.ndarray:
+    if isinstance(path, ArchivePath):
+        return path.load_bytes(mmap)
+    if path.stat().st_size == 0:
+        return np.zeros(0, dtype=np.uint8)
+    return np.memmap(path, dtype=np.uint8, mode="r") if mmap else np.fromfile(path, dtype=np.uint8)
+
+
+def atomic_write_text(path: Path, content: str) -> None:
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(content, encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def read_json(path: Path) -> Optional[dict]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+class MappedArchive:
+    """An uncompressed tar archive whose members are read in place.
+
+    Member data sits at fixed offsets in the archive file, so `.npy` members can
+    be memory-mapped straight from it without extracting anything.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        # "r:" rejects compressed archives, whose members have no stable file offsets.
+        with tarfile.open(self.path, "r:") as tar:
+            self.members: Dict[str, Tuple[int, int]] = {
+                member.name: (member.offset_data, member.size) for member in tar.getmembers() if member.isfile()
+            }
+        self.dirs = {str(parent) for name in self.members for parent in PurePosixPath(name).parents}
+
+    @property
+    def root(self) -> "ArchivePath":
+        return ArchivePath(self, "")
+
+    def names(self, prefix: str) -> List[str]:
+        """Member names under the directory `prefix`."""
+        return sorted(name for name in self.members if name.startswith(prefix.rstrip("/") + "/"))
+
+
+class ArchivePath:
+    """Path-like view of a member or directory of a MappedArchive, for the loaders in this module."""
+
+    def __init__(self, archive: MappedArchive, name: str) -> None:
+        self.archive = archive
+        self.name = name
+
+    def __truediv__(self, part: str) -> "ArchivePath":
+        return ArchivePath(self.archive, f"{self.name}/{part}" if self.name else part)
+
+    def __repr__(self) -> str:
+        return f"ArchivePath({str(self.archive.path)!r}, {self.name!r})"
+
+    def exists(self) -> bool:
+        return self.name in self.archive.members or self.is_dir()
+
+    def is_dir(self) -> bool:
+        return self.name in self.archive.dirs
+
+    def read_bytes(self) -> bytes:
+        offset, size = self._span()
+        with self.archive.path.open("rb") as handle:
+            handle.seek(offset)
+            return handle.read(size)
+
+    def read_text(self, encoding: str = "utf-8") -> str:
+        return self.read_bytes().decode(encoding)
+
+    def copy_to(self, target: Path) -> None:
+        offset, size = self._span()
+        with self.archive.path.open("rb") as source, target.open("wb") as handle:
+            source.seek(offset)
+            remaining = size
+            while remaining:
+                block = source.read(min(remaining, 1 << 20))
+                if not block:
+                    raise EOFError(f"{self.name} is truncated in {self.archive.path}")
+                handle.write(block)
+                remaining -= len(block)
+
+    def load_bytes(self, mmap: bool) -> np.ndarray:
+        offset, size = self._span()
+        if size == 0:
+            return np.zeros(0, dtype=np.uint8)
+        if mmap:
+            return np.memmap(self.archive.path, dtype=np.uint8, mode="r", offset=offset, shape=(size,))
+        return np.frombuffer(self.read_bytes(), dtype=np.uint8)
+
+    def load_array(self, mmap: bool) -> np.ndarray:
+        if not mmap:
+            return np.load(io.BytesIO(self.read_bytes()))
+        offset, _ = self._span()
+        with self.archive.path.open("rb") as handle:
+            handle.seek(offset)
+            version = np.lib.format.read_magic(handle)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(handle)
+            elif version == (2, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(handle)
+            else:
+                raise ValueError(f"Unsupported .npy version {version} in {self!r}")
+            data_offset = handle.tell()
+        if dtype.hasobject:
+            raise ValueError(f"Cannot map object array {self!r}")
+        if int(np.prod(shape)) == 0:
+            return np.zeros(shape, dtype=dtype)
+        order = "F" if fortran_order else "C"
+        return np.memmap(self.archive.path, dtype=dtype, mode="r", offset=data_offset, shape=shape, order=order)
+
+    def _span(self) -> Tuple[int, int]:
+        span = self.archive.members.get(self.name)
+        if span is None:
+            raise FileNotFoundError(f"{self.name} is not in {self.archive.path}")
+        return span
+
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+from scipy import sparse
+
+from app.core.retrieval import IndexData, ShardedIndex
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _PoolEntry:
+    index: IndexData | ShardedIndex
+    stamp: Optional[tuple]
+    nbytes: int
+
+
+def estimate_index_bytes(index: IndexData | ShardedIndex) -> int:
+    if isinstance(index, ShardedIndex):
+        return sum(estimate_index_bytes(shard) for shard in index.shards)
+    total = int(index.embeddings.nbytes)
+    if index.embedding_norms is not None:
+        total += int(index.embedding_norms.nbytes)
+    matrix = index.tfidf_matrix
+    if sparse.issparse(matrix):
+        total += int(matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes)
+    else:
+        total += int(getattr(matrix, "nbytes", 0))
+    blob = getattr(index.texts, "_blob", None)
+    if blob is not None:
+        total += int(blob.nbytes)
+    else:
+        total += sum(len(text) for text in index.texts)
+    return total
+
+
+class IndexPool:
+    """LRU of loaded indexes bounded by an approximate byte budget.
+
+    Loads are single-flight: concurrent misses for the same key wait on the
+    first caller's load instead of each reading the index from disk.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, _PoolEntry]" = OrderedDict()
+        self._loading: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_load(
+        self,
+        key: str,
+        stamp: Optional[tuple],
+        loader: Callable[[], Optional[IndexData | ShardedIndex]],
+        current_version: Callable[[], Optional[str]],
+    ) -> Optional[IndexData | ShardedIndex]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.stamp != stamp:
+                # meta.json was touched; only reload when it names a different version.
+                version = current_version()
+                if version and version == entry.index.index_version:
+                    entry.stamp = stamp
+            if entry is not None and entry.stamp == stamp:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.index
+            self.misses += 1
+            pending = self._loading.get(key)
+            owner = pending is None
+            if owner:
+                pending = Future()
+                self._loading[key] = pending
+        if not owner:
+            return pending.result()
+        try:
+            index = loader()
+            pending.set_result(index)
+            return index
+        except BaseException as exc:
+            pending.set_exception(exc)
+            raise
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+
+    def put(self, key: str, index: IndexData | ShardedIndex, stamp: Optional[tuple]) -> None:
+        with self._lock:
+            self._entries[key] = _PoolEntry(index=index, stamp=stamp, nbytes=estimate_index_bytes(index))
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def peek(self, key: str) -> Optional[IndexData | ShardedIndex]:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry.index if entry is not None else None
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "loaded": list(self._entries),
+                "bytes": sum(entry.nbytes for entry in self._entries.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _evict(self) -> None:
+        total = sum(entry.nbytes for entry in self._entries.values())
+        # The most recently used entry is never evicted, even if it alone exceeds the budget.
+        while total > self.max_bytes and len(self._entries) > 1:
+            key, entry = self._entries.popitem(last=False)
+            total -= entry.nbytes
+            self.evictions += 1
+            logger.info("Evicted index %s from pool (%d bytes)", key, entry.nbytes)
@@ -0,0 +1,176 @@
+"""Export, import and verify portable index snapshots.
+
+Usage:
+    python -m app.kb.snapshot export index.snapshot.tar [--kb KB_ID]
+    python -m app.kb.snapshot import index.snapshot.tar [--kb KB_ID] [--mount]
+    python -m app.kb.snapshot verify index.snapshot.tar
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+import tarfile
+from datetime import datetime
+from pathlib import Path, PurePosixPath
+from typing import Optional, Sequence, Tuple, Union
+
+SNAPSHOT_FORMAT = 1
+MANIFEST_FILE = "manifest.json"
+# Top-level names a snapshot may contain, relative to the index base directory.
+SNAPSHOT_ROOTS = ("meta.json", "index", "shards")
+
+Member = Tuple[str, Union[Path, bytes]]
+
+
+class SnapshotError(ValueError):
+    """The archive is not a usable snapshot: wrong format, bad checksum or unexpected members."""
+
+
+def write_snapshot(destination: Path, members: Sequence[Member], meta: dict) -> dict:
+    """Write `members` (archive name, file path or bytes) as an uncompressed tar led by a manifest.
+
+    The manifest records each member's size and sha256. Members are stored
+    uncompressed so importers can memory-map them in place.
+    """
+    files = {}
+    for name, source in members:
+        _check_name(name)
+        digest, size = _digest(source)
+        files[name] = {"size": size, "sha256": digest}
+    manifest = {
+        "snapshot_format": SNAPSHOT_FORMAT,
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "index_version": meta.get("index_version"),
+        "index_format": meta.get("format"),
+        "embedding_model": meta.get("embedding_model"),
+        "files": files,
+    }
+    destination = Path(destination)
+    tmp_path = destination.with_name(f".{destination.name}.{os.getpid()}.tmp")
+    try:
+        with tarfile.open(tmp_path, "w", format=tarfile.PAX_FORMAT) as tar:
+            _add_bytes(tar, MANIFEST_FILE, json.dumps(manifest, indent=2).encode("utf-8"))
+            for name, source in members:
+                if isinstance(source, bytes):
+                    _add_bytes(tar, name, source)
+                else:
+                    tar.add(str(source), arcname=name, recursive=False)
+        os.replace(tmp_path, destination)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return manifest
+
+
+def verify_snapshot(path: Path) -> dict:
+    """Check the manifest and every member's size and sha256; return the manifest."""
+    try:
+        with tarfile.open(path, "r:") as tar:
+            first = tar.next()
+            if first is None or first.name != MANIFEST_FILE:
+                raise SnapshotError("Snapshot has no leading manifest")
+            manifest = json.loads(tar.extractfile(first).read().decode("utf-8"))
+            if manifest.get("snapshot_format") != SNAPSHOT_FORMAT:
+                raise SnapshotError(f"Unsupported snapshot format {manifest.get('snapshot_format')!r}")
+            expected = manifest.get("files") or {}
+            seen = set()
+            # TarFile iteration would restart at the manifest, so read on with next().
+            for member in iter(tar.next, None):
+                if not member.isfile() or member.name not in expected:
+                    raise SnapshotError(f"Unexpected snapshot member {member.name!r}")
+                digest = hashlib.sha256()
+                handle = tar.extractfile(member)
+                for block in iter(lambda: handle.read(1 << 20), b""):
+                    digest.update(block)
+                entry = expected[member.name]
+                if member.size != entry["size"] or digest.hexdigest() != entry["sha256"]:
+                    raise SnapshotError(f"Checksum mismatch for {member.name!r}")
+                seen.add(member.name)
+    except (tarfile.TarError, json.JSONDecodeError, UnicodeDecodeError, KeyError, TypeError) as exc:
+        raise SnapshotError(f"Unreadable snapshot: {exc}") from exc
+    missing = set(expected) - seen
+    if missing:
+        raise SnapshotError(f"Snapshot is missing {sorted(missing)[0]!r}")
+    return manifest
+
+
+def check_members(manifest: dict, members: dict) -> None:
+    """Cheap load-time check that the archive still holds the manifest's members at their sizes."""
+    for name, entry in (manifest.get("files") or {}).items():
+        span = members.get(name)
+        if span is None or span[1] != entry["size"]:
+            raise SnapshotError(f"Snapshot member {name!r} is missing or truncated")
+
+
+def _check_name(name: str) -> None:
+    path = PurePosixPath(name)
+    if path.is_absolute() or ".." in path.parts or not path.parts or path.parts[0] not in SNAPSHOT_ROOTS:
+        raise SnapshotError(f"Invalid snapshot member name {name!r}")
+
+
+def _digest(source: Union[Path, bytes]) -> Tuple[str, int]:
+    if isinstance(source, bytes):
+        return hashlib.sha256(source).hexdigest(), len(source)
+    digest = hashlib.sha256()
+    size = 0
+    with Path(source).open("rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+            size += len(block)
+    return digest.hexdigest(), size
+
+
+def _add_bytes(tar: tarfile.TarFile, name: str, data: bytes) -> None:
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = int(datetime.utcnow().timestamp())
+    tar.addfile(info, io.BytesIO(data))
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="write the built index of a KB as a snapshot")
+    export.add_argument("archive", type=Path)
+    export.add_argument("--kb", default=None, help="knowledge base id (default KB when omitted)")
+    load = commands.add_parser("import", help="verify a snapshot and install it as the KB's index")
+    load.add_argument("archive", type=Path)
+    load.add_argument("--kb", default=None, help="knowledge base id (default KB when omitted)")
+    load.add_argument("--mount", action="store_true", help="serve from the archive instead of extracting it")
+    verify = commands.add_parser("verify", help="check a snapshot's manifest and checksums")
+    verify.add_argument("archive", type=Path)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    # Imported here: app.kb.index depends on this module for the archive format.
+    from app.kb.index import IndexManager
+    from app.kb.storage import kb_data_dir
+
+    args = parse_args(argv)
+    try:
+        if args.command == "verify":
+            result = _summary(verify_snapshot(args.archive))
+        elif args.command == "export":
+            result = _summary(IndexManager(kb_data_dir(args.kb)).export_snapshot(args.archive))
+        else:
+            manager = IndexManager(kb_data_dir(args.kb))
+            manager.import_snapshot(args.archive, mount=args.mount)
+            result = manager.status()
+    except (OSError, ValueError) as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+def _summary(manifest: dict) -> dict:
+    return {key: value for key, value in manifest.items() if key != "files"}
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,22 +9,52 @@ from typing import Iterable, List
 from app.config import settings
 
 SAFE_FILENAME_RE = re.compile(r"[^a-zA-Z0-9._-]")
+KB_ID_RE = re.compile(r"^[a-zA-Z0-9_-]{1,64}$")
+DEFAULT_KB_ID = "default"
+TENANTS_DIR = "kbs"
+
+
+def kb_data_dir(kb_id: str | None = None) -> str:
+    """Map a knowledge base id to its data directory; the default KB keeps `settings.data_dir`."""
+    if kb_id is None or kb_id == DEFAULT_KB_ID:
+        return settings.data_dir
+    if not KB_ID_RE.match(kb_id):
+        raise ValueError(f"Invalid knowledge base id: {kb_id!r}")
+    return str(Path(settings.data_dir) / TENANTS_DIR / kb_id)
+
+
+def kb_exists(kb_id: str | None = None) -> bool:
+    return Path(kb_data_dir(kb_id)).is_dir()
+
+
+def list_kb_ids() -> List[str]:
+    tenants_dir = Path(settings.data_dir) / TENANTS_DIR
+    named = sorted(p.name for p in tenants_dir.iterdir() if p.is_dir()) if tenants_dir.is_dir() else []
+    return [DEFAULT_KB_ID] + [kb_id for kb_id in named if kb_id != DEFAULT_KB_ID]
 
 
 class KBStorage:
     def __init__(self, base_dir: str | None = None) -> None:
         self.base_dir = Path(base_dir or settings.data_dir).resolve()
         self.kb_dir = self.base_dir / "kb_files"
-        self.kb_dir.mkdir(parents=True, exist_ok=True)
 
     def list_files(self) -> List[Path]:
         return sorted(self.kb_dir.glob("*.txt"))
 
+    def delete_file(self, filename: str) -> bool:
+        target = self.kb_dir / SAFE_FILENAME_RE.sub("_", os.path.basename(filename))
+        if not target.is_file():
+            return False
+        target.unlink()
+        return True
+
     def clear(self) -> None:
         for file_path in self.list_files():
             file_path.unlink(missing_ok=True)
 
     def save_files(self, files: Iterable[tuple[str, bytes]]) -> List[Path]:
+        # Directories are only created on upload so read paths never create a KB.
+        self.kb_dir.mkdir(parents=True, exist_ok=True)
         saved: List[Path] = []
         for filename, content in files:
             if filename.endswith(".zip"):
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+from contextlib import closing
+from pathlib import Path
+from typing import Optional
+
+
+def prompt_hash(*parts: str) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """Persistent LLM response cache keyed by (prompt hash, model), stored in SQLite."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._ready:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30.0)
+        if not self._ready:
+            with connection:
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS responses ("
+                    "prompt_hash TEXT NOT NULL, model TEXT NOT NULL, content TEXT NOT NULL, "
+                    "PRIMARY KEY (prompt_hash, model))"
+                )
+            self._ready = True
+        return connection
+
+    def get(self, key: str, model: str) -> Optional[str]:
+        with self._lock, closing(self._connect()) as connection:
+            row = connection.execute(
+                "SELECT content FROM responses WHERE prompt_hash = ? AND model = ?", (key, model)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: str, model: str, content: str) -> None:
+        with self._lock, closing(self._connect()) as connection, connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO responses (prompt_hash, model, content) VALUES (?, ?, ?)",
+                (key, model, content),
+            )
@@ -1,17 +1,37 @@
 from __future__ import annotations
 
 import json
+import logging
 import os
-from typing import Optional
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
 
 import httpx
 
-from app.llm.prompts import SYSTEM_PROMPT, USER_PROMPT
+from app.config import settings
+from app.llm.cache import ResponseCache, prompt_hash
+from app.llm.prompts import BATCH_SYSTEM_PROMPT, BATCH_USER_PROMPT, SYSTEM_PROMPT, USER_PROMPT
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_FILE = "llm_cache.sqlite3"
+VALID_LABELS = {"SUPPORTED", "CONTRADICTED", "NOT_ENOUGH_INFO"}
 
 
 class OpenAIClient:
-    def __init__(self, api_key: Optional[str] = None) -> None:
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        model: Optional[str] = None,
+        cache: Optional[ResponseCache] = None,
+    ) -> None:
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.base_url = (base_url or os.getenv("OPENAI_BASE_URL") or settings.openai_base_url).rstrip("/")
+        self.model = model or settings.openai_model
+        if cache is None and settings.openai_cache:
+            cache = ResponseCache(Path(settings.data_dir) / LLM_CACHE_FILE)
+        self.cache = cache
 
     def enabled(self) -> bool:
         return bool(self.api_key)
@@ -19,20 +39,76 @@ class OpenAIClient:
     def judge_claim(self, claim: str, evidence: str) -> Optional[dict]:
         if not self.enabled():
             return None
+        content = self._complete(SYSTEM_PROMPT, USER_PROMPT.format(claim=claim, evidence=evidence))
+        try:
+            return json.loads(content) if content is not None else None
+        except json.JSONDecodeError:
+            return None
+
+    def judge_claims(self, claims: Sequence[Tuple[str, Sequence[str]]], evidence: Dict[str, str]) -> List[Optional[dict]]:
+        """Judge several claims in one completion.
+
+        `claims` pairs each claim with the ids of its evidence passages in `evidence`,
+        which is sent once however many claims cite it. Returns one verdict per
+        claim, or None where the reply has no valid verdict for it.
+        """
+        if not self.enabled() or not claims:
+            return [None] * len(claims)
+        evidence_ids = {evidence_id: f"E{i + 1}" for i, evidence_id in enumerate(evidence)}
+        evidence_block = "\n\n".join(f"[{evidence_ids[key]}] {text}" for key, text in evidence.items())
+        claims_block = "\n".join(
+            f"{number}. {claim} (evidence: {', '.join(evidence_ids[key] for key in cited) or 'none'})"
+            for number, (claim, cited) in enumerate(claims, start=1)
+        )
+        content = self._complete(
+            BATCH_SYSTEM_PROMPT, BATCH_USER_PROMPT.format(evidence=evidence_block, claims=claims_block)
+        )
+        return _parse_verdicts(content, len(claims))
+
+    def _complete(self, system: str, user: str) -> Optional[str]:
+        key = prompt_hash(system, user)
+        if self.cache is not None:
+            cached = self.cache.get(key, self.model)
+            if cached is not None:
+                return cached
         payload = {
-            "model": "gpt-4o-mini",
+            "model": self.model,
             "temperature": 0,
             "messages": [
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": USER_PROMPT.format(claim=claim, evidence=evidence)},
+                {"role": "system", "content": system},
+                {"role": "user", "content": user},
             ],
         }
         headers = {"Authorization": f"Bearer {self.api_key}"}
         with httpx.Client(timeout=30.0) as client:
-            resp = client.post("https://api.openai.com/v1/chat/completions", json=payload, headers=headers)
+            resp = client.post(f"{self.base_url}/chat/completions", json=payload, headers=headers)
             resp.raise_for_status()
             content = resp.json()["choices"][0]["message"]["content"]
-            try:
-                return json.loads(content)
-            except json.JSONDecodeError:
-                return None
+        if self.cache is not None:
+            self.cache.put(key, self.model, content)
+        return content
+
+
+def _parse_verdicts(content: Optional[str], count: int) -> List[Optional[dict]]:
+    verdicts: List[Optional[dict]] = [None] * count
+    if content is None:
+        return verdicts
+    try:
+        parsed = json.loads(content)
+    except json.JSONDecodeError:
+        logger.warning("Batched verdicts were not valid JSON")
+        return verdicts
+    if not isinstance(parsed, list):
+        return verdicts
+    for item in parsed:
+        if not isinstance(item, dict):
+            continue
+        try:
+            position = int(item.get("id")) - 1
+            confidence = float(item.get("confidence", 0.5))
+        except (TypeError, ValueError):
+            continue
+        label = str(item.get("label", "")).upper()
+        if 0 <= position < count and label in VALID_LABELS and verdicts[position] is None:
+            verdicts[position] = {"label": label, "confidence": min(max(confidence, 0.0), 1.0)}
+    return verdicts
@@ -6,3 +6,13 @@ Evidence:
 {evidence}
 
 Return JSON with keys: label (SUPPORTED|CONTRADICTED|NOT_ENOUGH_INFO), confidence (0-1)."""
+
+BATCH_SYSTEM_PROMPT = """You are a careful fact-checking assistant. Given numbered claims and a shared list of evidence passages, decide for each claim if it is supported, contradicted, or not enough info, using only the evidence it cites. Return JSON only."""
+
+BATCH_USER_PROMPT = """Evidence:
+{evidence}
+
+Claims:
+{claims}
+
+Return a JSON array with one object per claim, with keys: id (the claim number), label (SUPPORTED|CONTRADICTED|NOT_ENOUGH_INFO), confidence (0-1)."""
@@ -0,0 +1,391 @@
+"""Local load-test harness for mixed check / upload / rebuild traffic.
+
+Starts the app under uvicorn with stub embedding and NLI backends, seeds a
+knowledge base from a fixture corpus, then drives a weighted request mix at a
+fixed concurrency and writes a JSON report with throughput, latency
+percentiles, error and 503 rates, and server RSS over time.
+
+    python -m app.loadtest --duration 60 --concurrency 32 --mix check=90,upload=5,rebuild=5 \\
+        --workers 2 --report loadtest.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import httpx
+import numpy as np
+
+from app.core.text_utils import split_sentences_with_offsets
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_CORPUS = REPO_ROOT / "data" / "kb_files"
+OPERATIONS = ("check", "upload", "update", "rebuild")
+STUB_DIM = 64
+UPLOAD_SLOTS = 8
+
+_word_re = re.compile(r"[a-z0-9]+")
+
+
+class HashingBackend:
+    """Stub embedding backend: hashed bag of words, so retrieval still ranks related text first."""
+
+    latency_s = 0.0
+
+    def __init__(self, model_name: str) -> None:
+        self.model_name = model_name
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        vectors = np.zeros((len(texts), STUB_DIM), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in _word_re.findall(text.lower()):
+                vectors[row, _bucket(word)] += 1.0
+        return vectors
+
+
+def _bucket(word: str) -> int:
+    return int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=4).digest(), "little") % STUB_DIM
+
+
+def _stub_nli(inputs, batch_size: Optional[int] = None):
+    pairs = inputs if isinstance(inputs, list) else [inputs]
+    if _stub_nli.latency_s:
+        time.sleep(_stub_nli.latency_s * len(pairs))
+    outputs = []
+    for pair in pairs:
+        premise = set(_word_re.findall(pair["text"].lower()))
+        hypothesis = set(_word_re.findall(pair["text_pair"].lower()))
+        entail = len(premise & hypothesis) / max(len(hypothesis), 1)
+        outputs.append(
+            [
+                {"label": "entailment", "score": entail},
+                {"label": "contradiction", "score": 0.0},
+                {"label": "neutral", "score": 1.0 - entail},
+            ]
+        )
+    return outputs if isinstance(inputs, list) else outputs[0]
+
+
+_stub_nli.latency_s = 0.0
+
+
+def create_stub_app():
+    """uvicorn factory: the real app with stub models, configured from LOADTEST_* variables."""
+    import app.core.retrieval as retrieval
+    import app.core.verification as verification
+    from app.config import settings
+    from app.main import app
+
+    HashingBackend.latency_s = float(os.environ.get("LOADTEST_EMBED_MS", "0")) / 1000.0
+    _stub_nli.latency_s = float(os.environ.get("LOADTEST_NLI_MS", "0")) / 1000.0
+    retrieval.EmbeddingBackend = HashingBackend
+    retrieval._backend_cache = {}
+    verification._get_nli_pipeline = lambda model_name: _stub_nli
+    settings.data_dir = os.environ.get("LOADTEST_DATA_DIR", settings.data_dir)
+    settings.micro_batching = os.environ.get("LOADTEST_MICRO_BATCHING", "0") == "1"
+    return app
+
+
+@dataclass
+class Record:
+    kind: str
+    started: float
+    latency_s: float
+    status: Optional[int]
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """Parse `check=90,upload=5,rebuild=5` into normalised weights."""
+    weights: Dict[str, float] = {}
+    for part in filter(None, (item.strip() for item in spec.split(","))):
+        name, _, value = part.partition("=")
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation {name!r}; expected one of {', '.join(OPERATIONS)}")
+        weights[name] = float(value or 1)
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError("The request mix needs a positive weight")
+    return {name: weight / total for name, weight in weights.items() if weight > 0}
+
+
+def _latency_stats(records: Sequence[Record], elapsed_s: float) -> dict:
+    latencies = np.asarray([r.latency_s * 1000.0 for r in records], dtype=np.float64)
+    statuses: Dict[str, int] = {}
+    for record in records:
+        key = str(record.status) if record.status is not None else "transport_error"
+        statuses[key] = statuses.get(key, 0) + 1
+    unavailable = statuses.get("503", 0)
+    errors = sum(1 for r in records if r.status is None or (r.status >= 400 and r.status != 503))
+    count = len(records)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if count else (0.0, 0.0, 0.0)
+    return {
+        "count": count,
+        "throughput_rps": count / elapsed_s if elapsed_s > 0 else 0.0,
+        "error_rate": errors / count if count else 0.0,
+        "rate_503": unavailable / count if count else 0.0,
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(latencies.max()) if count else 0.0,
+        "statuses": statuses,
+    }
+
+
+def summarize(records: Sequence[Record], elapsed_s: float) -> dict:
+    """Overall and per-operation throughput, latency percentiles, error and 503 rates.
+
+    Errors are transport failures and non-2xx responses other than 503, which is
+    reported on its own as the overload signal.
+    """
+    kinds = sorted({record.kind for record in records})
+    return {
+        "overall": _latency_stats(records, elapsed_s),
+        "by_kind": {kind: _latency_stats([r for r in records if r.kind == kind], elapsed_s) for kind in kinds},
+    }
+
+
+def _process_tree(pid: int) -> List[int]:
+    pids = [pid]
+    for parent in pids:
+        for task in Path(f"/proc/{parent}/task").glob("*/children"):
+            try:
+                pids.extend(int(child) for child in task.read_text().split())
+            except OSError:
+                continue
+    return pids
+
+
+def _rss_bytes(pid: int) -> Optional[int]:
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def sample_rss(pid: int) -> Dict[str, int]:
+    """Resident set size of the server process and its workers (Linux /proc; empty elsewhere)."""
+    sizes = {str(child): _rss_bytes(child) for child in _process_tree(pid)}
+    return {child: size for child, size in sizes.items() if size is not None}
+
+
+class Workload:
+    """Request payloads built from the fixture corpus."""
+
+    def __init__(self, corpus: Path, seed: int, check_mode: str, response_format: str, background_rebuild: bool):
+        self.files = sorted(corpus.glob("*.txt"))
+        if not self.files:
+            raise ValueError(f"No .txt files in {corpus}")
+        self.sentences = [
+            span.text
+            for path in self.files
+            for span in split_sentences_with_offsets(path.read_text(encoding="utf-8", errors="ignore"))
+        ]
+        self.random = random.Random(seed)
+        self.check_mode = check_mode
+        self.response_format = response_format
+        self.background_rebuild = background_rebuild
+
+    def claim_text(self) -> str:
+        picked = self.random.sample(self.sentences, k=min(self.random.randint(1, 6), len(self.sentences)))
+        # Bump numbers in some claims so verification also sees contradictions.
+        return " ".join(
+            re.sub(r"\d+", lambda m: str(int(m.group()) + 1), s) if self.random.random() < 0.2 else s for s in picked
+        )
+
+    async def run(self, kind: str, client: httpx.AsyncClient) -> httpx.Response:
+        if kind == "check":
+            payload = {"text": self.claim_text(), "mode": self.check_mode, "response_format": self.response_format}
+            return await client.post("/api/check", json=payload)
+        source = self.random.choice(self.files)
+        name = f"loadtest-{self.random.randrange(UPLOAD_SLOTS)}.txt"
+        if kind == "upload":
+            files = {"files": (name, source.read_bytes(), "text/plain")}
+            return await client.post("/api/kb/upload", files=files)
+        if kind == "update":
+            files = {"file": (name, source.read_bytes(), "text/plain")}
+            return await client.put(f"/api/kb/files/{name}", files=files)
+        return await client.post("/api/kb/rebuild", params={"background": str(self.background_rebuild).lower()})
+
+
+async def drive(
+    base_url: str,
+    workload: Workload,
+    mix: Dict[str, float],
+    concurrency: int,
+    duration_s: float,
+    server_pid: Optional[int] = None,
+    sample_interval_s: float = 1.0,
+    timeout_s: float = 120.0,
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+) -> dict:
+    """Run `concurrency` closed-loop clients for `duration_s` and summarise what they saw."""
+    records: List[Record] = []
+    rss_timeline: List[dict] = []
+    kinds, weights = list(mix), list(mix.values())
+    start = time.perf_counter()
+    deadline = start + duration_s
+
+    async def client_loop(client: httpx.AsyncClient) -> None:
+        while time.perf_counter() < deadline:
+            kind = workload.random.choices(kinds, weights)[0]
+            began = time.perf_counter()
+            try:
+                status: Optional[int] = (await workload.run(kind, client)).status_code
+            except httpx.HTTPError:
+                status = None
+            records.append(Record(kind, began - start, time.perf_counter() - began, status))
+
+    async def sampler() -> None:
+        while time.perf_counter() < deadline:
+            processes = sample_rss(server_pid)
+            rss_timeline.append(
+                {"t": time.perf_counter() - start, "total_bytes": sum(processes.values()), "processes": processes}
+            )
+            await asyncio.sleep(sample_interval_s)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout_s, limits=limits, transport=transport) as client:
+        tasks = [client_loop(client) for _ in range(concurrency)]
+        if server_pid is not None:
+            tasks.append(sampler())
+        await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    return {
+        "elapsed_s": elapsed,
+        **summarize(records, elapsed),
+        "rss": rss_timeline,
+        "rss_peak_bytes": max((sample["total_bytes"] for sample in rss_timeline), default=None),
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args: argparse.Namespace, data_dir: Path, port: int) -> subprocess.Popen:
+    command = [
+        sys.executable, "-m", "uvicorn", "app.loadtest:create_stub_app", "--factory",
+        "--host", "127.0.0.1", "--port", str(port), "--workers", str(args.workers), "--log-level", "warning",
+    ]
+    if args.limit_concurrency:
+        # uvicorn answers 503 once this many connections and tasks are in flight.
+        command += ["--limit-concurrency", str(args.limit_concurrency)]
+    env = {
+        **os.environ,
+        "LOADTEST_DATA_DIR": str(data_dir),
+        "LOADTEST_EMBED_MS": str(args.embed_ms),
+        "LOADTEST_NLI_MS": str(args.nli_ms),
+        "LOADTEST_MICRO_BATCHING": "1" if args.micro_batching else "0",
+    }
+    return subprocess.Popen(command, cwd=REPO_ROOT, env=env)
+
+
+def wait_ready(base_url: str, process: subprocess.Popen, timeout_s: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            if httpx.get(f"{base_url}/api/health", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("Server did not become ready")
+
+
+def seed(base_url: str, corpus: Path) -> None:
+    files = [("files", (path.name, path.read_bytes(), "text/plain")) for path in sorted(corpus.glob("*.txt"))]
+    with httpx.Client(base_url=base_url, timeout=600.0) as client:
+        client.post("/api/kb/upload", files=files).raise_for_status()
+        client.post("/api/kb/rebuild").raise_for_status()
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of load after seeding")
+    parser.add_argument("--concurrency", type=int, default=16, help="closed-loop clients")
+    parser.add_argument("--mix", default="check=90,upload=4,update=3,rebuild=3", help="weighted operations")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--limit-concurrency", type=int, default=0, help="uvicorn --limit-concurrency (0: off)")
+    parser.add_argument("--corpus", type=Path, default=DEFAULT_CORPUS, help="directory of .txt fixture files")
+    parser.add_argument("--check-mode", default="local", choices=("local", "heuristic"))
+    parser.add_argument("--response-format", default="full", choices=("full", "compact"))
+    parser.add_argument("--background-rebuild", action="store_true", help="rebuild through the job API")
+    parser.add_argument("--embed-ms", type=float, default=2.0, help="stub embedding latency per batch")
+    parser.add_argument("--nli-ms", type=float, default=1.0, help="stub NLI latency per pair")
+    parser.add_argument("--micro-batching", action="store_true")
+    parser.add_argument("--sample-interval", type=float, default=1.0, help="seconds between RSS samples")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--url", help="drive an already running server instead of starting one")
+    parser.add_argument("--report", type=Path, help="write the JSON report here instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    mix = parse_mix(args.mix)
+    workload = Workload(args.corpus, args.seed, args.check_mode, args.response_format, args.background_rebuild)
+    data_dir = Path(tempfile.mkdtemp(prefix="loadtest-"))
+    process: Optional[subprocess.Popen] = None
+    try:
+        if args.url:
+            base_url = args.url.rstrip("/")
+        else:
+            port = _free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            process = start_server(args, data_dir, port)
+            wait_ready(base_url, process)
+            seed(base_url, args.corpus)
+        result = asyncio.run(
+            drive(
+                base_url,
+                workload,
+                mix,
+                args.concurrency,
+                args.duration,
+                server_pid=process.pid if process is not None else None,
+                sample_interval_s=args.sample_interval,
+            )
+        )
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+        shutil.rmtree(data_dir, ignore_errors=True)
+    report = {
+        "config": {key: str(value) if isinstance(value, Path) else value for key, value in vars(args).items()},
+        "mix": mix,
+        **result,
+    }
+    output = json.dumps(report, indent=2)
+    if args.report:
+        args.report.write_text(output, encoding="utf-8")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+import app.core.retrieval as retrieval
+from app.config import settings
+from app.core.query_cache import QueryCache
+
+
+class DummyBackend:
+    def __init__(self, model_name: str) -> None:
+        self.model_name = model_name
+
+    def embed(self, texts):
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+
+@pytest.fixture
+def stub_backend(monkeypatch):
+    """Swap the embedding backend for a stub; call the fixture to install a different class."""
+
+    def install(backend_cls=DummyBackend):
+        monkeypatch.setattr(retrieval, "EmbeddingBackend", backend_cls)
+        monkeypatch.setattr(retrieval, "_backend_cache", {})
+        return backend_cls
+
+    install()
+    return install
+
+
+@pytest.fixture(autouse=True)
+def fresh_query_cache(monkeypatch):
+    # Cached query features are keyed by model name, which every stub backend shares.
+    monkeypatch.setattr(retrieval, "_query_cache", QueryCache(settings.query_cache_size))
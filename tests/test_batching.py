@@ -0,0 +1,82 @@
+import threading
+
+from fastapi.testclient import TestClient
+
+import app.core.retrieval as retrieval
+import app.core.verification as verification
+from app.config import settings
+from app.core.batching import MicroBatcher, batching_stats
+from app.core.retrieval import RetrievedChunk
+from app.main import app
+
+
+def test_batcher_groups_concurrent_calls():
+    seen = []
+
+    def double(items):
+        seen.append(len(items))
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(double, max_batch_size=8, max_wait_ms=50, name="test")
+    results = {}
+    barrier = threading.Barrier(8)
+
+    def worker(value):
+        barrier.wait()
+        results[value] = batcher.submit(value)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {i: i * 2 for i in range(8)}
+    assert sum(seen) == 8
+    assert max(seen) > 1
+    stats = batcher.stats()
+    assert stats["items"] == 8
+    assert stats["mean_batch_size"] > 1
+
+
+def test_batcher_propagates_errors():
+    def fail(items):
+        raise ValueError("boom")
+
+    batcher = MicroBatcher(fail, max_batch_size=4, max_wait_ms=1, name="fail")
+    try:
+        batcher.submit(1)
+    except ValueError as exc:
+        assert str(exc) == "boom"
+    else:
+        raise AssertionError("expected ValueError")
+
+
+def test_query_embedding_goes_through_batcher(stub_backend, monkeypatch):
+    monkeypatch.setattr(settings, "micro_batching", True)
+    vector = retrieval.embed_query("Paris is the capital of France.", "embed-batch-test")
+
+    assert vector.shape == (1, 4)
+    assert batching_stats()["embed:embed-batch-test"]["items"] == 1
+    metrics = TestClient(app).get("/api/metrics").json()
+    assert metrics["batching"]["embed:embed-batch-test"]["max_batch_size"] == 1
+
+
+def test_claim_nli_pairs_share_one_batch(monkeypatch):
+    calls = []
+
+    def fake_nli(inputs, batch_size=None):
+        calls.append((len(inputs), batch_size))
+        return [[{"label": "neutral", "score": 0.9}] for _ in inputs]
+
+    monkeypatch.setattr(settings, "micro_batching", True)
+    monkeypatch.setattr(settings, "batch_max_wait_ms", 20.0)
+    monkeypatch.setattr(verification, "_get_nli_pipeline", lambda model_name: fake_nli)
+    evidence = [
+        RetrievedChunk(chunk_id=f"kb.txt::{i}", source_file="kb.txt", text=text, score=0.9, semantic_score=0.9, keyword_score=0.9)
+        for i, text in enumerate(["Rome is in Italy.", "Rome has old walls."])
+    ]
+    verification.verify_with_local_nli("Rome is old", evidence, "dummy")
+
+    assert calls == [(2, 2)]
+    assert batching_stats()[f"nli:{id(fake_nli)}"]["items"] == 2
@@ -0,0 +1,62 @@
+import numpy as np
+
+import app.core.retrieval as retrieval
+from app.config import settings
+from app.core.bm25 import BM25Index, tokenize
+from app.kb.index import IndexManager
+from app.kb.storage import KBStorage
+
+
+def _exhaustive(index: BM25Index, query: str) -> np.ndarray:
+    scores = np.zeros(index.doc_count, dtype=np.float32)
+    for term in set(tokenize(query)):
+        term_id = index.term_id(term)
+        if term_id is None:
+            continue
+        start, end = index.indptr[term_id], index.indptr[term_id + 1]
+        scores[index.doc_ids[start:end]] += index.impacts[start:end]
+    return scores
+
+
+def test_maxscore_matches_exhaustive_top_n():
+    rng = np.random.RandomState(0)
+    words = [f"w{i}" for i in range(300)]
+    texts = [" ".join(rng.choice(words, size=40)) for _ in range(500)]
+    index = BM25Index.build(texts)
+
+    for query in ("w1 w2 w3", "w10 w200 w299 w5", "w7"):
+        docs, scores = index.search(query, top_n=10)
+        expected = _exhaustive(index, query)
+        assert np.allclose(scores, np.sort(expected)[::-1][:10], atol=1e-5)
+        assert np.allclose(expected[docs], scores, atol=1e-5)
+
+
+def test_rare_terms_are_indexed_and_pruning_skips_postings():
+    texts = [f"common filler text number {i}" for i in range(2000)] + ["the zygomorphic flower is common"]
+    index = BM25Index.build(texts)
+    docs, _ = index.search("zygomorphic common", top_n=1)
+    assert list(docs) == [2000]
+    total_postings = sum(int(index.indptr[index.term_id(t) + 1] - index.indptr[index.term_id(t)]) for t in ("zygomorphic", "common"))
+    assert index.postings_scored < total_postings
+
+
+def test_dense_scores_are_normalised():
+    index = BM25Index.build(["alpha beta", "gamma delta", "alpha alpha"])
+    scores = index.scores("alpha", top_n=5, size=3)
+    assert scores.max() == 1.0
+    assert scores[1] == 0.0
+
+
+def test_bm25_keyword_engine_in_retrieve(stub_backend, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "keyword_engine", "bm25")
+    KBStorage(str(tmp_path)).save_files(
+        [("a.txt", b"The okapi lives in the Congo."), ("b.txt", b"The giraffe lives in the savanna.")]
+    )
+    IndexManager(str(tmp_path)).build()
+    index = IndexManager(str(tmp_path)).load()
+
+    assert index.bm25 is not None
+    results = retrieval.retrieve("okapi", index, top_k=2)
+    assert results[0].chunk_id == "a.txt::0"
+    assert results[0].keyword_score == 1.0
+    assert results[1].keyword_score == 0.0
@@ -1,4 +1,4 @@
-from app.core.chunking import chunk_text
+from app.core.chunking import approx_token_count, chunk_sentences, chunk_text
 
 
 def test_chunking_basic():
@@ -7,3 +7,33 @@ def test_chunking_basic():
     assert len(chunks) >= 2
     assert chunks[0].chunk_id == "doc.txt::0"
     assert all(chunk.source_file == "doc.txt" for chunk in chunks)
+
+
+def test_chunk_text_records_offsets():
+    text = "b" * 700
+    chunks = chunk_text(text, "doc.txt", chunk_size=500, overlap=80)
+    assert [(c.start, c.end) for c in chunks] == [(0, 500), (420, 700)]
+
+
+def test_sentence_chunks_keep_whole_sentences_within_budget():
+    text = "Paris is in France.  Berlin is in Germany. Rome is in Italy. Madrid is in Spain."
+    chunks = chunk_sentences(text, "doc.txt", max_tokens=10, overlap_sentences=1)
+
+    assert [c.text for c in chunks] == [
+        "Paris is in France.  Berlin is in Germany.",
+        "Berlin is in Germany. Rome is in Italy.",
+        "Rome is in Italy. Madrid is in Spain.",
+    ]
+    assert all(text[c.start:c.end] == c.text for c in chunks)
+    assert all(approx_token_count(c.text) <= 10 for c in chunks)
+    assert [c.chunk_id for c in chunks] == ["doc.txt::0", "doc.txt::1", "doc.txt::2"]
+
+
+def test_sentence_longer_than_budget_is_split_between_words():
+    text = "Short one. " + " ".join(f"w{i}" for i in range(25)) + "."
+    chunks = chunk_sentences(text, "doc.txt", max_tokens=10)
+
+    assert chunks[0].text == "Short one."
+    assert all(approx_token_count(c.text) <= 10 for c in chunks)
+    assert all(text[c.start:c.end] == c.text for c in chunks)
+    assert " ".join(c.text for c in chunks[1:]) == text[len("Short one. "):]
@@ -0,0 +1,57 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.kb.index import IndexManager
+from app.kb.storage import KBStorage
+from app.main import app
+
+KB_TEXT = b"Paris is the capital of France. It has many museums. Berlin is the capital of Germany."
+CLAIMS = "Paris is the capital of France. Berlin is the capital of Germany. France has many museums."
+
+
+def _client(stub_backend, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "data_dir", str(tmp_path))
+    KBStorage(str(tmp_path)).save_files([("kb.txt", KB_TEXT)])
+    IndexManager(str(tmp_path)).build()
+    return TestClient(app)
+
+
+def test_compact_response_shares_evidence_and_trims_snippets(stub_backend, monkeypatch, tmp_path):
+    client = _client(stub_backend, monkeypatch, tmp_path)
+    request = {"text": CLAIMS, "mode": "heuristic", "top_k": 3}
+    full = client.post("/api/check", json=request).json()
+    compact = client.post("/api/check", json={**request, "response_format": "compact"}).json()
+
+    assert "format" not in full
+    assert compact["format"] == "compact"
+    assert compact["summary"] == full["summary"]
+    assert [e["chunk_id"] for e in compact["evidence"]] == ["kb.txt::0"]
+    chunk_text = full["spans"][0]["evidence"][0]["text"]
+    snippets = []
+    for span, full_span in zip(compact["spans"], full["spans"]):
+        assert (span["start"], span["end"], span["label"]) == (full_span["start"], full_span["end"], full_span["label"])
+        (evidence,) = span["evidence"]
+        assert evidence["ref"] == 0
+        assert chunk_text[evidence["snippet_start"]:evidence["snippet_end"]] == evidence["snippet"]
+        snippets.append(evidence["snippet"])
+    assert snippets == [
+        "Paris is the capital of France.",
+        "Berlin is the capital of Germany.",
+        "It has many museums.",
+    ]
+
+
+def test_compact_response_is_gzipped_when_accepted(stub_backend, monkeypatch, tmp_path):
+    client = _client(stub_backend, monkeypatch, tmp_path)
+    monkeypatch.setattr(settings, "gzip_min_bytes", 0)
+    request = {"text": CLAIMS, "mode": "heuristic", "response_format": "compact"}
+
+    resp = client.post("/api/check", json=request, headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["content-encoding"] == "gzip"
+    assert resp.json()["format"] == "compact"
+
+    raw = client.post("/api/check", json=request, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in raw.headers
+    assert json.loads(raw.content) == resp.json()
@@ -0,0 +1,33 @@
+from app.core.chunking import Chunk
+from app.core.dedup import dedup_chunks
+
+BOILERPLATE = (
+    "This document is provided for informational purposes only and may be redistributed "
+    "under the terms of the open knowledge licence published by the maintainers."
+)
+
+
+def test_dedup_collapses_near_duplicates():
+    chunks = [
+        Chunk(chunk_id="a.txt::0", source_file="a.txt", text=BOILERPLATE),
+        Chunk(chunk_id="a.txt::1", source_file="a.txt", text="Paris is the capital of France."),
+        Chunk(chunk_id="b.txt::0", source_file="b.txt", text=BOILERPLATE + " "),
+        Chunk(chunk_id="c.txt::0", source_file="c.txt", text=BOILERPLATE.replace("maintainers", "maintainers!")),
+        Chunk(chunk_id="d.txt::0", source_file="d.txt", text="Berlin is the capital of Germany."),
+    ]
+    kept, removed = dedup_chunks(chunks, threshold=0.8)
+
+    assert removed == 2
+    assert [chunk.chunk_id for chunk in kept] == ["a.txt::0", "a.txt::1", "d.txt::0"]
+    assert kept[0].alternate_sources == ("b.txt", "c.txt")
+    assert kept[1].alternate_sources == ()
+
+
+def test_dedup_keeps_distinct_chunks():
+    chunks = [
+        Chunk(chunk_id=f"doc.txt::{i}", source_file="doc.txt", text=f"Fact number {i} about topic {i * 7}.")
+        for i in range(20)
+    ]
+    kept, removed = dedup_chunks(chunks, threshold=0.9)
+    assert removed == 0
+    assert len(kept) == 20
@@ -0,0 +1,83 @@
+import json
+import random
+import threading
+
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.core.text_utils import ClaimWindower, split_claims_with_offsets
+from app.kb.index import IndexManager
+from app.kb.storage import KBStorage
+from app.main import app
+
+
+def test_windower_matches_whole_text_split():
+    text = "Paris is in France, and Berlin is in Germany. Rome is old!  Is Tokyo big? " * 30 + "Tail"
+    rng = random.Random(0)
+    windower = ClaimWindower(max_buffer_chars=500)
+    claims = []
+    pos = 0
+    while pos < len(text):
+        size = rng.randint(1, 50)
+        claims.extend(windower.feed(text[pos:pos + size]))
+        pos += size
+    claims.extend(windower.flush())
+
+    assert claims == split_claims_with_offsets(text)
+
+
+def test_windower_bounds_buffer_without_punctuation():
+    windower = ClaimWindower(max_buffer_chars=100)
+    claims = []
+    for _ in range(50):
+        claims.extend(windower.feed("word " * 10))
+        assert len(windower._buffer) <= 100
+    claims.extend(windower.flush())
+    assert sum(len(c.text.split()) for c in claims) == 500
+
+
+def _post(client, timeout=30, **kwargs):
+    # Run the request in a thread so a body-read deadlock fails the test instead of hanging it.
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(resp=client.post(**kwargs)), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "request did not complete"
+    return result["resp"]
+
+
+def _document_index(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "data_dir", str(tmp_path))
+    monkeypatch.setattr(settings, "document_batch_claims", 4)
+    KBStorage(str(tmp_path)).save_files([("kb.txt", b"Paris is the capital of France.")])
+    IndexManager(str(tmp_path)).build()
+
+
+DOCUMENT = "Paris is the capital of France. " * 30
+
+
+def test_document_endpoint_streams_raw_body(stub_backend, monkeypatch, tmp_path):
+    _document_index(monkeypatch, tmp_path)
+    resp = _post(TestClient(app), url="/api/check/document?mode=heuristic", content=DOCUMENT.encode())
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert resp.status_code == 200
+    assert len(lines) == 31
+    assert lines[-1] == {"summary": {"supported": 30, "contradicted": 0, "nei": 0}, "done": True}
+    assert DOCUMENT[lines[29]["start"]:lines[29]["end"]] == "Paris is the capital of France."
+
+
+def test_document_endpoint_accepts_multipart_upload(stub_backend, monkeypatch, tmp_path):
+    _document_index(monkeypatch, tmp_path)
+    client = TestClient(app)
+    resp = _post(
+        client,
+        url="/api/check/document?mode=heuristic",
+        files={"file": ("doc.txt", DOCUMENT.encode(), "text/plain")},
+    )
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert resp.status_code == 200
+    assert len(lines) == 31
+    assert lines[-1]["summary"]["supported"] == 30
+
+    resp = _post(client, url="/api/check/document", files={"other": ("doc.txt", b"x", "text/plain")})
+    assert resp.status_code == 400
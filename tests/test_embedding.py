@@ -0,0 +1,65 @@
+import time
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.core.embedding import ThroughputMeter, embed_corpus, length_batches
+from app.kb.storage import KBStorage
+from app.main import app
+
+
+class RecordingBackend:
+    batches = []
+
+    def __init__(self, model_name: str) -> None:
+        self.model_name = model_name
+
+    def embed(self, texts):
+        RecordingBackend.batches.append([len(text.split()) for text in texts])
+        return np.asarray([[float(len(text.split())), float(len(text))] for text in texts], dtype=np.float32)
+
+
+TEXTS = [" ".join(["word"] * n) for n in (3, 40, 5, 38, 4, 39, 6, 41)]
+
+
+def test_length_batches_group_similar_lengths():
+    batches = length_batches(TEXTS, batch_size=4)
+    assert [sorted(int(i) for i in rows) for rows in batches] == [[1, 3, 5, 7], [0, 2, 4, 6]]
+
+
+def test_embed_corpus_restores_order_and_reports_progress(stub_backend):
+    stub_backend(RecordingBackend)
+    RecordingBackend.batches = []
+    meter = ThroughputMeter()
+    vectors = embed_corpus(TEXTS, "recording", batch_size=4, meter=meter)
+
+    expected = np.asarray([[float(len(t.split())), float(len(t))] for t in TEXTS], dtype=np.float32)
+    assert np.array_equal(vectors, expected)
+    assert [max(b) - min(b) for b in RecordingBackend.batches] == [3, 3]
+    snapshot = meter.snapshot()
+    assert snapshot["chunks_total"] == snapshot["chunks_embedded"] == len(TEXTS)
+    assert snapshot["eta_seconds"] == 0.0
+
+
+def test_embed_corpus_with_worker_processes(stub_backend):
+    stub_backend(RecordingBackend)
+    vectors = embed_corpus(TEXTS, "recording", batch_size=3, workers=2)
+    assert np.array_equal(vectors[:, 0], [float(len(t.split())) for t in TEXTS])
+
+
+def test_background_rebuild_reports_job_status(stub_backend, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "data_dir", str(tmp_path))
+    KBStorage(str(tmp_path)).save_files([("kb.txt", b"Paris is the capital of France.")])
+    client = TestClient(app)
+
+    resp = client.post("/api/kb/rebuild?background=true")
+    assert resp.status_code == 202
+    deadline = time.monotonic() + 10
+    while client.get("/api/kb/job").json()["state"] == "running" and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    job = client.get("/api/kb/job").json()
+    assert job["state"] == "done"
+    assert job["chunks_total"] == job["chunks_embedded"] == 1
+    assert client.get("/api/kb/status").json()["chunk_count"] == 1
@@ -0,0 +1,75 @@
+import time
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.core.retrieval import retrieve
+from app.kb.index import IndexManager, get_index
+from app.kb.storage import KBStorage
+from app.main import app
+
+
+class CountingBackend:
+    embedded = []
+
+    def __init__(self, model_name: str) -> None:
+        self.model_name = model_name
+
+    def embed(self, texts):
+        CountingBackend.embedded.extend(texts)
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+
+def _client(stub_backend, monkeypatch, tmp_path, threshold):
+    stub_backend(CountingBackend)
+    CountingBackend.embedded = []
+    monkeypatch.setattr(settings, "data_dir", str(tmp_path))
+    monkeypatch.setattr(settings, "compaction_threshold", threshold)
+    KBStorage(str(tmp_path)).save_files(
+        [("a.txt", b"The okapi lives in the Congo."), ("b.txt", b"The giraffe lives in the savanna.")]
+    )
+    IndexManager(str(tmp_path)).build()
+    return TestClient(app)
+
+
+def test_delete_masks_chunks_immediately(stub_backend, monkeypatch, tmp_path):
+    client = _client(stub_backend, monkeypatch, tmp_path, threshold=1.1)
+
+    status = client.delete("/api/kb/files/a.txt").json()
+    assert status["chunk_count"] == 1
+    assert status["tombstoned_chunks"] == 1
+    assert [r.chunk_id for r in retrieve("okapi Congo", get_index(), 5)] == ["b.txt::0"]
+    assert client.delete("/api/kb/files/a.txt").status_code == 404
+
+    monkeypatch.setattr(settings, "index_mmap", True)
+    loaded = IndexManager(str(tmp_path)).load()
+    assert list(loaded.tombstones) == [True, False]
+
+
+def test_replace_appends_without_reembedding(stub_backend, monkeypatch, tmp_path):
+    client = _client(stub_backend, monkeypatch, tmp_path, threshold=1.1)
+    CountingBackend.embedded = []
+
+    resp = client.put("/api/kb/files/a.txt", files={"file": ("a.txt", b"The okapi is related to the giraffe.")})
+    assert resp.status_code == 200
+    assert CountingBackend.embedded == ["The okapi is related to the giraffe."]
+    results = retrieve("okapi", get_index(), 5)
+    assert sorted(r.text for r in results) == ["The giraffe lives in the savanna.", "The okapi is related to the giraffe."]
+
+
+def test_compaction_runs_past_threshold(stub_backend, monkeypatch, tmp_path):
+    client = _client(stub_backend, monkeypatch, tmp_path, threshold=0.25)
+
+    client.delete("/api/kb/files/a.txt")
+    deadline = time.monotonic() + 10
+    while client.get("/api/kb/job").json()["state"] == "running" and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    job = client.get("/api/kb/job").json()
+    assert (job["kind"], job["state"]) == ("compact", "done")
+    status = client.get("/api/kb/status").json()
+    assert (status["chunk_count"], status["tombstoned_chunks"]) == (1, 0)
+    index = get_index()
+    assert index.tombstones is None
+    assert list(index.chunk_ids) == ["b.txt::0"]
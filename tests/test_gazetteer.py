@@ -0,0 +1,34 @@
+import numpy as np
+
+from app.config import settings
+from app.core.gazetteer import Gazetteer
+from app.core.retrieval import query_entities, retrieve
+from app.kb.index import IndexManager
+from app.kb.storage import KBStorage
+
+NAMES = ["Paris", "France", "Mount Fuji", "Fuji", "Tokyo", "Tokyo Tower", "US"]
+
+
+def _names(gazetteer, text):
+    return [gazetteer.names[i] for i in gazetteer.match(text)]
+
+
+def test_match_prefers_leftmost_longest_whole_words():
+    gazetteer = Gazetteer.from_names(NAMES)
+    assert _names(gazetteer, "Mount Fuji is near Tokyo Tower") == ["Mount Fuji", "Tokyo Tower"]
+    assert _names(gazetteer, "Fuji, Parisian and USA, but not the US") == ["Fuji", "US"]
+    assert _names(gazetteer, "Tokyo Towers") == ["Tokyo"]
+    assert _names(gazetteer, "nothing known here") == []
+
+
+def test_gazetteer_is_persisted_and_yields_only_known_entities(stub_backend, monkeypatch, tmp_path):
+    KBStorage(str(tmp_path)).save_files(
+        [("a.txt", b"Paris is the capital of France."), ("b.txt", b"Berlin is the capital of Germany.")]
+    )
+    built = IndexManager(str(tmp_path)).build()
+    monkeypatch.setattr(settings, "index_mmap", True)
+    loaded = IndexManager(str(tmp_path)).load()
+
+    assert isinstance(loaded.gazetteer.keys, np.memmap)
+    assert query_entities("Atlantis and Paris border Germany", [loaded]) == frozenset({"Paris", "Germany"})
+    assert [r.score for r in retrieve("Paris France", loaded, 2)] == [r.score for r in retrieve("Paris France", built, 2)]
@@ -0,0 +1,49 @@
+from fastapi.testclient import TestClient
+
+import app.core.retrieval as retrieval
+from app.config import settings
+from app.core.graph import EntityGraph
+from app.kb.index import IndexManager
+from app.kb.mapped import encode_lists
+from app.kb.storage import KBStorage
+from app.main import app
+
+
+def _graph(rows):
+    names, indptr, ids = encode_lists(rows)
+    return EntityGraph.from_chunk_entities(indptr, ids, names)
+
+
+def test_graph_cooccurrence_weights():
+    graph = _graph([["Paris", "France"], ["Paris", "France", "Seine"], ["Berlin", "Germany"]])
+    paris = graph.entity_id("Paris")
+    assert list(graph.chunks(paris)) == [0, 1]
+    assert [(graph.names[n], w) for n, w in graph.neighbours(paris)] == [("France", 2.0), ("Seine", 1.0)]
+
+
+def test_candidate_chunks_expand_hops():
+    graph = _graph([["Paris", "France"], ["France", "Europe"], ["Europe", "Union"], ["Tokyo"]])
+    assert list(graph.candidate_chunks(["Paris"], hops=0)) == [0]
+    assert list(graph.candidate_chunks(["Paris"], hops=1)) == [0, 1]
+    assert list(graph.candidate_chunks(["Paris"], hops=2)) == [0, 1, 2]
+    assert graph.candidate_chunks(["Atlantis"]) is None
+
+
+def test_graph_candidates_restrict_retrieval_and_endpoint(stub_backend, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "data_dir", str(tmp_path))
+    KBStorage(str(tmp_path)).save_files(
+        [
+            ("a.txt", b"Paris is the capital of France."),
+            ("b.txt", b"Berlin is the capital of Germany."),
+        ]
+    )
+    index = IndexManager(str(tmp_path)).build()
+    monkeypatch.setattr(settings, "graph_candidates", True)
+    results = retrieval.retrieve("Paris is lovely", index, top_k=5)
+    assert [r.chunk_id for r in results] == ["a.txt::0"]
+
+    client = TestClient(app)
+    data = client.get("/api/kb/graph/entity/Paris").json()
+    assert data["chunks"] == ["a.txt::0"]
+    assert [n["entity"] for n in data["neighbours"]] == ["France"]
+    assert client.get("/api/kb/graph/entity/Atlantis").status_code == 404
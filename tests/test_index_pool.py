@@ -0,0 +1,93 @@
+import threading
+import time
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.core.retrieval import IndexData, build_tfidf
+from app.kb.pool import IndexPool
+from app.main import app
+
+
+def _index(rows: int) -> IndexData:
+    texts = [f"text {i}" for i in range(rows)]
+    vectorizer, matrix = build_tfidf(texts)
+    return IndexData(
+        chunk_ids=[str(i) for i in range(rows)],
+        source_files=["a.txt"] * rows,
+        texts=texts,
+        embeddings=np.ones((rows, 256), dtype=np.float32),
+        embedding_model="dummy",
+        tfidf_vectorizer=vectorizer,
+        tfidf_matrix=matrix,
+        chunk_entities=[[] for _ in range(rows)],
+    )
+
+
+def test_pool_single_flight_load():
+    pool = IndexPool(max_bytes=10 ** 9)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.05)
+        index = _index(2)
+        pool.put("kb", index, ("stamp",))
+        return index
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(pool.get_or_load("kb", ("stamp",), loader, lambda: None)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert pool.get_or_load("kb", ("stamp",), loader, lambda: None) is results[0]
+
+
+def test_pool_evicts_least_recently_used():
+    pool = IndexPool(max_bytes=2 * 10 * 256 * 4 + 2000)
+    for key in ("a", "b"):
+        pool.put(key, _index(10), None)
+    pool.get_or_load("a", None, lambda: None, lambda: None)
+    pool.put("c", _index(10), None)
+
+    assert pool.peek("b") is None
+    assert pool.peek("a") is not None
+    assert pool.stats()["evictions"] == 1
+
+
+def test_named_kbs_are_isolated(stub_backend, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "data_dir", str(tmp_path))
+    client = TestClient(app)
+
+    resp = client.post("/api/kb/acme/upload", files=[("files", ("acme.txt", b"Acme makes rockets."))])
+    assert resp.status_code == 200
+    assert client.post("/api/kb/acme/rebuild").json()["chunk_count"] == 1
+    assert client.get("/api/kb/status").json()["chunk_count"] == 0
+    assert [f["filename"] for f in client.get("/api/kb/acme/list").json()] == ["acme.txt"]
+    assert "acme" in client.get("/api/kbs").json()
+
+    resp = client.post("/api/check", json={"text": "Acme makes rockets.", "mode": "heuristic", "kb_id": "acme"})
+    assert resp.status_code == 200
+    resp = client.post("/api/check", json={"text": "Acme makes rockets.", "mode": "heuristic", "kb_id": "other"})
+    assert resp.status_code == 404
+
+
+def test_read_only_routes_do_not_create_kbs(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "data_dir", str(tmp_path))
+    client = TestClient(app)
+
+    assert client.get("/api/kb/typo/status").status_code == 404
+    assert client.get("/api/kb/typo/list").status_code == 404
+    assert client.get("/api/kb/typo/graph/entity/Paris").status_code == 404
+    assert client.post("/api/kb/typo/rebuild").status_code == 404
+    assert client.get("/api/kbs").json() == ["default"]
+    resp = client.post("/api/check", json={"text": "Acme makes rockets.", "mode": "heuristic", "kb_id": "typo"})
+    assert resp.status_code == 404
@@ -0,0 +1,86 @@
+import numpy as np
+
+import app.kb.index as kb_index
+from app.config import settings
+from app.core.retrieval import retrieve
+from app.kb.index import IndexManager, get_index
+from app.kb.mapped import CSRLists, MappedStrings
+from app.kb.storage import KBStorage
+
+
+class LengthBackend:
+    def __init__(self, model_name: str) -> None:
+        self.model_name = model_name
+
+    def embed(self, texts):
+        return np.asarray([[float(len(t)), 1.0] for t in texts], dtype=np.float32)
+
+
+def _build(tmp_path, stub_backend):
+    stub_backend(LengthBackend)
+    storage = KBStorage(str(tmp_path))
+    storage.save_files(
+        [
+            ("a.txt", "Paris is the capital of France.".encode()),
+            ("b.txt", "Berlin is the capital of Germany.".encode()),
+        ]
+    )
+    return IndexManager(str(tmp_path)).build()
+
+
+def test_mmap_load_matches_build(stub_backend, monkeypatch, tmp_path):
+    built = _build(tmp_path, stub_backend)
+    monkeypatch.setattr(settings, "index_mmap", True)
+    loaded = IndexManager(str(tmp_path)).load()
+
+    assert isinstance(loaded.texts, MappedStrings)
+    assert isinstance(loaded.embeddings, np.memmap)
+    assert list(loaded.texts) == list(built.texts)
+    assert list(loaded.chunk_entities) == list(built.chunk_entities)
+    assert [r.chunk_id for r in retrieve("Paris France", loaded, 2)] == [
+        r.chunk_id for r in retrieve("Paris France", built, 2)
+    ]
+
+
+def test_get_index_reloads_after_rebuild(stub_backend, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "data_dir", str(tmp_path))
+    first = _build(tmp_path, stub_backend)
+    assert get_index() is first
+    manager = IndexManager(str(tmp_path))
+    first_stamp = manager.meta_stamp()
+
+    KBStorage(str(tmp_path)).save_files([("c.txt", b"Rome is the capital of Italy.")])
+    # Simulate another worker rebuilding: only meta.json on disk changes.
+    manager.build()
+    kb_index._pool.put(manager.pool_key, first, first_stamp)
+
+    reloaded = get_index()
+    assert reloaded.index_version != first.index_version
+    assert len(reloaded.texts) == 3
+
+
+def test_entity_boost_uses_ids_on_mapped_rows(stub_backend, monkeypatch, tmp_path):
+    built = _build(tmp_path, stub_backend)
+    monkeypatch.setattr(settings, "index_mmap", True)
+    loaded = IndexManager(str(tmp_path)).load()
+
+    assert isinstance(loaded.chunk_entities, CSRLists)
+    assert list(loaded.chunk_entities.count_matches({"Paris", "France", "Atlantis"})) == [2.0, 0.0]
+    assert [r.score for r in retrieve("Paris France", loaded, 2)] == [r.score for r in retrieve("Paris France", built, 2)]
+    version_dir = tmp_path / kb_index.VERSIONS_DIR / loaded.index_version
+    assert not (version_dir / kb_index.CHUNKS_FILE).exists()
+
+
+def test_sentence_chunks_trace_back_to_source_offsets(stub_backend, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "chunk_strategy", "sentences")
+    monkeypatch.setattr(settings, "chunk_max_tokens", 8)
+    text = "Paris is the capital of France. Berlin is the capital of Germany."
+    KBStorage(str(tmp_path)).save_files([("a.txt", text.encode())])
+    IndexManager(str(tmp_path)).build()
+    loaded = IndexManager(str(tmp_path)).load()
+
+    assert list(loaded.texts) == ["Paris is the capital of France.", "Berlin is the capital of Germany."]
+    for chunk in retrieve("Berlin capital", loaded, 2):
+        assert text[chunk.source_start:chunk.source_end] == chunk.text
+    meta = kb_index.read_json(tmp_path / kb_index.META_FILE)
+    assert meta["chunk_strategy"] == "sentences" and meta["chunk_max_tokens"] == 8
@@ -0,0 +1,53 @@
+import asyncio
+
+import httpx
+import pytest
+
+import app.core.verification as verification
+from app.config import settings
+from app.loadtest import DEFAULT_CORPUS, Record, Workload, create_stub_app, drive, parse_mix, summarize
+
+
+def test_parse_mix_normalises_weights():
+    assert parse_mix("check=8,upload=1,rebuild=1") == {"check": 0.8, "upload": 0.1, "rebuild": 0.1}
+    with pytest.raises(ValueError):
+        parse_mix("check=1,delete=1")
+
+
+def test_summarize_reports_percentiles_errors_and_503s():
+    records = [Record("check", 0.0, latency / 1000.0, 200) for latency in range(1, 101)]
+    records += [Record("check", 0.0, 0.001, 503), Record("rebuild", 0.0, 2.0, 500), Record("upload", 0.0, 0.1, None)]
+    report = summarize(records, elapsed_s=2.0)
+
+    overall = report["overall"]
+    assert overall["count"] == 103
+    assert overall["throughput_rps"] == 51.5
+    assert overall["rate_503"] == pytest.approx(1 / 103)
+    assert overall["error_rate"] == pytest.approx(2 / 103)
+    assert report["by_kind"]["check"]["p50_ms"] == pytest.approx(50.0, abs=1.0)
+    assert report["by_kind"]["check"]["p99_ms"] == pytest.approx(99.0, abs=1.0)
+    assert report["by_kind"]["upload"]["statuses"] == {"transport_error": 1}
+
+
+def test_drive_mixed_workload_in_process(stub_backend, monkeypatch, tmp_path):
+    # create_stub_app patches these globals; register them so monkeypatch restores them afterwards.
+    monkeypatch.setattr(verification, "_get_nli_pipeline", verification._get_nli_pipeline)
+    monkeypatch.setenv("LOADTEST_DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "data_dir", settings.data_dir)
+    monkeypatch.setattr(settings, "micro_batching", settings.micro_batching)
+    app = create_stub_app()
+    workload = Workload(DEFAULT_CORPUS, seed=1, check_mode="local", response_format="compact", background_rebuild=False)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            files = [("files", (p.name, p.read_bytes(), "text/plain")) for p in workload.files[:3]]
+            await client.post("/api/kb/upload", files=files)
+            await client.post("/api/kb/rebuild")
+        mix = parse_mix("check=6,upload=1,update=1,rebuild=1")
+        return await drive("http://test", workload, mix, concurrency=4, duration_s=1.0, transport=transport)
+
+    report = asyncio.run(run())
+    assert report["overall"]["count"] > 0
+    assert report["overall"]["error_rate"] == 0.0
+    assert report["by_kind"]["check"]["statuses"] == {"200": report["by_kind"]["check"]["count"]}
@@ -0,0 +1,96 @@
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import app.core.pipeline as pipeline
+from app.core.pipeline import check_claims
+from app.core.retrieval import RetrievedChunk
+from app.core.text_utils import split_claims_with_offsets
+from app.llm.cache import ResponseCache
+from app.llm.openai_client import OpenAIClient
+
+SHARED = RetrievedChunk(
+    chunk_id="kb.txt::0",
+    source_file="kb.txt",
+    text="Paris is the capital of France. Berlin is the capital of Germany.",
+    score=0.9,
+    semantic_score=0.9,
+    keyword_score=0.9,
+)
+
+
+class StubAPI(BaseHTTPRequestHandler):
+    requests = []
+    drop_ids = set()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        StubAPI.requests.append(body)
+        prompt = body["messages"][1]["content"]
+        if "Claims:" in prompt:
+            ids = [int(n) for n in re.findall(r"^(\d+)\. ", prompt.split("Claims:")[1], re.M)]
+            content = json.dumps(
+                [{"id": i, "label": "SUPPORTED", "confidence": 0.9} for i in ids if i not in StubAPI.drop_ids]
+            )
+        else:
+            content = json.dumps({"label": "CONTRADICTED", "confidence": 0.7})
+        payload = json.dumps({"choices": [{"message": {"content": content}}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_api(monkeypatch):
+    StubAPI.requests = []
+    StubAPI.drop_ids = set()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubAPI)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(pipeline, "retrieve", lambda query, index, top_k: [SHARED])
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+    server.server_close()
+
+
+CLAIMS = split_claims_with_offsets(
+    "Paris is the capital of France. Berlin is the capital of Germany. France borders Germany."
+)
+
+
+def test_claims_share_one_batched_request(stub_api, tmp_path):
+    client = OpenAIClient(api_key="test", base_url=stub_api, cache=ResponseCache(tmp_path / "llm.sqlite3"))
+    results, _ = check_claims(CLAIMS, index=None, top_k=3, mode="openai", openai_client=client)
+
+    assert [r.label for r in results] == ["SUPPORTED"] * 3
+    assert len(StubAPI.requests) == 1
+    prompt = StubAPI.requests[0]["messages"][1]["content"]
+    assert prompt.count(SHARED.text) == 1
+
+
+def test_responses_are_cached_by_prompt_and_model(stub_api, tmp_path):
+    cache = ResponseCache(tmp_path / "llm.sqlite3")
+    for _ in range(2):
+        client = OpenAIClient(api_key="test", base_url=stub_api, cache=cache)
+        check_claims(CLAIMS, index=None, top_k=3, mode="openai", openai_client=client)
+    assert len(StubAPI.requests) == 1
+
+    other = OpenAIClient(api_key="test", base_url=stub_api, model="other-model", cache=cache)
+    check_claims(CLAIMS, index=None, top_k=3, mode="openai", openai_client=other)
+    assert len(StubAPI.requests) == 2
+
+
+def test_missing_verdicts_fall_back_per_claim(stub_api, tmp_path):
+    StubAPI.drop_ids = {2}
+    client = OpenAIClient(api_key="test", base_url=stub_api, cache=ResponseCache(tmp_path / "llm.sqlite3"))
+    results, _ = check_claims(CLAIMS, index=None, top_k=3, mode="openai", openai_client=client)
+
+    assert [r.label for r in results] == ["SUPPORTED", "CONTRADICTED", "SUPPORTED"]
+    assert len(StubAPI.requests) == 2
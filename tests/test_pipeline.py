@@ -0,0 +1,96 @@
+import time
+
+import pytest
+
+import app.core.pipeline as pipeline
+import app.core.verification as verification
+from app.config import settings
+from app.core.pipeline import check_claims
+from app.core.retrieval import RetrievedChunk
+from app.core.text_utils import split_claims_with_offsets
+
+CHUNK = RetrievedChunk(
+    chunk_id="kb.txt::0",
+    source_file="kb.txt",
+    text="Paris is the capital of France. Berlin is the capital of Germany.",
+    score=0.9,
+    semantic_score=0.9,
+    keyword_score=0.9,
+)
+
+
+def test_repeated_claims_are_checked_once(monkeypatch):
+    calls = []
+
+    def fake_retrieve(query, index, top_k):
+        calls.append(query)
+        return [CHUNK]
+
+    monkeypatch.setattr(pipeline, "retrieve", fake_retrieve)
+    text = "Paris is the capital of France. paris is the capital of france! Berlin is the capital of Germany."
+    claims = split_claims_with_offsets(text)
+    results, evidence = check_claims(claims, index=None, top_k=3, mode="heuristic")
+
+    assert len(calls) == 2
+    assert len(results) == len(evidence) == 3
+    assert results[0] is results[1]
+    assert [r.label for r in results] == ["SUPPORTED"] * 3
+
+
+def test_nli_pairs_are_shared_within_request(monkeypatch):
+    scored = []
+
+    def fake_nli(payload):
+        scored.append((payload["text"], payload["text_pair"]))
+        return [{"label": "neutral", "score": 0.9}]
+
+    monkeypatch.setattr(verification, "_get_nli_pipeline", lambda model_name: fake_nli)
+    cache = verification.EvidenceCache()
+    claim = "Rome is old"
+    verification.verify_with_local_nli(claim, [CHUNK, CHUNK], "dummy", cache)
+
+    assert len(scored) == len(set(scored))
+    assert cache.nli_calls == len(scored)
+
+
+def test_retrieval_runs_ahead_of_verification(monkeypatch):
+    monkeypatch.setattr(settings, "pipeline_queue_size", 2)
+    claims = split_claims_with_offsets(" ".join(f"City {i} is large." for i in range(8)))
+    retrieved, verified, lead = [], [], []
+
+    def fake_retrieve(query, index, top_k):
+        retrieved.append(query)
+        return [CHUNK]
+
+    def slow_verify(claim, evidence, cache=None):
+        position = len(verified)
+        # The next claim should be retrieved while this one is still being verified.
+        deadline = time.monotonic() + 5
+        while len(retrieved) < min(position + 2, len(claims)) and time.monotonic() < deadline:
+            time.sleep(0.001)
+        time.sleep(0.01)
+        lead.append(len(retrieved) - (position + 1))
+        verified.append(claim)
+        return verification.VerificationResult(label="SUPPORTED", confidence=0.5)
+
+    monkeypatch.setattr(pipeline, "retrieve", fake_retrieve)
+    monkeypatch.setattr(pipeline, "verify_with_heuristics", slow_verify)
+    results, evidence = check_claims(claims, index=None, top_k=3, mode="heuristic")
+
+    assert verified == [claim.text for claim in claims]
+    assert len(results) == len(evidence) == 8
+    assert min(lead[:-1]) >= 1
+    # The queue holds two claims and the worker may hold a third: it never runs further ahead.
+    assert max(lead) <= 3
+
+
+def test_retrieval_errors_reach_the_caller(monkeypatch):
+    def failing_retrieve(query, index, top_k):
+        if "2" in query:
+            raise RuntimeError("index unavailable")
+        return [CHUNK]
+
+    monkeypatch.setattr(pipeline, "retrieve", failing_retrieve)
+    claims = split_claims_with_offsets("City 1 is large. City 2 is large. City 3 is large.")
+    with pytest.raises(RuntimeError, match="index unavailable"):
+        check_claims(claims, index=None, top_k=3, mode="heuristic")
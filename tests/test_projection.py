@@ -0,0 +1,64 @@
+import numpy as np
+
+from app.config import settings
+from app.core.projection import Projection, recall_at_k
+from app.core.retrieval import embedding_norms, retrieve
+from app.kb.index import META_FILE, IndexManager
+from app.kb.mapped import read_json
+from app.kb.storage import KBStorage
+
+
+def _clustered(rows=3000, dim=96, clusters=40, seed=0):
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim))
+    labels = rng.integers(0, clusters, rows)
+    return (centres[labels] + 0.3 * rng.standard_normal((rows, dim))).astype(np.float32)
+
+
+def test_coarse_stage_keeps_exact_top_k():
+    embeddings = _clustered()
+    norms = embedding_norms(embeddings)
+    queries = _clustered(rows=32, seed=0) + 0.1
+    for method in ("pca", "random"):
+        projection = Projection.build(embeddings, norms, dims=24, method=method)
+        assert projection.reduced.dtype == np.float16
+        assert projection.reduced.shape == (3000, 24)
+        assert recall_at_k(embeddings, norms, projection, queries, candidates=300) >= 0.9
+
+
+def test_candidates_respect_row_subset():
+    embeddings = _clustered(rows=500)
+    projection = Projection.build(embeddings, embedding_norms(embeddings), dims=16)
+    rows = np.arange(0, 500, 2)
+    picked = projection.candidates(embeddings[3], 20, rows)
+    assert len(picked) == 20
+    assert np.all(picked % 2 == 0)
+    assert np.all(np.diff(picked) > 0)
+
+
+class TopicBackend:
+    def __init__(self, model_name: str) -> None:
+        self.model_name = model_name
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), 16), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, sum(map(ord, word.strip(".,"))) % 16] += 1.0
+        return vectors
+
+
+def test_prefiltered_retrieval_matches_exact_top_results(stub_backend, monkeypatch, tmp_path):
+    stub_backend(TopicBackend)
+    monkeypatch.setattr(settings, "prefilter_dims", 8)
+    monkeypatch.setattr(settings, "prefilter_candidates", 10)
+    files = [(f"f{i}.txt", f"Fact number {i} about city {i % 7} and river {i % 5}.".encode()) for i in range(60)]
+    KBStorage(str(tmp_path)).save_files(files)
+    index = IndexManager(str(tmp_path)).build()
+
+    assert index.projection is not None
+    assert 0.0 <= read_json(tmp_path / META_FILE)["prefilter_recall"] <= 1.0
+    prefiltered = retrieve("city 3 and river 2", index, 3)
+    monkeypatch.setattr(settings, "prefilter_candidates", 0)
+    exact = retrieve("city 3 and river 2", index, 3)
+    assert prefiltered[0].chunk_id == exact[0].chunk_id
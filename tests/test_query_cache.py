@@ -0,0 +1,54 @@
+import numpy as np
+from fastapi.testclient import TestClient
+
+import app.core.retrieval as retrieval
+from app.config import settings
+from app.core.query_cache import QueryCache
+from app.kb.index import IndexManager
+from app.kb.storage import KBStorage
+from app.main import app
+
+
+class CountingBackend:
+    calls = 0
+
+    def __init__(self, model_name: str) -> None:
+        self.model_name = model_name
+
+    def embed(self, texts):
+        CountingBackend.calls += 1
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+
+def test_lru_evicts_oldest_entry():
+    cache = QueryCache(max_entries=2)
+    for text in ("a", "b", "a", "c"):
+        cache.get_or_compute("entities", None, text, lambda: text.upper())
+    assert cache.get_or_compute("entities", None, "b", lambda: "recomputed") == "recomputed"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 4)
+
+
+def test_repeated_queries_reuse_features(stub_backend, monkeypatch, tmp_path):
+    stub_backend(CountingBackend)
+    CountingBackend.calls = 0
+    monkeypatch.setattr(settings, "data_dir", str(tmp_path))
+    KBStorage(str(tmp_path)).save_files([("a.txt", b"Paris is the capital of France.")])
+    index = IndexManager(str(tmp_path)).build()
+    build_calls = CountingBackend.calls
+
+    first = retrieval.encode_query("Paris  is in France", index)
+    second = retrieval.encode_query("Paris is in France ", index)
+    assert CountingBackend.calls == build_calls + 1
+    assert second.embedding is first.embedding
+    assert second.tfidf is first.tfidf
+
+    KBStorage(str(tmp_path)).save_files([("b.txt", b"Berlin is the capital of Germany.")])
+    rebuilt = IndexManager(str(tmp_path)).build()
+    third = retrieval.encode_query("Paris is in France", rebuilt)
+    assert third.tfidf is not first.tfidf
+    assert third.embedding is first.embedding
+
+    stats = TestClient(app).get("/api/metrics").json()["query_cache"]
+    assert stats["by_kind"]["tfidf"] == {"hits": 1, "misses": 2, "hit_rate": 1 / 3}
+    assert stats["by_kind"]["embedding"]["hits"] == 2
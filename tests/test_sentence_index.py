@@ -0,0 +1,83 @@
+import numpy as np
+
+import app.core.verification as verification
+from app.config import settings
+from app.core.retrieval import retrieve
+from app.core.sentences import SentenceIndex
+from app.kb.index import META_FILE, IndexManager
+from app.kb.mapped import read_json
+from app.kb.storage import KBStorage
+
+
+class WordBackend:
+    def __init__(self, model_name: str) -> None:
+        self.model_name = model_name
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), 32), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, sum(map(ord, word.strip(".,"))) % 32] += 1.0
+        return vectors
+
+
+def _embed(texts):
+    return WordBackend("stub").embed(texts)
+
+
+def test_build_keeps_sentence_offsets_per_chunk():
+    texts = ["Paris is in France. Rome is in Italy.", "Berlin is large.", "Oslo is cold! Bern is small. Lima is dry."]
+    sentences = SentenceIndex.build(texts, _embed)
+
+    assert list(sentences.indptr) == [0, 2, 3, 6]
+    start, end = sentences.offsets[1]
+    assert texts[0][start:end] == "Rome is in Italy."
+    scored = sentences.score(_embed(["Rome is in Italy."])[0], [2, 0])
+    assert [len(row) for row in scored] == [3, 2]
+    best = max(scored[1], key=lambda item: item[2])
+    assert texts[0][best[0]:best[1]] == "Rome is in Italy."
+
+
+def test_take_and_concat_match_a_fresh_build():
+    texts = ["A cat sat. A dog ran.", "Birds fly.", "Fish swim. Frogs jump. Ants dig."]
+    full = SentenceIndex.build(texts, _embed)
+    taken = full.take(np.array([0, 2]))
+    rebuilt = SentenceIndex.build([texts[0], texts[2]], _embed)
+    joined = SentenceIndex.concat([SentenceIndex.build(texts[:1], _embed), SentenceIndex.build(texts[1:], _embed)])
+
+    for other, expected in ((taken, rebuilt), (joined, full)):
+        assert np.array_equal(other.indptr, expected.indptr)
+        assert np.array_equal(other.offsets, expected.offsets)
+        assert np.array_equal(other.embeddings, expected.embeddings)
+
+
+def test_nli_runs_on_the_best_indexed_sentences(stub_backend, monkeypatch, tmp_path):
+    stub_backend(WordBackend)
+    monkeypatch.setattr(settings, "sentence_index", True)
+    monkeypatch.setattr(settings, "evidence_sentences", 2)
+    monkeypatch.setattr(settings, "index_mmap", True)
+    files = [
+        (f"f{i}.txt", f"River {i} runs north. Town {i} has a mill. The lake {i} is deep. Hills {i} are green.".encode())
+        for i in range(6)
+    ]
+    KBStorage(str(tmp_path)).save_files(files)
+    IndexManager(str(tmp_path)).build()
+    index = IndexManager(str(tmp_path)).load()
+
+    assert read_json(tmp_path / META_FILE)["sentence_count"] == 24
+    claim = "Lake 3 is quite deep"
+    evidence = retrieve(claim, index, 4)
+    assert all(len(chunk.sentences) == 4 for chunk in evidence)
+
+    scored = []
+
+    def fake_nli(payload):
+        scored.append(payload["text"])
+        return [{"label": "entailment", "score": 0.9}]
+
+    monkeypatch.setattr(verification, "_get_nli_pipeline", lambda model_name: fake_nli)
+    result = verification.verify_with_local_nli(claim, evidence, "dummy")
+
+    assert len(scored) == 2
+    assert "The lake 3 is deep." in scored
+    assert result.label == verification.LABEL_SUPPORTED
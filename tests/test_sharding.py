@@ -0,0 +1,112 @@
+import numpy as np
+
+import app.kb.index as kb_index
+from app.config import settings
+from app.core.retrieval import ShardedIndex, retrieve
+from app.kb.index import IndexManager
+from app.kb.storage import KBStorage
+
+DOCS = {
+    "france.txt": "Paris is the capital of France. The Seine flows through Paris.",
+    "germany.txt": "Berlin is the capital of Germany. The Spree flows through Berlin.",
+    "italy.txt": "Rome is the capital of Italy. The Tiber flows through Rome.",
+    "spain.txt": "Madrid is the capital of Spain. Madrid hosts the Prado museum.",
+    "japan.txt": "Tokyo is the capital of Japan. Mount Fuji is near Tokyo.",
+}
+
+
+class HashBackend:
+    def __init__(self, model_name: str) -> None:
+        self.model_name = model_name
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), 16), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in text.lower().split():
+                vectors[row, sum(map(ord, token)) % 16] += 1.0
+        return vectors
+
+
+def _setup(tmp_path, stub_backend):
+    stub_backend(HashBackend)
+    KBStorage(str(tmp_path)).save_files([(name, text.encode()) for name, text in DOCS.items()])
+
+
+def test_sharded_ranking_matches_unsharded(stub_backend, monkeypatch, tmp_path):
+    _setup(tmp_path, stub_backend)
+    flat = IndexManager(str(tmp_path)).build()
+
+    monkeypatch.setattr(settings, "index_shards", 4)
+    sharded = IndexManager(str(tmp_path)).build()
+    assert isinstance(sharded, ShardedIndex)
+    assert len(sharded.shards) == 4
+    assert sum(1 for shard in sharded.shards if len(shard.texts)) >= 2
+    assert len(sharded.texts) == len(flat.texts)
+
+    reloaded = IndexManager(str(tmp_path)).load()
+    for query in ("capital of Germany", "river through Rome", "Mount Fuji Tokyo"):
+        expected = [(r.chunk_id, round(r.score, 5)) for r in retrieve(query, flat, 4)]
+        assert [(r.chunk_id, round(r.score, 5)) for r in retrieve(query, sharded, 4)] == expected
+        assert [(r.chunk_id, round(r.score, 5)) for r in retrieve(query, reloaded, 4)] == expected
+
+
+def test_rebuild_single_shard(stub_backend, monkeypatch, tmp_path):
+    _setup(tmp_path, stub_backend)
+    monkeypatch.setattr(settings, "index_shards", 2)
+    manager = IndexManager(str(tmp_path))
+    before = manager.build()
+
+    target = kb_index.shard_for_file("greece.txt", 2)
+    KBStorage(str(tmp_path)).save_files([("greece.txt", b"Athens is the capital of Greece.")])
+    after = manager.build(shard=target)
+
+    assert after.index_version != before.index_version
+    assert after.shards[1 - target].index_version == before.shards[1 - target].index_version
+    assert "greece.txt::0" in list(after.shards[target].chunk_ids)
+    assert retrieve("Athens Greece", manager.load(), 1)[0].chunk_id == "greece.txt::0"
+
+
+def test_rebuild_shard_skips_duplicates_of_other_shards(stub_backend, monkeypatch, tmp_path):
+    _setup(tmp_path, stub_backend)
+    monkeypatch.setattr(settings, "index_shards", 2)
+    monkeypatch.setattr(settings, "dedup_threshold", 0.9)
+    manager = IndexManager(str(tmp_path))
+    manager.build()
+
+    target = kb_index.shard_for_file("copy.txt", 2)
+    assert target != kb_index.shard_for_file("germany.txt", 2)
+    KBStorage(str(tmp_path)).save_files([("copy.txt", DOCS["germany.txt"].encode())])
+    after = manager.build(shard=target)
+
+    assert "copy.txt::0" not in list(after.shards[target].chunk_ids)
+    assert manager.status()["duplicates_removed"] == 1
+
+
+def test_sharded_graph_candidates_match_unsharded(stub_backend, monkeypatch, tmp_path):
+    _setup(tmp_path, stub_backend)
+    flat = IndexManager(str(tmp_path)).build()
+    monkeypatch.setattr(settings, "index_shards", 4)
+    sharded = IndexManager(str(tmp_path)).build()
+    monkeypatch.setattr(settings, "graph_candidates", True)
+
+    for query in ("Paris is lovely", "Tokyo has Mount Fuji", "Atlantis is lost", "capital of Germany"):
+        expected = [(r.chunk_id, round(r.score, 5)) for r in retrieve(query, flat, 4)]
+        assert [(r.chunk_id, round(r.score, 5)) for r in retrieve(query, sharded, 4)] == expected
+
+
+def test_sharded_bm25_matches_unsharded(stub_backend, monkeypatch, tmp_path):
+    _setup(tmp_path, stub_backend)
+    monkeypatch.setattr(settings, "keyword_engine", "bm25")
+    flat = IndexManager(str(tmp_path)).build()
+    monkeypatch.setattr(settings, "index_shards", 4)
+    sharded = IndexManager(str(tmp_path)).build()
+    reloaded = IndexManager(str(tmp_path)).load()
+    # A single-shard rebuild keeps the corpus-wide BM25 statistics of the full build.
+    rebuilt = IndexManager(str(tmp_path)).build(shard=kb_index.shard_for_file("germany.txt", 4))
+
+    assert retrieve("capital of Germany", sharded, 1)[0].chunk_id == "germany.txt::0"
+    for query in ("capital of Germany", "river through Rome", "Mount Fuji Tokyo", "Madrid museum"):
+        expected = [(r.chunk_id, round(r.score, 5), round(r.keyword_score, 5)) for r in retrieve(query, flat, 4)]
+        for index in (sharded, reloaded, rebuilt):
+            got = [(r.chunk_id, round(r.score, 5), round(r.keyword_score, 5)) for r in retrieve(query, index, 4)]
+            assert got == expected
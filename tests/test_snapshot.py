@@ -0,0 +1,122 @@
+import tarfile
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.core.retrieval import ShardedIndex, retrieve
+from app.kb.index import IndexManager
+from app.kb.snapshot import SnapshotError, main, verify_snapshot
+from app.kb.storage import KBStorage
+from app.main import app
+
+DOCS = {
+    "france.txt": "Paris is the capital of France. The Seine flows through Paris.",
+    "germany.txt": "Berlin is the capital of Germany. The Spree flows through Berlin.",
+    "italy.txt": "Rome is the capital of Italy. The Tiber flows through Rome.",
+}
+
+
+class HashBackend:
+    def __init__(self, model_name: str) -> None:
+        self.model_name = model_name
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), 16), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in text.lower().split():
+                vectors[row, sum(map(ord, token)) % 16] += 1.0
+        return vectors
+
+
+def _export(tmp_path, stub_backend):
+    stub_backend(HashBackend)
+    source = tmp_path / "source"
+    KBStorage(str(source)).save_files([(name, text.encode()) for name, text in DOCS.items()])
+    IndexManager(str(source)).build()
+    archive = tmp_path / "kb.snapshot.tar"
+    IndexManager(str(source)).export_snapshot(archive)
+    return source, archive
+
+
+def _ranking(index, query="Seine river in Paris"):
+    return [(chunk.chunk_id, round(chunk.score, 5)) for chunk in retrieve(query, index, 3)]
+
+
+@pytest.mark.parametrize("mount", [False, True])
+def test_imported_snapshot_serves_like_the_source(stub_backend, tmp_path, mount):
+    source, archive = _export(tmp_path, stub_backend)
+    manifest = verify_snapshot(archive)
+    assert "meta.json" in manifest["files"]
+
+    replica = IndexManager(str(tmp_path / "replica"))
+    replica.import_snapshot(archive, mount=mount)
+    loaded = replica.load()
+
+    assert _ranking(loaded) == _ranking(IndexManager(str(source)).load())
+    assert replica.status()["chunk_count"] == len(DOCS)
+    assert isinstance(loaded.embeddings, np.memmap) == mount
+    if mount:
+        assert not (tmp_path / "replica" / "index" / replica.current_version() / "embeddings.npy").exists()
+
+
+def test_mounted_snapshot_takes_deletes_and_updates(stub_backend, tmp_path):
+    _, archive = _export(tmp_path, stub_backend)
+    replica = IndexManager(str(tmp_path / "replica"))
+    replica.import_snapshot(archive, mount=True)
+
+    index = replica.update_files(["italy.txt"])
+    assert int(index.tombstones.sum()) == 1
+    assert all(chunk.source_file != "italy.txt" for chunk in retrieve("Rome Tiber", replica.load(), 3))
+
+
+def test_sharded_snapshot_round_trip(stub_backend, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "index_shards", 2)
+    source, archive = _export(tmp_path, stub_backend)
+    replica = IndexManager(str(tmp_path / "replica"))
+    replica.import_snapshot(archive)
+
+    loaded = replica.load()
+    assert isinstance(loaded, ShardedIndex)
+    assert _ranking(loaded) == _ranking(IndexManager(str(source)).load())
+    with pytest.raises(SnapshotError):
+        IndexManager(str(tmp_path / "mounted")).import_snapshot(archive, mount=True)
+
+
+def test_corrupt_or_foreign_snapshots_are_rejected(stub_backend, monkeypatch, tmp_path):
+    _, archive = _export(tmp_path, stub_backend)
+    with tarfile.open(archive) as tar:
+        member = tar.getmember(next(name for name in tar.getnames() if name.endswith("embeddings.npy")))
+    data = bytearray(archive.read_bytes())
+    data[member.offset_data + member.size - 1] ^= 0xFF
+    corrupt = tmp_path / "corrupt.tar"
+    corrupt.write_bytes(bytes(data))
+
+    replica = IndexManager(str(tmp_path / "replica"))
+    with pytest.raises(SnapshotError, match="Checksum"):
+        replica.import_snapshot(corrupt)
+    assert replica.current_version() is None
+    monkeypatch.setattr(settings, "embedding_model", "other-model")
+    with pytest.raises(SnapshotError, match="other-model"):
+        replica.import_snapshot(archive)
+
+
+def test_snapshot_api_and_cli(stub_backend, monkeypatch, tmp_path, capsys):
+    source, archive = _export(tmp_path, stub_backend)
+    monkeypatch.setattr(settings, "data_dir", str(source))
+    client = TestClient(app)
+
+    exported = client.get("/api/kb/snapshot")
+    assert exported.status_code == 200
+    uploaded = client.post(
+        "/api/kb/replica/snapshot", params={"mount": "true"}, files={"file": ("kb.tar", exported.content)}
+    )
+    assert uploaded.status_code == 200
+    assert uploaded.json()["chunk_count"] == len(DOCS)
+    rejected = client.post("/api/kb/broken/snapshot", files={"file": ("kb.tar", b"not a tar")})
+    assert rejected.status_code == 400
+
+    assert main(["verify", str(archive)]) == 0
+    assert main(["import", str(archive), "--kb", "cli"]) == 0
+    assert '"chunk_count": 3' in capsys.readouterr().out